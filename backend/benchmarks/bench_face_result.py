@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-frame allocations of face results: the former dictionaries of
+Python float lists against FaceResult records with float32 arrays.
+
+Reports retained bytes and allocated blocks per frame (tracemalloc), garbage
+collector runs and build time over many frames of synthetic InsightFace output.
+
+Usage: python benchmarks/bench_face_result.py [--frames <n>] [--faces <n>]
+"""
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from vectorfaces.face_result import FaceResult
+
+
+def make_faces(count: int):
+    rng = np.random.default_rng(0)
+    return [
+        SimpleNamespace(
+            bbox=np.array([10, 20, 110, 140], dtype=np.float32),
+            det_score=np.float32(0.9),
+            age=30,
+            gender=1,
+            embedding=rng.standard_normal(512).astype(np.float32),
+            landmark_2d_106=rng.standard_normal((106, 2)).astype(np.float32)
+        )
+        for _ in range(count)
+    ]
+
+
+def list_result(face):
+    return {
+        "bbox": face.bbox.tolist(),
+        "confidence": float(face.det_score),
+        "age": int(face.age),
+        "gender": int(face.gender),
+        "embedding": face.embedding.tolist(),
+        "landmark": face.landmark_2d_106.tolist()
+    }
+
+
+def compact_result(face):
+    # Synthetic faces own their arrays; copy so each frame allocates fresh
+    # buffers like a real InsightFace call would
+    return FaceResult(
+        bbox=face.bbox.copy(),
+        confidence=float(face.det_score),
+        age=int(face.age),
+        gender=int(face.gender),
+        embedding=face.embedding.copy(),
+        landmark=face.landmark_2d_106.copy()
+    )
+
+
+def measure_retained(builder, faces, frames: int = 50):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    retained = [[builder(face) for face in faces] for _ in range(frames)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, 'filename')
+    size = sum(stat.size_diff for stat in stats)
+    blocks = sum(stat.count_diff for stat in stats)
+    del retained
+    return size / frames, blocks / frames
+
+
+def measure_gc(builder, faces, frames: int):
+    gc.collect()
+    collections_before = [generation['collections'] for generation in gc.get_stats()]
+    start = time.perf_counter()
+    for _ in range(frames):
+        results = [builder(face) for face in faces]
+    elapsed = time.perf_counter() - start
+    collections = [generation['collections'] - before
+                   for generation, before in zip(gc.get_stats(), collections_before)]
+    return collections, elapsed / frames * 1000
+
+
+if __name__ == '__main__':
+    frames = 2000
+    face_count = 4
+
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == '--frames' and i + 1 < len(sys.argv):
+            frames = int(sys.argv[i + 1])
+            i += 2
+        elif sys.argv[i] == '--faces' and i + 1 < len(sys.argv):
+            face_count = int(sys.argv[i + 1])
+            i += 2
+        else:
+            i += 1
+
+    faces = make_faces(face_count)
+    print(f"{frames} frames, {face_count} face(s) per frame")
+    print(f"{'representation':>16} {'bytes/frame':>12} {'blocks/frame':>13} {'gc gen0/1/2':>14} {'ms/frame':>9}")
+    for name, builder in [("lists", list_result), ("FaceResult", compact_result)]:
+        size, blocks = measure_retained(builder, faces)
+        collections, ms = measure_gc(builder, faces, frames)
+        print(f"{name:>16} {size:>12,.0f} {blocks:>13,.0f} {'/'.join(map(str, collections)):>14} {ms:>9.4f}")
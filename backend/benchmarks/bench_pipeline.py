@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Benchmark the stages of frame analysis and gate regressions against a baseline.
+
+Frames are composed offline from one face (the largest in --image, or in the
+group photo bundled with insightface) pasted into a grey canvas at several
+resolutions and face counts. Each scenario times:
+
+  base64_decode       FaceAnalyzer.decode_base64_bytes
+  image_decode        JPEG to RGB to BGR, as in FaceAnalyzer._analyze_bytes
+  detection           the detector alone (FaceAnalyzer.detect_faces without per-face models)
+  recognition         the recognition model on every detected face
+  result_conversion   FaceResult.from_insightface
+  json_serialization  ResponseBuilder.build_response and json.dumps
+  chain               FaceAnalysisHandler -> VectorSearchHandler on an in-memory search stub
+
+Results go to --output as JSON. With --baseline, every stage whose median
+exceeds the baseline median by more than its threshold (and by at least
+--min-delta-ms) is reported and the script exits with status 1.
+
+Usage: python benchmarks/bench_pipeline.py [--iterations <n>] [--warmup <n>] [--resolutions 640x480,1280x720]
+                                           [--faces 0,1,4] [--stages <stage,...>] [--image <path>]
+                                           [--output <path>] [--baseline <path>] [--save-baseline]
+                                           [--threshold <fraction>] [--threshold <stage>=<fraction>]
+                                           [--min-delta-ms <ms>]
+"""
+import asyncio
+import base64
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from vectorfaces import FaceAnalyzer
+from vectorfaces.face_result import FaceResult
+from chain import FaceAnalysisHandler, VectorSearchHandler, ResponseBuilder
+
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080)]
+FACE_COUNTS = [0, 1, 4]
+STAGES = ["base64_decode", "image_decode", "detection", "recognition",
+          "result_conversion", "json_serialization", "chain"]
+
+
+class InMemorySearch:
+    """Stands in for VectorSearch: exact cosine search over a random gallery."""
+
+    def __init__(self, size: int = 10000, dims: int = 512):
+        rng = np.random.default_rng(0)
+        gallery = rng.standard_normal((size, dims)).astype(np.float32)
+        self.gallery = gallery / np.linalg.norm(gallery, axis=1, keepdims=True)
+        self.is_connected = True
+
+    def search_similar_faces(self, query_embedding, top_k: int = 10, size: int = 50, **kwargs):
+        start = time.perf_counter()
+        query = np.asarray(query_embedding, dtype=np.float32)
+        scores = self.gallery @ (query / np.linalg.norm(query))
+        top = np.argpartition(-scores, size)[:size]
+        top = top[np.argsort(-scores[top])]
+        matches = [{
+            "index": "faces-benchmark",
+            "face_id": str(row),
+            "score": float(scores[row]),
+            "metadata": {"name": f"Person {row}", "gender": "M" if row % 2 else "F",
+                         "image_path": f"images/{row}.jpg"}
+        } for row in top]
+        took = int((time.perf_counter() - start) * 1000)
+        return matches, {"took": took, "timed_out": False, "total_hits": len(matches), "max_score": matches[0]["score"],
+                         "response_bytes": 0, "parse_ms": 0.0}
+
+
+def load_face_crop(analyzer: FaceAnalyzer, image_path: str = None) -> np.ndarray:
+    """Crop the largest face of the source image with a margin around it."""
+    if image_path:
+        image = cv2.imread(image_path)
+        if image is None:
+            raise ValueError(f"Could not read {image_path}")
+    else:
+        from insightface.data import get_image
+        image = get_image('t1')
+
+    faces = analyzer.detect_faces(image, {'models': ()})
+    if not faces:
+        raise ValueError("No face found in the source image")
+    x1, y1, x2, y2 = max(faces, key=lambda face: (face.bbox[2] - face.bbox[0]) * (face.bbox[3] - face.bbox[1])).bbox
+    margin_x, margin_y = (x2 - x1) * 0.4, (y2 - y1) * 0.4
+    height, width = image.shape[:2]
+    return image[max(0, int(y1 - margin_y)):min(height, int(y2 + margin_y)),
+                 max(0, int(x1 - margin_x)):min(width, int(x2 + margin_x))]
+
+
+def compose_frame(face: np.ndarray, width: int, height: int, count: int) -> np.ndarray:
+    """Paste count copies of the face in a grid over a grey canvas."""
+    frame = np.full((height, width, 3), 127, dtype=np.uint8)
+    if count == 0:
+        return frame
+    columns = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / columns)
+    cell_width, cell_height = width // columns, height // rows
+    scale = min(cell_width * 0.8 / face.shape[1], cell_height * 0.8 / face.shape[0])
+    resized = cv2.resize(face, (max(1, int(face.shape[1] * scale)), max(1, int(face.shape[0] * scale))))
+    for i in range(count):
+        top = (i // columns) * cell_height + (cell_height - resized.shape[0]) // 2
+        left = (i % columns) * cell_width + (cell_width - resized.shape[1]) // 2
+        frame[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return frame
+
+
+def time_stage(fn, iterations: int, warmup: int) -> dict:
+    # Handlers and ResponseBuilder print every frame; keep that out of the timings' console
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            fn()
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+    samples = np.array(samples)
+    return {
+        "median_ms": round(float(np.median(samples)), 4),
+        "p95_ms": round(float(np.percentile(samples, 95)), 4),
+        "mean_ms": round(float(samples.mean()), 4),
+        "min_ms": round(float(samples.min()), 4)
+    }
+
+
+def benchmark_scenario(analyzer: FaceAnalyzer, search: InMemorySearch, frame: np.ndarray,
+                       stages: list, iterations: int, warmup: int) -> dict:
+    jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+    image_base64 = "data:image/jpeg;base64," + base64.b64encode(jpeg).decode('ascii')
+    faces = analyzer.detect_faces(frame)
+    detection_only = {'models': ()}
+    recognition = analyzer.face_app.models['recognition']
+    detected = analyzer.detect_faces(frame, detection_only)
+
+    search_head = FaceAnalysisHandler(analyzer, use_cache=False)
+    search_head.set_next(VectorSearchHandler(search))
+    loop = asyncio.new_event_loop()
+
+    def run_chain():
+        context = {'image_data': image_base64, 'timestamp': time.time(), 'settings': {}, 'timing_stats': {}}
+        return loop.run_until_complete(search_head.handle(context))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        context = run_chain()
+
+    def serialize():
+        return json.dumps(ResponseBuilder.build_response(context))
+
+    def recognize():
+        for face in detected:
+            recognition.get(frame, face)
+
+    stage_functions = {
+        "base64_decode": lambda: FaceAnalyzer.decode_base64_bytes(image_base64),
+        "image_decode": lambda: cv2.cvtColor(FaceAnalyzer.decode_image_rgb(jpeg), cv2.COLOR_RGB2BGR),
+        "detection": lambda: analyzer.detect_faces(frame, detection_only),
+        "recognition": recognize,
+        "result_conversion": lambda: [FaceResult.from_insightface(face) for face in faces],
+        "json_serialization": serialize,
+        "chain": run_chain
+    }
+    try:
+        results = {stage: time_stage(stage_functions[stage], iterations, warmup) for stage in stages}
+    finally:
+        loop.close()
+    return {"detected": len(faces), "jpeg_bytes": len(jpeg), "stages": results}
+
+
+def compare(results: dict, baseline: dict, default_threshold: float, thresholds: dict, min_delta_ms: float) -> list:
+    """List the stages whose median regressed beyond their threshold."""
+    regressions = []
+    baseline_scenarios = baseline.get("scenarios", {})
+    for scenario, result in results["scenarios"].items():
+        base = baseline_scenarios.get(scenario)
+        if base is None:
+            continue
+        for stage, timing in result["stages"].items():
+            base_timing = base["stages"].get(stage)
+            if base_timing is None or base_timing["median_ms"] <= 0:
+                continue
+            threshold = thresholds.get(stage, default_threshold)
+            delta = timing["median_ms"] - base_timing["median_ms"]
+            change = delta / base_timing["median_ms"]
+            if change > threshold and delta >= min_delta_ms:
+                regressions.append({"scenario": scenario, "stage": stage, "baseline_ms": base_timing["median_ms"],
+                                    "median_ms": timing["median_ms"], "change": round(change, 4),
+                                    "threshold": threshold})
+    return regressions
+
+
+if __name__ == '__main__':
+    iterations = 30
+    warmup = 3
+    resolutions = RESOLUTIONS
+    face_counts = FACE_COUNTS
+    stages = STAGES
+    image_path = None
+    output = os.path.join(os.path.dirname(__file__), 'pipeline_results.json')
+    baseline_path = None
+    save_baseline = False
+    default_threshold = 0.2
+    thresholds = {}
+    min_delta_ms = 0.05
+
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == '--iterations' and i + 1 < len(sys.argv):
+            iterations = int(sys.argv[i + 1])
+            i += 2
+        elif sys.argv[i] == '--warmup' and i + 1 < len(sys.argv):
+            warmup = int(sys.argv[i + 1])
+            i += 2
+        elif sys.argv[i] == '--resolutions' and i + 1 < len(sys.argv):
+            resolutions = [tuple(int(value) for value in resolution.split('x'))
+                           for resolution in sys.argv[i + 1].split(',')]
+            i += 2
+        elif sys.argv[i] == '--faces' and i + 1 < len(sys.argv):
+            face_counts = [int(count) for count in sys.argv[i + 1].split(',')]
+            i += 2
+        elif sys.argv[i] == '--stages' and i + 1 < len(sys.argv):
+            stages = sys.argv[i + 1].split(',')
+            unknown = set(stages) - set(STAGES)
+            if unknown:
+                print(f"Unknown stage(s): {', '.join(sorted(unknown))}; choose from {', '.join(STAGES)}")
+                sys.exit(2)
+            i += 2
+        elif sys.argv[i] == '--image' and i + 1 < len(sys.argv):
+            image_path = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--output' and i + 1 < len(sys.argv):
+            output = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--baseline' and i + 1 < len(sys.argv):
+            baseline_path = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--save-baseline':
+            save_baseline = True
+            i += 1
+        elif sys.argv[i] == '--threshold' and i + 1 < len(sys.argv):
+            if '=' in sys.argv[i + 1]:
+                stage, value = sys.argv[i + 1].split('=', 1)
+                thresholds[stage] = float(value)
+            else:
+                default_threshold = float(sys.argv[i + 1])
+            i += 2
+        elif sys.argv[i] == '--min-delta-ms' and i + 1 < len(sys.argv):
+            min_delta_ms = float(sys.argv[i + 1])
+            i += 2
+        else:
+            i += 1
+
+    if save_baseline and not baseline_path:
+        print("--save-baseline needs --baseline <path>")
+        sys.exit(2)
+
+    analyzer = FaceAnalyzer()
+    if not analyzer.initialize():
+        sys.exit(1)
+    analyzer.warmup()
+    face = load_face_crop(analyzer, image_path)
+    search = InMemorySearch()
+
+    results = {
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "model_pack": analyzer.model_pack,
+        "det_size": list(analyzer.det_size),
+        "providers": analyzer.providers,
+        "iterations": iterations,
+        "scenarios": {}
+    }
+
+    print(f"{iterations} iterations per stage after {warmup} warmup run(s)")
+    print(f"{'scenario':>16} {'detected':>9} {'stage':>19} {'median ms':>10} {'p95 ms':>9}")
+    for width, height in resolutions:
+        for count in face_counts:
+            scenario = f"{width}x{height}-{count}faces"
+            result = benchmark_scenario(analyzer, search, compose_frame(face, width, height, count),
+                                        stages, iterations, warmup)
+            results["scenarios"][scenario] = dict(result, width=width, height=height, faces=count)
+            for stage, timing in result["stages"].items():
+                print(f"{scenario:>16} {result['detected']:>9} {stage:>19} "
+                      f"{timing['median_ms']:>10.3f} {timing['p95_ms']:>9.3f}")
+
+    regressions = []
+    if baseline_path and not save_baseline:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, default_threshold, thresholds, min_delta_ms)
+        results["baseline"] = baseline_path
+        results["regressions"] = regressions
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if save_baseline:
+        with open(baseline_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+    elif baseline_path:
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {baseline_path}:")
+            for regression in regressions:
+                print(f"  {regression['scenario']} {regression['stage']}: {regression['baseline_ms']:.3f} -> "
+                      f"{regression['median_ms']:.3f} ms (+{regression['change']:.0%}, "
+                      f"threshold {regression['threshold']:.0%})")
+            sys.exit(1)
+        print(f"No regressions against {baseline_path}")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark the shared memory frame transport against pickling over a pipe.
+
+Each round trip sends one decoded BGR frame to a second process, which replies
+with synthetic face results (bbox, score, genderage, 512-d embedding and 106
+landmarks per face), mirroring a RemoteFaceAnalyzer request.
+
+Usage: python benchmarks/bench_shm_transport.py [--iterations <n>] [--faces <n>]
+"""
+import multiprocessing
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from vectorfaces.shm_transport import FrameRing
+
+
+RESOLUTIONS = [(480, 640), (720, 1280), (1080, 1920)]
+
+
+def make_faces(count: int):
+    rng = np.random.default_rng(0)
+    return [
+        SimpleNamespace(
+            bbox=np.array([10, 20, 110, 140], dtype=np.float32),
+            det_score=np.float32(0.9),
+            age=30,
+            gender=1,
+            embedding=rng.standard_normal(512).astype(np.float32),
+            landmark_2d_106=rng.standard_normal((106, 2)).astype(np.float32)
+        )
+        for _ in range(count)
+    ]
+
+
+def pickle_worker(conn, face_count: int):
+    faces = make_faces(face_count)
+    while True:
+        frame = conn.recv()
+        if frame is None:
+            break
+        conn.send({
+            "success": True,
+            "face_count": len(faces),
+            "faces": [{
+                "bbox": face.bbox.tolist(),
+                "confidence": float(face.det_score),
+                "age": int(face.age),
+                "gender": int(face.gender),
+                "embedding": face.embedding.tolist(),
+                "landmark": face.landmark_2d_106.tolist()
+            } for face in faces],
+            "image_shape": frame.shape
+        })
+
+
+def shm_worker(conn, ring_description, face_count: int):
+    ring = FrameRing.attach(ring_description)
+    slot = ring.slot(0)
+    faces = make_faces(face_count)
+    while True:
+        shape = conn.recv()
+        if shape is None:
+            break
+        frame = slot.frame_view(shape)
+        frame[0, 0, 0]  # touch the frame like a detector would
+        slot.write_faces(faces)
+        conn.send({"success": True, "face_count": int(slot.header["face_count"])})
+    ring.close()
+
+
+def bench_pickle(frames, face_count: int, iterations: int) -> float:
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe()
+    process = ctx.Process(target=pickle_worker, args=(child, face_count))
+    process.start()
+    parent.send(frames[0])
+    parent.recv()
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        parent.send(frames[i % len(frames)])
+        parent.recv()
+    elapsed = time.perf_counter() - start
+
+    parent.send(None)
+    process.join()
+    return elapsed / iterations * 1000
+
+
+def bench_shm(frames, face_count: int, iterations: int) -> float:
+    ctx = multiprocessing.get_context("spawn")
+    ring = FrameRing(num_slots=1, max_frame_shape=(1080, 1920, 3))
+    slot = ring.slot(0)
+    parent, child = ctx.Pipe()
+    process = ctx.Process(target=shm_worker, args=(child, ring.describe(), face_count))
+    process.start()
+    parent.send(frames[0].shape)
+    parent.recv()
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        frame = frames[i % len(frames)]
+        np.copyto(slot.frame_view(frame.shape), frame)
+        parent.send(frame.shape)
+        parent.recv()
+        slot.read_faces()
+    elapsed = time.perf_counter() - start
+
+    parent.send(None)
+    process.join()
+    ring.close()
+    return elapsed / iterations * 1000
+
+
+if __name__ == '__main__':
+    iterations = 200
+    face_count = 4
+
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == '--iterations' and i + 1 < len(sys.argv):
+            iterations = int(sys.argv[i + 1])
+            i += 2
+        elif sys.argv[i] == '--faces' and i + 1 < len(sys.argv):
+            face_count = int(sys.argv[i + 1])
+            i += 2
+        else:
+            i += 1
+
+    rng = np.random.default_rng(1)
+    print(f"{iterations} round trips, {face_count} face(s) per frame")
+    print(f"{'resolution':>12} {'pickle ms':>10} {'shm ms':>10} {'speedup':>8}")
+    for height, width in RESOLUTIONS:
+        frames = [rng.integers(0, 255, (height, width, 3), dtype=np.uint8) for _ in range(4)]
+        pickle_ms = bench_pickle(frames, face_count, iterations)
+        shm_ms = bench_shm(frames, face_count, iterations)
+        resolution = f"{width}x{height}"
+        print(f"{resolution:>12} {pickle_ms:>10.3f} {shm_ms:>10.3f} {pickle_ms / shm_ms:>7.1f}x")
@@ -1,11 +1,23 @@
 from .handler import FrameHandler
+from .degradation_handler import DegradationHandler
+from .roi_detection_handler import ROIDetectionHandler
 from .face_analysis_handler import FaceAnalysisHandler
+from .crop_analysis_handler import CropAnalysisHandler
+from .face_track_handler import FaceTrackHandler
+from .detection_notify_handler import DetectionNotifyHandler
 from .vector_search_handler import VectorSearchHandler
+from .thumbnail_handler import ThumbnailHandler
 from .response_builder import ResponseBuilder
 
 __all__ = [
     'FrameHandler',
+    'DegradationHandler',
+    'ROIDetectionHandler',
     'FaceAnalysisHandler',
+    'CropAnalysisHandler',
+    'FaceTrackHandler',
+    'DetectionNotifyHandler',
     'VectorSearchHandler',
+    'ThumbnailHandler',
     'ResponseBuilder'
 ]
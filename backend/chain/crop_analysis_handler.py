@@ -0,0 +1,57 @@
+import asyncio
+import time
+from typing import Dict, Any
+from .handler import FrameHandler
+from vectorfaces import FaceAnalyzer, InferenceScheduler
+
+class CropAnalysisHandler(FrameHandler):
+    def __init__(self, analyzer: FaceAnalyzer, scheduler: InferenceScheduler = None):
+        super().__init__()
+        self.analyzer = analyzer
+        self.scheduler = scheduler
+    
+    async def handle(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        crops = context.get('crops') or []
+        timestamp = context.get('timestamp')
+        
+        print(f"Received {len(crops)} face crop(s) at {timestamp}")
+        
+        # Detection already ran in the browser; only alignment and embedding run here
+        face_analysis_start = time.time()
+        genderage = context.get('genderage', True)
+        # Degraded levels that drop the genderage model drop it for crops too
+        models = (context.get('quality') or {}).get('models')
+        if models is not None and 'genderage' not in models:
+            genderage = False
+        if self.scheduler is None:
+            face_analysis_result = await asyncio.to_thread(self.analyzer.analyze_crops_from_base64, crops, genderage)
+        else:
+            face_analysis_result = await self.scheduler.run(
+                context.get('client_id', 'rest'), context.get('priority', InferenceScheduler.LIVE),
+                self.analyzer.analyze_crops_from_base64, crops, genderage
+            )
+        face_analysis_time_ms = (time.time() - face_analysis_start) * 1000
+        
+        context.setdefault('timing_stats', {}).update({
+            'face_analysis_ms': round(face_analysis_time_ms, 2),
+            'detection': 'client'
+        })
+        
+        if face_analysis_result.get('success'):
+            face_count = face_analysis_result.get('face_count', 0)
+            context['face_analysis_result'] = face_analysis_result
+            context['face_count'] = face_count
+            # Without a client bbox a crop's box is the crop itself, which says nothing about
+            # where the face is, so it must not be matched to tracks by overlap
+            context['untracked_faces'] = {i for i, crop in enumerate(crops) if crop.get('bbox') is None}
+            
+            if face_count == 0:
+                context['response_type'] = 'not_found'
+                return context
+            
+            return await self._pass_to_next(context)
+        else:
+            print(f"Face crop analysis error: {face_analysis_result.get('error')}")
+            context['error'] = face_analysis_result.get('error')
+            context['response_type'] = 'error'
+            return context
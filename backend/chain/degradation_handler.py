@@ -0,0 +1,25 @@
+import time
+from typing import Dict, Any
+from .handler import FrameHandler
+from vectorfaces import DegradationController
+
+
+class DegradationHandler(FrameHandler):
+    def __init__(self, controller: DegradationController):
+        super().__init__()
+        self.controller = controller
+        self.frames = 0
+
+    async def handle(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        # The level is chosen once per frame and applies to every handler after this one
+        quality = self.controller.profile
+        self.frames += 1
+        context['quality'] = quality
+        context['skip_search'] = not quality['search'] or (self.frames - 1) % quality['search_every'] != 0
+        context['timing_stats'] = {'degradation_level': quality['level']}
+
+        frame_start = time.time()
+        context = await self._pass_to_next(context)
+        self.controller.observe((time.time() - frame_start) * 1000, context.get('timing_stats'))
+
+        return context
@@ -0,0 +1,16 @@
+from typing import Dict, Any, Awaitable, Callable
+from .handler import FrameHandler
+from .response_builder import ResponseBuilder
+
+
+class DetectionNotifyHandler(FrameHandler):
+    def __init__(self, send: Callable[[Dict[str, Any]], Awaitable[None]]):
+        super().__init__()
+        self.send = send
+    
+    async def handle(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        # Boxes go out as soon as analysis is done; matches follow when the searches return
+        await self.send(ResponseBuilder.build_detections(context))
+        context['detections_sent'] = True
+        
+        return await self._pass_to_next(context)
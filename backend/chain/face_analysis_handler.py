@@ -1,12 +1,15 @@
+import asyncio
 import time
 from typing import Dict, Any
 from .handler import FrameHandler
-from vectorfaces import FaceAnalyzer
+from vectorfaces import FaceAnalyzer, InferenceScheduler
 
 class FaceAnalysisHandler(FrameHandler):
-    def __init__(self, analyzer: FaceAnalyzer):
+    def __init__(self, analyzer: FaceAnalyzer, use_cache: bool = True, scheduler: InferenceScheduler = None):
         super().__init__()
         self.analyzer = analyzer
+        self.use_cache = use_cache
+        self.scheduler = scheduler
     
     async def handle(self, context: Dict[str, Any]) -> Dict[str, Any]:
         image_data = context.get('image_data')
@@ -15,12 +18,17 @@ class FaceAnalysisHandler(FrameHandler):
         print(f"Received frame at {timestamp}")
         
         face_analysis_start = time.time()
-        face_analysis_result = self.analyzer.analyze_from_base64(image_data)
+        # Raw uploads skip the base64 round trip; analysis runs off the event loop
+        if context.get('image_bytes') is not None:
+            face_analysis_result = await self._run(self.analyzer.analyze_from_bytes, context, context['image_bytes'])
+        else:
+            face_analysis_result = await self._run(self.analyzer.analyze_from_base64, context, image_data)
         face_analysis_time_ms = (time.time() - face_analysis_start) * 1000
         
-        context['timing_stats'] = {
-            'face_analysis_ms': round(face_analysis_time_ms, 2)
-        }
+        context.setdefault('timing_stats', {}).update({
+            'face_analysis_ms': round(face_analysis_time_ms, 2),
+            'analysis_cached': face_analysis_result.get('cached', False)
+        })
         
         if face_analysis_result.get('success'):
             face_count = face_analysis_result.get('face_count', 0)
@@ -44,3 +52,13 @@ class FaceAnalysisHandler(FrameHandler):
             context['error'] = face_analysis_result.get('error')
             context['response_type'] = 'error'
             return context
+    
+    async def _run(self, analyze, context: Dict[str, Any], image) -> Dict:
+        # A degraded live frame carries a reduced detection profile
+        quality = context.get('quality')
+        if self.scheduler is None:
+            return await asyncio.to_thread(analyze, image, self.use_cache, quality)
+        return await self.scheduler.run(
+            context.get('client_id', 'rest'), context.get('priority', InferenceScheduler.LIVE),
+            analyze, image, self.use_cache, quality
+        )
@@ -0,0 +1,28 @@
+from typing import Dict, Any
+from .handler import FrameHandler
+from vectorfaces import FaceTracker
+
+
+class FaceTrackHandler(FrameHandler):
+    def __init__(self, tracker: FaceTracker):
+        super().__init__()
+        self.tracker = tracker
+    
+    async def handle(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        faces = context.get('face_analysis_result', {}).get('faces', [])
+        untracked = context.get('untracked_faces') or set()
+        
+        # Tracks carry the aggregated embedding and the last matches of each face;
+        # faces without a position in the frame get no track and are searched directly
+        tracked = [i for i in range(len(faces)) if i not in untracked]
+        tracks = [None] * len(faces)
+        for i, track in zip(tracked, self.tracker.update([faces[i] for i in tracked])):
+            tracks[i] = track
+        for face, track in zip(faces, tracks):
+            if track is not None:
+                face.track_id = track.track_id
+        
+        context['face_tracks'] = tracks
+        context['timing_stats']['tracked_faces'] = len(self.tracker.tracks)
+        
+        return await self._pass_to_next(context)
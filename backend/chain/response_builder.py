@@ -12,15 +12,44 @@ class ResponseBuilder:
             'timestamp': datetime.now().isoformat(),
             'timing_stats': context.get('timing_stats', {})
         }
+        if context.get('frame_id') is not None:
+            response['frame_id'] = context['frame_id']
         
         if context.get('response_type') == 'error':
             response['error'] = context.get('error')
         elif context.get('response_type') == 'not_found':
             pass
+        elif context.get('detections_sent'):
+            # Second phase: the faces went out with the detections message
+            response['type'] = 'matches'
+            response['matching_faces'] = context.get('matching_faces', [])
         else:
-            response['face_analysis'] = context.get('face_analysis_result')
+            # Faces travel through the chain as FaceResult records with float32
+            # arrays; convert them to JSON-friendly lists only here
+            face_analysis = dict(context.get('face_analysis_result') or {})
+            if 'faces' in face_analysis:
+                face_analysis['faces'] = [face.to_dict() for face in face_analysis['faces']]
+            response['face_analysis'] = face_analysis
             matching_faces = context.get('matching_faces', [])
             if matching_faces:
                 response['matching_faces'] = matching_faces
         
         return response
+
+    @staticmethod
+    def build_detections(context: Dict[str, Any]) -> Dict[str, Any]:
+        face_analysis = dict(context.get('face_analysis_result') or {})
+        faces = []
+        for face_index, face in enumerate(face_analysis.get('faces', [])):
+            face_dict = face.to_dict()
+            face_dict['face_index'] = face_index
+            faces.append(face_dict)
+        face_analysis['faces'] = faces
+        
+        return {
+            'type': 'detections',
+            'frame_id': context.get('frame_id'),
+            'timestamp': datetime.now().isoformat(),
+            'timing_stats': dict(context.get('timing_stats', {})),
+            'face_analysis': face_analysis
+        }
@@ -0,0 +1,27 @@
+from typing import Dict, Any
+from .handler import FrameHandler
+from vectorfaces import ROIPlanner
+
+
+class ROIDetectionHandler(FrameHandler):
+    def __init__(self, planner: ROIPlanner):
+        super().__init__()
+        self.planner = planner
+
+    async def handle(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        # Regions travel in the detection profile, next to any degradation reductions
+        regions = self.planner.plan()
+        if regions is not None:
+            context['quality'] = dict(context.get('quality') or {}, rois=regions)
+        context.setdefault('timing_stats', {}).update({
+            'detection_mode': 'full' if regions is None else 'roi',
+            'detection_area': 1.0 if regions is None else round(self.planner.area_fraction(regions), 3)
+        })
+
+        context = await self._pass_to_next(context)
+        self.planner.observe(context.get('face_analysis_result'), regions,
+                             context.get('timing_stats', {}).get('face_analysis_ms'))
+        # Running totals of the connection, so the saving per searched area can be checked
+        context['timing_stats']['roi'] = self.planner.get_stats()
+
+        return context
@@ -0,0 +1,19 @@
+from typing import Dict, Any
+from .handler import FrameHandler
+from vectorfaces import ThumbnailService
+
+
+class ThumbnailHandler(FrameHandler):
+    def __init__(self, thumbnails: ThumbnailService):
+        super().__init__()
+        self.thumbnails = thumbnails
+    
+    async def handle(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        # Point matches at resized variants instead of the original images;
+        # thumbnails are generated when first requested
+        for match in context.get('matching_faces', []):
+            image_path = (match.get('metadata') or {}).get('image_path')
+            if image_path:
+                match['thumbnails'] = self.thumbnails.urls_for(image_path)
+        
+        return await self._pass_to_next(context)
@@ -1,75 +1,208 @@
-from typing import Dict, Any
+import asyncio
+import time
+from typing import Dict, Any, List
 from .handler import FrameHandler
-from vectorfaces import VectorSearch
+from vectorfaces import VectorSearch, WatchlistGallery, FaceTracker, QueryTuner
 import os
 
 
 class VectorSearchHandler(FrameHandler):
-    def __init__(self, search_service: VectorSearch):
+    def __init__(self, search_service: VectorSearch, gallery: WatchlistGallery = None, tracker: FaceTracker = None,
+                 tuner: QueryTuner = None):
         super().__init__()
         self.search_service = search_service
-    
+        self.gallery = gallery
+        self.tracker = tracker
+        self.tuner = tuner
+
     async def handle(self, context: Dict[str, Any]) -> Dict[str, Any]:
         if not self.search_service.is_connected:
             print("Vector search not connected, skipping similarity search")
-            context['timing_stats']['elasticsearch_total_ms'] = 0
-            context['timing_stats']['total_processing_ms'] = round(
-                context['timing_stats']['face_analysis_ms'], 2
-            )
-            context['matching_faces'] = []
-            context['response_type'] = 'analysis'
-            return await self._pass_to_next(context)
-        
+
         face_analysis_result = context.get('face_analysis_result', {})
-        settings = context.get('settings', {})
+        settings = context.get('settings') or {}
+        face_tracks = context.get('face_tracks') or []
         matching_faces = []
-        
+        self._stats = {
+            'took': 0,
+            'total_hits': 0,
+            'response_bytes': 0,
+            'parse_ms': 0.0,
+            'watchlist_ms': 0.0,
+            'coalesced': 0,
+            'degraded': False,
+            'tiers': {'watchlist': 0, 'elasticsearch': 0, 'track_cache': 0},
+            'query_params': {}
+        }
+
+        # search only the indices that are "selected":True
+        selected_indices = None
+        if settings.get('indices'):
+            selected_indices = [i['name'] for i in settings['indices'] if i.get('selected', False)]
+
+        k = int(settings.get('k', 50))
+        num_candidates = int(settings.get('num_candidates', 200))
+        size = int(settings.get('size', 50))
+
+        #trim k and num_candidates for sanitization
+        k = max(3, min(100, k))
+        num_candidates = max(50, min(1000, num_candidates))
+        size = max(10, min(100, size))
+
+        # Under load the degradation level caps the query cost further
+        quality = context.get('quality') or {}
+        if quality.get('max_k'):
+            k = min(k, quality['max_k'])
+        if quality.get('max_num_candidates'):
+            num_candidates = min(num_candidates, quality['max_num_candidates'])
+        if quality.get('max_size'):
+            size = min(size, quality['max_size'])
+        skip_search = context.get('skip_search', False)
+
+        search_params = {
+            'top_k': k,
+            'num_candidates': num_candidates,
+            'size': size,
+            'indices': selected_indices,
+            'deadline': context.get('deadline')
+        }
+        search_key = (k, num_candidates, size, tuple(selected_indices) if selected_indices is not None else None)
+
         for i, face in enumerate(face_analysis_result.get('faces', [])):
-            if face.get('embedding'):
-                gender_filter = "M" if face.get('gender') == 1 else "F"
-
-                must_not_indices = []
-
-                # add indices that are "selected":False in must_not_indices
-                if settings.get('indices'):
-                    for i in settings['indices']:
-                        if not i.get('selected', False):
-                            must_not_indices.append(i['name'])
-
-                k = int(settings.get('k'))
-                num_candidates = int(settings.get('num_candidates', 200))
-                size = int(settings.get('size', 50))
-
-                #trim k and num_candidates for sanitization
-                k = max(3, min(100, k))
-                num_candidates = max(50, min(1000, num_candidates))
-                size = max(10, min(100, size))
-                        
-                similar_faces, search_timing = self.search_service.search_similar_faces(
-                    face['embedding'],
-                    top_k=k,
-                    num_candidates=num_candidates,
-                    size=size,
-                    filters={"gender": gender_filter},
-                    exclude_indices=must_not_indices
-                )
-                
-                if similar_faces:
-                    
-                    for match in similar_faces:
-                        matching_faces.append({
-                            'metadata': match.get('metadata'),
-                            'score': match['score'],
-                            'index': match.get('index')
-                        })
-                        print(f"  - [{match.get('index')}] {match['score']:.3f} - {match.get('metadata')} ")
-        
-        context['timing_stats']['elasticsearch_total_hits'] = search_timing.get('total_hits', 0)
-        context['timing_stats']['elasticsearch_total_ms'] = search_timing.get('took', 0)
+            if face.get('embedding') is None:
+                continue
+
+            track = face_tracks[i] if i < len(face_tracks) else None
+            face_key = search_key + (face.get('gender'),)
+
+            # A tracked face whose aggregate has not moved reuses its last matches
+            if track is not None and self.tracker is not None and self.tracker.can_reuse(track, face_key):
+                self._stats['tiers']['track_cache'] += 1
+                matching_faces.extend(dict(match, face_index=i) for match in track.matches)
+                continue
+
+            # Frames skipped by the degradation level only show what their tracks last found
+            if skip_search:
+                if track is not None and track.matches:
+                    self._stats['tiers']['track_cache'] += 1
+                    matching_faces.extend(dict(match, face_index=i) for match in track.matches)
+                continue
+
+            embedding = track.embedding if track is not None else face['embedding']
+            matches = await self._search_face(embedding, face.get('gender'), search_params)
+
+            if track is not None:
+                track.record_search(face_key, matches)
+            matching_faces.extend(dict(match, face_index=i) for match in matches)
+
+        stats = self._stats
+        context['timing_stats']['elasticsearch_total_hits'] = stats['total_hits']
+        context['timing_stats']['elasticsearch_total_ms'] = stats['took']
+        context['timing_stats']['elasticsearch_response_bytes'] = stats['response_bytes']
+        context['timing_stats']['elasticsearch_parse_ms'] = round(stats['parse_ms'], 3)
+        context['timing_stats']['watchlist_ms'] = round(stats['watchlist_ms'], 3)
+        context['timing_stats']['search_tiers'] = stats['tiers']
+        context['timing_stats']['elasticsearch_coalesced'] = stats['coalesced']
+        context['timing_stats']['elasticsearch_degraded'] = stats['degraded']
+        context['timing_stats']['query_params'] = stats['query_params']
         context['timing_stats']['total_processing_ms'] = round(
-            context['timing_stats']['face_analysis_ms'] + search_timing.get('took', 0), 2
+            context['timing_stats']['face_analysis_ms'] + stats['watchlist_ms'] + stats['took'], 2
         )
         context['matching_faces'] = matching_faces
         context['response_type'] = 'analysis'
-        
+
         return await self._pass_to_next(context)
+
+    async def _search_face(self, embedding, gender, search_params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        stats = self._stats
+
+        # Watchlist tier: a confident in-memory match answers without Elasticsearch
+        if self.gallery is not None and self.gallery.size:
+            watchlist_start = time.time()
+            watchlist_matches = self.gallery.match(embedding, top_k=search_params['size'])
+            stats['watchlist_ms'] += (time.time() - watchlist_start) * 1000
+            if watchlist_matches:
+                stats['tiers']['watchlist'] += 1
+                for match in watchlist_matches:
+                    print(f"  - [watchlist] {match['score']:.3f} - {match.get('metadata')} ")
+                return [self._matching_face(match, 'watchlist') for match in watchlist_matches]
+
+        if not self.search_service.is_connected:
+            return []
+
+        stats['tiers']['elasticsearch'] += 1
+        # Gender is unknown when the genderage model was skipped; search both then
+        filters = None
+        if gender is not None:
+            filters = {"gender": "M" if gender == 1 else "F"}
+
+        if self.tuner is not None and self.tuner.enabled:
+            similar_faces, search_timings = await self._search_tuned(embedding, filters, search_params)
+        else:
+            # Off the event loop, so identical searches from concurrent streams can coalesce
+            similar_faces, search_timing = await asyncio.to_thread(
+                self.search_service.search_similar_faces,
+                embedding,
+                filters=filters,
+                **search_params
+            )
+            search_timings = [search_timing]
+
+        # Per-index searches run side by side, so the slowest one is the search time
+        stats['took'] += max((search_timing.get('took', 0) for search_timing in search_timings), default=0)
+        for search_timing in search_timings:
+            stats['total_hits'] += search_timing.get('total_hits', 0)
+            stats['response_bytes'] += search_timing.get('response_bytes', 0)
+            stats['parse_ms'] += search_timing.get('parse_ms', 0.0)
+            if search_timing.get('degraded'):
+                stats['degraded'] = True
+            if search_timing.get('coalesced'):
+                stats['coalesced'] += 1
+
+        for match in similar_faces:
+            print(f"  - [{match.get('index')}] {match['score']:.3f} - {match.get('metadata')} ")
+        return [self._matching_face(match, 'elasticsearch') for match in similar_faces]
+
+    async def _search_tuned(self, embedding, filters, search_params: Dict[str, Any]) -> tuple:
+        # Each backing index is searched on its own, with the parameters the tuner chose for it
+        plans = await asyncio.to_thread(
+            self.tuner.plan, search_params['indices'], search_params['top_k'], search_params['num_candidates']
+        )
+        results = await asyncio.gather(*(
+            asyncio.to_thread(
+                self.search_service.search_similar_faces,
+                embedding,
+                top_k=plan['k'],
+                num_candidates=plan['num_candidates'],
+                size=search_params['size'],
+                filters=filters,
+                indices=[index],
+                deadline=search_params['deadline'],
+                oversample=plan['oversample']
+            )
+            for index, plan in plans.items()
+        ))
+
+        # Merged like a single collapsed search: one hit per identity, best score first
+        best = {}
+        search_timings = []
+        for (index, plan), (similar_faces, search_timing) in zip(plans.items(), results):
+            self._stats['query_params'][index] = plan
+            search_timings.append(search_timing)
+            if not search_timing.get('error') and not search_timing.get('coalesced'):
+                self.tuner.observe(index, plan, search_timing.get('took', 0), similar_faces, embedding, filters)
+            for match in similar_faces:
+                match_id = QueryTuner.match_id(match)
+                if match_id not in best or match['score'] > best[match_id]['score']:
+                    best[match_id] = match
+        merged = sorted(best.values(), key=lambda match: match['score'], reverse=True)[:search_params['size']]
+        return merged, search_timings
+
+    @staticmethod
+    def _matching_face(match: Dict[str, Any], tier: str) -> Dict[str, Any]:
+        return {
+            'metadata': match.get('metadata'),
+            'score': match['score'],
+            'index': match.get('index'),
+            'tier': tier
+        }
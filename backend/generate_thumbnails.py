@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Pregenerate thumbnails of every indexed face image
+
+Usage: python generate_thumbnails.py [--max-docs N] [--format webp|jpeg]
+"""
+import logging
+import sys
+from dotenv import load_dotenv
+from vectorfaces import VectorSearch, ThumbnailService
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(levelname)s] [%(name)s] - %(message)s'
+)
+
+load_dotenv("env.local")
+
+
+def indexed_image_paths(vector_search: VectorSearch, max_docs: int = None):
+    """Yield each distinct metadata.image_path of the indices behind the search alias"""
+    seen = set()
+    for index in vector_search.resolve_alias_indices(refresh=True):
+        for doc in vector_search.scan_faces(index, max_docs=max_docs, source=["metadata.image_path"]):
+            image_path = doc.get('metadata', {}).get('image_path')
+            if image_path and image_path not in seen:
+                seen.add(image_path)
+                yield image_path
+
+
+if __name__ == "__main__":
+    max_docs = None
+    formats = None
+
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == '--max-docs' and i + 1 < len(sys.argv):
+            max_docs = int(sys.argv[i + 1])
+            i += 2
+        elif sys.argv[i] == '--format' and i + 1 < len(sys.argv):
+            formats = [sys.argv[i + 1]]
+            i += 2
+        else:
+            i += 1
+
+    vector_search = VectorSearch()
+    if not vector_search.is_connected:
+        print("Could not connect to Elasticsearch")
+        sys.exit(1)
+
+    thumbnails = ThumbnailService()
+    result = thumbnails.pregenerate(indexed_image_paths(vector_search, max_docs), formats)
+    print(f"Thumbnails generated: {result['generated']}, already cached: {result['cached']}, failed: {result['failed']}")
+    print(f"Cache: {thumbnails.get_stats()['cache_bytes'] / 1024 / 1024:.1f} MB in {thumbnails.get_stats()['files']} file(s)")
@@ -0,0 +1,15 @@
+import logging
+from dotenv import load_dotenv
+from vectorfaces import InferenceService
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='[%(levelname)s] [%(name)s] - %(message)s'
+)
+
+load_dotenv("env.local")
+
+
+if __name__ == "__main__":
+    InferenceService().serve_forever()
@@ -1,12 +1,17 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, File, UploadFile, Form
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, File, UploadFile, Form, Request
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from contextlib import asynccontextmanager
 import uvicorn
+import asyncio
 import json
 import os
 import uuid
 import base64
 import io
+import itertools
+import tarfile
+import zipfile
+import zlib
 from PIL import Image
 import numpy as np
 from datetime import datetime
@@ -14,8 +19,8 @@ import time
 import traceback
 import logging
 from dotenv import load_dotenv
-from vectorfaces import FaceAnalyzer, VectorSearch
-from chain import FaceAnalysisHandler, VectorSearchHandler, ResponseBuilder
+from vectorfaces import FaceAnalyzer, RemoteFaceAnalyzer, AnalysisCache, InferenceScheduler, DegradationController, EnrollmentDeduplicator, QueryTuner, ROIPlanner, VectorSearch, IndexStatsRefresher, IndexMaintainer, StartupTracker, WatchlistGallery, FaceTracker, ThumbnailService
+from chain import DegradationHandler, ROIDetectionHandler, FaceAnalysisHandler, CropAnalysisHandler, FaceTrackHandler, DetectionNotifyHandler, VectorSearchHandler, ThumbnailHandler, ResponseBuilder
 
 # Configure logging
 logging.basicConfig(
@@ -27,46 +32,134 @@ logger = logging.getLogger(__name__)
 
 load_dotenv("env.local")
 
-face_analyzer = FaceAnalyzer()
-vector_search = VectorSearch()
+# With INFERENCE_SERVICE_ADDRESS set, models live in a shared inference service
+# (python inference_server.py) and this process only decodes frames
+INFERENCE_SERVICE_ADDRESS = os.getenv('INFERENCE_SERVICE_ADDRESS')
+# Resubmitted images (re-uploads, retries, analyze-then-index) are answered from this cache
+analysis_cache = AnalysisCache()
+face_analyzer = RemoteFaceAnalyzer(INFERENCE_SERVICE_ADDRESS, cache=analysis_cache) if INFERENCE_SERVICE_ADDRESS \
+    else FaceAnalyzer(cache=analysis_cache)
+# Live frames, enrollments and batch images take fair turns on the analyzer
+inference_scheduler = InferenceScheduler()
+# Live frames trade quality for latency while the analyzer is saturated
+degradation = DegradationController(inference_scheduler)
+vector_search = VectorSearch(auto_connect=False)
+stats_refresher = IndexStatsRefresher(vector_search)
+# Keeps segment counts of the kNN indices low and batches refreshes during bulk enrollments
+index_maintainer = IndexMaintainer(vector_search)
+# Per-index num_candidates and oversample follow the search latency target
+query_tuner = QueryTuner(vector_search)
+watchlist = WatchlistGallery()
+# Repeated enrollments of one person are skipped, merged or deduplicated by quality
+enrollment = EnrollmentDeduplicator(vector_search)
 
-# Track initialization status
-face_analyzer_initialized = False
+# Track initialization status (face analysis is required, vector search is optional)
+startup = StartupTracker(["face_analyzer", "elasticsearch"], required=["face_analyzer"])
+
+# Latency budget of one websocket frame, propagated into the search request timeouts
+FRAME_BUDGET_MS = float(os.getenv('FRAME_BUDGET_MS', 1500))
+ES_PROBE_INTERVAL = float(os.getenv('ES_PROBE_INTERVAL', 5))
+
+# Batch analysis: images analyzed at once, the most files one request may carry and the largest image read
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', 4))
+BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', 10000))
+BATCH_MAX_IMAGE_BYTES = int(os.getenv('BATCH_MAX_IMAGE_BYTES', 20 * 1024 * 1024))
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+# Directory the watchlist reload endpoint may load gallery files from (unset: index reloads only)
+WATCHLIST_DIR = os.getenv('WATCHLIST_DIR')
 
 # Create uploads directory
 UPLOADS_DIR = "/home/vectorfaces/uploads"
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 
-def initialize_services():
-    global face_analyzer_initialized
-    
-    logger.info("Starting FastAPI server with WebSocket support...")
+thumbnails = ThumbnailService(uploads_dir=UPLOADS_DIR)
+
+def start_face_analyzer():
     logger.info("Initializing FaceAnalyzer...")
+    startup.begin("face_analyzer")
     if face_analyzer.initialize():
+        face_analyzer.warmup()
         logger.info("✅ FaceAnalyzer initialized successfully")
-        face_analyzer_initialized = True
+        # A fixed default would cap calls below the service's worker pool
+        if INFERENCE_SERVICE_ADDRESS and not os.getenv('INFERENCE_CONCURRENCY'):
+            workers = face_analyzer.get_service_stats().get('workers')
+            if workers:
+                inference_scheduler.concurrency = workers
+                logger.info(f"Inference concurrency set to the service's {workers} worker(s)")
+        startup.finish("face_analyzer", StartupTracker.READY)
     else:
         logger.error("❌ FaceAnalyzer initialization failed")
-        face_analyzer_initialized = False
-    
+        startup.finish("face_analyzer", StartupTracker.FAILED, "FaceAnalyzer initialization failed")
+
+def start_vector_search():
     logger.info("Connecting to Elasticsearch...")
-    if vector_search.connect():
-        if vector_search.check_index_exists():
-            logger.info("✅ Elasticsearch connected and index exists")
-        else:
-            logger.warning("⚠️ Elasticsearch connected but index does not exist")
+    startup.begin("elasticsearch")
+    if vector_search.start():
+        vector_search.warmup()
+        logger.info("✅ Elasticsearch connected")
+        startup.finish("elasticsearch", StartupTracker.READY)
     else:
         logger.warning("⚠️ Elasticsearch connection failed - continuing without vector search")
+        startup.finish("elasticsearch", StartupTracker.DEGRADED, "Elasticsearch connection failed")
+    load_watchlist(os.getenv('WATCHLIST_FILE'), os.getenv('WATCHLIST_INDEX'),
+                   json.loads(os.getenv('WATCHLIST_QUERY', 'null')))
+
+def load_watchlist(file: str = None, index: str = None, query: dict = None, max_faces: int = 10000) -> bool:
+    try:
+        if file:
+            watchlist.load_file(file)
+        elif index:
+            watchlist.load_elasticsearch(vector_search, index, query=query, max_faces=max_faces)
+        else:
+            return False
+        return True
+    except Exception as e:
+        logger.error(f"Error loading watchlist: {e}")
+        return False
+
+async def probe_elasticsearch():
+    """Probe Elasticsearch while it is unreachable or the circuit breaker is not closed"""
+    while True:
+        await asyncio.sleep(ES_PROBE_INTERVAL)
+        if vector_search.is_connected and vector_search.breaker.state == vector_search.breaker.CLOSED:
+            continue
+        was_connected = vector_search.is_connected
+        if await asyncio.to_thread(vector_search.probe) and not was_connected:
+            logger.info("✅ Elasticsearch reconnected")
+            startup.finish("elasticsearch", StartupTracker.READY)
+            stats_refresher.start()
+            index_maintainer.start()
+
+async def initialize_services():
+    logger.info("Starting FastAPI server with WebSocket support...")
+    await asyncio.gather(
+        asyncio.to_thread(start_face_analyzer),
+        asyncio.to_thread(start_vector_search)
+    )
+    startup.complete()
+    logger.info(f"Startup completed in {startup.get_status()['startup_ms']}ms")
+    if vector_search.is_connected:
+        stats_refresher.start()
+        index_maintainer.start()
+    await probe_elasticsearch()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    initialize_services()
+    # Models and Elasticsearch start in the background so liveness is served immediately
+    startup_task = asyncio.create_task(initialize_services())
     yield
     logger.info("Shutting down services...")
+    startup_task.cancel()
+    await stats_refresher.stop()
+    await index_maintainer.stop()
 
 app = FastAPI(lifespan=lifespan)
 
 active_connections = []
+# ROI planners of open websocket streams, and the summed counters of closed ones
+roi_planners = {}
+roi_closed_stats = {}
 
 # ============================================================================
 # REST API Endpoints
@@ -77,9 +170,22 @@ async def health_check():
     """API health check endpoint"""
     return {"status": "healthy", "service": "vectorfaces-backend"}
 
+@app.get("/api/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive", "service": "vectorfaces-backend"}
+
+@app.get("/api/health/ready")
+async def readiness_check():
+    """Readiness probe: per-component startup state, 503 until required components are ready"""
+    status = startup.get_status()
+    status["service"] = "vectorfaces-backend"
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
+
 @app.get("/api/stats")
 async def get_stats():
     """Get server and index statistics"""
+    face_analyzer_initialized = startup.is_ready()
     server_status = "running" if face_analyzer_initialized else "initializing"
     
     stats = {
@@ -87,17 +193,81 @@ async def get_stats():
             "status": server_status,
             "active_connections": len(active_connections),
             "timestamp": datetime.now().isoformat(),
-            "face_analyzer_initialized": face_analyzer_initialized
+            "face_analyzer_initialized": face_analyzer_initialized,
+            "startup": startup.get_status(),
+            "pid": os.getpid()
         }
     }
     
+    stats["watchlist"] = watchlist.get_stats()
+    stats["elasticsearch_breaker"] = vector_search.get_breaker_status()
+    stats["thumbnails"] = thumbnails.get_stats()
+    stats["analysis_cache"] = analysis_cache.get_stats()
+    stats["inference_scheduler"] = inference_scheduler.get_stats()
+    stats["degradation"] = degradation.get_stats()
+    stats["roi_detection"] = ROIPlanner.summarize([roi_closed_stats] + [planner.stats for planner in roi_planners.values()])
+    stats["enrollment_dedup"] = enrollment.get_stats()
+    stats["query_tuner"] = query_tuner.get_stats()
+    
+    if isinstance(face_analyzer, RemoteFaceAnalyzer):
+        stats["inference_service"] = await asyncio.to_thread(face_analyzer.get_service_stats)
+    
     if vector_search.is_connected:
-        stats["elasticsearch"] = vector_search.get_index_stats()
+        stats["elasticsearch"] = stats_refresher.index_stats
+        stats["elasticsearch_status"] = stats_refresher.get_status()
+        stats["index_maintenance"] = index_maintainer.get_status()
+        stats["search"] = vector_search.get_search_stats()
     else:
         stats["elasticsearch"] = {"status": "disconnected"}
     
     return stats
 
+@app.get("/api/watchlist")
+async def get_watchlist():
+    """Get watchlist gallery statistics"""
+    return watchlist.get_stats()
+
+@app.post("/api/watchlist/reload")
+async def reload_watchlist(request: dict):
+    """Reload the watchlist gallery from a file or an Elasticsearch query without restarting"""
+    file = request.get('file')
+    index = request.get('index')
+    
+    if not file and not index:
+        raise HTTPException(status_code=400, detail="Provide either 'file' or 'index'")
+    
+    if file:
+        # Clients name a gallery file inside WATCHLIST_DIR, never an arbitrary server path
+        if not WATCHLIST_DIR:
+            raise HTTPException(status_code=400, detail="Reloading from a file requires WATCHLIST_DIR")
+        if not isinstance(file, str) or os.path.basename(file) != file or file in ('.', '..'):
+            raise HTTPException(status_code=400, detail="'file' must be a file name inside WATCHLIST_DIR")
+        file = os.path.join(WATCHLIST_DIR, file)
+    
+    if not await asyncio.to_thread(load_watchlist, file, index, request.get('query'), int(request.get('max_faces', 10000))):
+        raise HTTPException(status_code=500, detail="Watchlist reload failed")
+    
+    return watchlist.get_stats()
+
+@app.get("/api/thumbnails/{size}/{image_path:path}")
+async def get_thumbnail(size: int, image_path: str, request: Request):
+    """Serve a resized result image, WebP for clients that accept it and JPEG otherwise"""
+    if size not in thumbnails.sizes:
+        raise HTTPException(status_code=404, detail=f"Unsupported thumbnail size {size}")
+    
+    image_path = thumbnails.image_path_from_url(image_path)
+    fmt = thumbnails.preferred_format(request.headers.get('accept'))
+    try:
+        data = await asyncio.to_thread(thumbnails.get, image_path, size, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error generating thumbnail for {image_path}: {e}")
+        raise HTTPException(status_code=404, detail="Image not available")
+    
+    return Response(content=data, media_type=f"image/{fmt}",
+                    headers={"Cache-Control": "public, max-age=604800", "Vary": "Accept"})
+
 @app.post("/api/analyze")
 async def analyze_frame(request: dict):
     """Analyze a single frame/image via REST API (face analysis only, no vector search)"""
@@ -110,10 +280,12 @@ async def analyze_frame(request: dict):
         
         context = {
             'image_data': image_data,
-            'timestamp': timestamp
+            'timestamp': timestamp,
+            'client_id': 'rest',
+            'priority': InferenceScheduler.INDEX
         }
         
-        processor = FaceAnalysisHandler(face_analyzer)
+        processor = FaceAnalysisHandler(face_analyzer, scheduler=inference_scheduler)
         
         context = await processor.handle(context)
         
@@ -125,6 +297,160 @@ async def analyze_frame(request: dict):
         logger.error(f"Error in analyze endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+@app.post("/api/recognize")
+async def recognize_crops(request: dict):
+    """Recognize and search face crops detected in the browser, skipping server-side detection"""
+    crops = request.get('crops')
+    if not crops:
+        raise HTTPException(status_code=400, detail="No face crops provided")
+    
+    try:
+        context = {
+            'crops': crops,
+            'genderage': request.get('genderage', True),
+            'timestamp': request.get('timestamp'),
+            'settings': request.get('settings'),
+            'deadline': time.monotonic() + FRAME_BUDGET_MS / 1000,
+            'client_id': 'recognize',
+            'priority': InferenceScheduler.LIVE
+        }
+        
+        processor = CropAnalysisHandler(face_analyzer, inference_scheduler)
+        processor.set_next(VectorSearchHandler(vector_search, watchlist, tuner=query_tuner)) \
+            .set_next(ThumbnailHandler(thumbnails))
+        
+        context = await processor.handle(context)
+        
+        response = ResponseBuilder.build_response(context)
+        
+        return JSONResponse(content=response)
+        
+    except Exception as e:
+        logger.error(f"Error in recognize endpoint: {e}")
+        raise HTTPException(status_code=500, detail=f"Recognition failed: {str(e)}")
+
+def iter_batch_images(files):
+    """
+    Yield (name, bytes, error) for every image of the uploaded files, expanding zip and tar archives lazily
+    
+    An image over BATCH_MAX_IMAGE_BYTES, or an archive that cannot be read any further, yields
+    an error instead of bytes and the batch goes on with the next image or file.
+    """
+    too_large = f"Image exceeds {BATCH_MAX_IMAGE_BYTES} bytes"
+    for upload in files:
+        name = upload.filename or ''
+        lower = name.lower()
+        try:
+            if lower.endswith('.zip'):
+                with zipfile.ZipFile(upload.file) as archive:
+                    for member in archive.infolist():
+                        if not member.is_dir() and member.filename.lower().endswith(IMAGE_EXTENSIONS):
+                            # Reads stop at the declared file_size, so checking it bounds decompression
+                            if member.file_size > BATCH_MAX_IMAGE_BYTES:
+                                yield f"{name}/{member.filename}", None, too_large
+                            else:
+                                yield f"{name}/{member.filename}", archive.read(member), None
+            elif lower.endswith(('.tar', '.tar.gz', '.tgz')):
+                with tarfile.open(fileobj=upload.file, mode='r:*') as archive:
+                    for member in archive:
+                        if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                            if member.size > BATCH_MAX_IMAGE_BYTES:
+                                yield f"{name}/{member.name}", None, too_large
+                            else:
+                                yield f"{name}/{member.name}", archive.extractfile(member).read(), None
+            else:
+                image_bytes = upload.file.read(BATCH_MAX_IMAGE_BYTES + 1)
+                if len(image_bytes) > BATCH_MAX_IMAGE_BYTES:
+                    yield name, None, too_large
+                else:
+                    yield name, image_bytes, None
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError, zlib.error) as e:
+            yield name, None, f"Could not read archive: {e}"
+
+async def analyze_batch_image(index: int, name: str, image_bytes: bytes, search: bool, settings: dict,
+                              client_id: str) -> dict:
+    context = {
+        'image_bytes': image_bytes,
+        'timestamp': datetime.now().isoformat(),
+        'settings': settings,
+        'client_id': client_id,
+        'priority': InferenceScheduler.BATCH
+    }
+    processor = FaceAnalysisHandler(face_analyzer, scheduler=inference_scheduler)
+    if search:
+        processor.set_next(VectorSearchHandler(vector_search, watchlist, tuner=query_tuner)) \
+            .set_next(ThumbnailHandler(thumbnails))
+    try:
+        context = await processor.handle(context)
+        response = ResponseBuilder.build_response(context)
+    except Exception as e:
+        response = {'type': 'error', 'error': str(e)}
+    return {'index': index, 'filename': name, **response}
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(request: Request):
+    """
+    Analyze many images from a multipart upload ('images' files, zip or tar archives allowed)
+    and stream one NDJSON line per image as it completes
+    
+    Form fields: search ('true' to also run vector search per face) and settings (JSON search settings).
+    At most BATCH_CONCURRENCY images of at most BATCH_MAX_IMAGE_BYTES each are read and analyzed
+    at a time, so memory stays bounded whatever the batch size.
+    """
+    form = await request.form(max_files=BATCH_MAX_FILES)
+    files = [item for item in form.getlist('images') if hasattr(item, 'file')]
+    if not files:
+        await form.close()
+        raise HTTPException(status_code=400, detail="No images provided")
+    search = str(form.get('search', 'false')).lower() == 'true'
+    try:
+        settings = json.loads(form.get('settings') or 'null')
+    except ValueError:
+        await form.close()
+        raise HTTPException(status_code=400, detail="settings must be valid JSON")
+    
+    client_id = f"batch-{uuid.uuid4().hex[:8]}"
+    
+    async def stream_results():
+        start = time.time()
+        counts = {'images': 0, 'errors': 0}
+        pending = set()
+        images = iter_batch_images(files)
+        try:
+            while True:
+                # Only pull the next image from the (possibly archived) upload when a slot is free
+                while len(pending) < BATCH_CONCURRENCY:
+                    item = await asyncio.to_thread(next, images, None)
+                    if item is None:
+                        break
+                    name, image_bytes, error = item
+                    if error is not None:
+                        counts['errors'] += 1
+                        yield json.dumps({'index': counts['images'], 'filename': name,
+                                          'type': 'error', 'error': error}) + "\n"
+                    else:
+                        pending.add(asyncio.create_task(
+                            analyze_batch_image(counts['images'], name, image_bytes, search, settings, client_id)
+                        ))
+                    counts['images'] += 1
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if result.get('type') == 'error':
+                        counts['errors'] += 1
+                    yield json.dumps(result) + "\n"
+            yield json.dumps({'type': 'summary', **counts, 'total_ms': round((time.time() - start) * 1000, 2)}) + "\n"
+        finally:
+            for task in pending:
+                task.cancel()
+            images.close()
+            await form.close()
+            inference_scheduler.forget(client_id)
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 @app.post("/api/upload")
 async def upload_image(
     image: UploadFile = File(...),
@@ -137,17 +463,16 @@ async def upload_image(
         
         image_data = await image.read()
         
-        image_base64 = base64.b64encode(image_data).decode('utf-8')
-        image_base64_with_header = f"data:image/jpeg;base64,{image_base64}"
-        
         logger.info(f"Processing uploaded image: {image.filename}")
         
         context = {
-            'image_data': image_base64_with_header,
-            'timestamp': timestamp
+            'image_bytes': image_data,
+            'timestamp': timestamp,
+            'client_id': 'rest',
+            'priority': InferenceScheduler.INDEX
         }
         
-        processor = FaceAnalysisHandler(face_analyzer)
+        processor = FaceAnalysisHandler(face_analyzer, scheduler=inference_scheduler)
         
         context = await processor.handle(context)
         
@@ -159,6 +484,15 @@ async def upload_image(
         logger.error(f"Error in upload endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+def remove_upload(image_path: str):
+    """Delete an uploaded image given its /uploads/... metadata path"""
+    if not image_path:
+        return
+    try:
+        os.remove(os.path.join(UPLOADS_DIR, os.path.basename(image_path)))
+    except OSError as e:
+        logger.warning(f"Could not remove replaced upload {image_path}: {e}")
+
 @app.post("/api/index")
 async def index_base64_image(request: dict):
     """Index face embeddings from base64 image to Elasticsearch"""
@@ -176,7 +510,7 @@ async def index_base64_image(request: dict):
         logger.info(f"Indexing image{f' for {name}' if name else ''}")
         
         face_analysis_start = time.time()
-        analysis_result = face_analyzer.analyze_from_base64(image_base64)
+        analysis_result = await inference_scheduler.run('index', InferenceScheduler.INDEX, face_analyzer.analyze_from_base64, image_base64)
         face_analysis_time_ms = (time.time() - face_analysis_start) * 1000
         
         timing_stats = {
@@ -193,29 +527,26 @@ async def index_base64_image(request: dict):
         
         faces = analysis_result.get('faces', [])
         indexed_faces = []
+        suppressed_faces = []
         
         image_base64_clean = image_base64.split(',')[1] if ',' in image_base64 else image_base64
         image_bytes = base64.b64decode(image_base64_clean)
         
         for i, face in enumerate(faces):
             try:
-                bbox = face.get('bbox', [])
+                bbox = face.get('bbox')
                 confidence = face.get('confidence', 0.0)
                 embedding = face.get('embedding')
                 gender = face.get('gender')
                 age = face.get('age')
                 
-                if not embedding:
+                if embedding is None:
                     logger.warning(f"No embedding found for face {i+1}, skipping")
                     continue
                 
                 face_uuid = str(uuid.uuid4())
                 image_filename = f"{face_uuid}.jpg"
                 image_path = os.path.join(UPLOADS_DIR, image_filename)
-
-                with open(image_path, 'wb') as f:
-                    f.write(image_bytes)
-                logger.info(f"Saved image to {image_path}")
                 
                 gender_str = "M" if gender == 1 else "F" if gender == 0 else "U"
                 
@@ -224,26 +555,40 @@ async def index_base64_image(request: dict):
                     "image_path": f"/uploads/{image_filename}",
                     "age": int(age) if age is not None else None,
                     "confidence": float(confidence),
-                    "bbox": [float(b) for b in bbox] if bbox else [],
+                    "bbox": bbox.tolist() if bbox is not None else [],
                     "uploaded_at": timestamp
                 }
                 
                 if name:
                     metadata["name"] = name
                 
-                index_result = vector_search.index_face(
-                    embedding=embedding,
-                    index_name=vector_search.index_name,
-                    metadata=metadata,
-                    face_id=face_uuid,
-                    document_id=face_uuid
+                index_result = await asyncio.to_thread(
+                    enrollment.enroll, embedding, metadata, FaceTracker.quality_weight(face), face_uuid
                 )
+                action = index_result.get('action')
                 
-                if index_result.get('success'):
-                    logger.info(f"Successfully indexed face {face_uuid}{f' for {name}' if name else ''}")
+                if index_result.get('success') and action in (EnrollmentDeduplicator.SKIPPED, EnrollmentDeduplicator.MERGED):
+                    # The existing document keeps its image; this one is not stored
+                    logger.info(f"Face {i+1} {action} as duplicate of {index_result['duplicate_of']}")
+                    suppressed_faces.append({
+                        "action": action,
+                        "duplicate_of": index_result['duplicate_of'],
+                        "similarity": index_result['similarity'],
+                        "bbox": bbox.tolist() if bbox is not None else []
+                    })
+                elif index_result.get('success'):
+                    # New document, or a better face replacing its duplicate's image
+                    with open(image_path, 'wb') as f:
+                        f.write(image_bytes)
+                    logger.info(f"Saved image to {image_path}")
+                    if action == EnrollmentDeduplicator.REPLACED:
+                        remove_upload(index_result['previous_metadata'].get('image_path'))
+                    
+                    logger.info(f"Successfully indexed face {index_result['document_id']}{f' for {name}' if name else ''}")
                     face_info = {
-                        "id": face_uuid,
-                        "bbox": bbox,
+                        "id": index_result['document_id'],
+                        "action": action,
+                        "bbox": bbox.tolist() if bbox is not None else [],
                         "confidence": confidence,
                         "gender": gender_str,
                         "age": age,
@@ -252,6 +597,8 @@ async def index_base64_image(request: dict):
                     }
                     if name:
                         face_info["name"] = name
+                    if action == EnrollmentDeduplicator.REPLACED:
+                        face_info["similarity"] = index_result['similarity']
                     indexed_faces.append(face_info)
                 else:
                     logger.error(f"Failed to index face {face_uuid}: {index_result.get('error')}")
@@ -262,11 +609,14 @@ async def index_base64_image(request: dict):
         
         timing_stats["total_faces"] = len(faces)
         timing_stats["successfully_indexed"] = len(indexed_faces)
+        timing_stats["duplicates_suppressed"] = len(suppressed_faces)
         
         return JSONResponse(content={
             "success": True,
-            "message": f"Successfully indexed {len(indexed_faces)} face(s)",
+            "message": f"Successfully indexed {len(indexed_faces)} face(s)"
+                       + (f", {len(suppressed_faces)} duplicate(s) suppressed" if suppressed_faces else ""),
             "faces": indexed_faces,
+            "duplicates": suppressed_faces,
             "total_faces": len(faces),
             "timestamp": timestamp,
             "timing_stats": timing_stats
@@ -288,9 +638,26 @@ async def websocket_endpoint(websocket: WebSocket):
     
     logger.info(f"WebSocket connection established. Total connections: {len(active_connections)}")
 
-    # Set up the processing chain
-    processor = FaceAnalysisHandler(face_analyzer)
-    processor.set_next(VectorSearchHandler(vector_search))
+    client_id = f"ws-{uuid.uuid4().hex[:8]}"
+
+    # Set up the processing chain; tracks live as long as the connection
+    tracker = FaceTracker()
+    track_handler = FaceTrackHandler(tracker)
+    track_handler.set_next(DetectionNotifyHandler(lambda message: websocket.send_text(json.dumps(message)))) \
+        .set_next(VectorSearchHandler(vector_search, watchlist, tracker, query_tuner)) \
+        .set_next(ThumbnailHandler(thumbnails))
+    # Live frames never repeat, so they bypass the analysis cache; between full-frame
+    # scans they are only searched for faces around where the last frame had them
+    processor = DegradationHandler(degradation)
+    roi_planners[client_id] = ROIPlanner()
+    processor.set_next(ROIDetectionHandler(roi_planners[client_id])) \
+        .set_next(FaceAnalysisHandler(face_analyzer, use_cache=False, scheduler=inference_scheduler)) \
+        .set_next(track_handler)
+    # Browser-cropped faces skip detection and join the same chain
+    crop_processor = DegradationHandler(degradation)
+    crop_processor.set_next(CropAnalysisHandler(face_analyzer, inference_scheduler)) \
+        .set_next(track_handler)
+    frame_ids = itertools.count(1)
     
     try:
         while True:
@@ -300,6 +667,9 @@ async def websocket_endpoint(websocket: WebSocket):
             try:
                 message = json.loads(data)
                 
+                # Correlates the detections and matches messages of one frame
+                frame_id = message.get('frame_id', next(frame_ids))
+                
                 if message.get('type') == 'frame':
                     timestamp = message.get('timestamp')
                     image_data = message.get('image')
@@ -308,7 +678,11 @@ async def websocket_endpoint(websocket: WebSocket):
                     context = {
                         'image_data': image_data,
                         'timestamp': timestamp,
-                        'settings': settings
+                        'settings': settings,
+                        'deadline': time.monotonic() + FRAME_BUDGET_MS / 1000,
+                        'frame_id': frame_id,
+                        'client_id': client_id,
+                        'priority': InferenceScheduler.LIVE
                     }
                     
                     context = await processor.handle(context)
@@ -316,6 +690,24 @@ async def websocket_endpoint(websocket: WebSocket):
                     response = ResponseBuilder.build_response(context)
                     
                     await websocket.send_text(json.dumps(response))
+                
+                elif message.get('type') == 'crops':
+                    context = {
+                        'crops': message.get('crops') or [],
+                        'genderage': message.get('genderage', True),
+                        'timestamp': message.get('timestamp'),
+                        'settings': message.get('settings'),
+                        'deadline': time.monotonic() + FRAME_BUDGET_MS / 1000,
+                        'frame_id': frame_id,
+                        'client_id': client_id,
+                        'priority': InferenceScheduler.LIVE
+                    }
+                    
+                    context = await crop_processor.handle(context)
+                    
+                    response = ResponseBuilder.build_response(context)
+                    
+                    await websocket.send_text(json.dumps(response))
 
             except json.JSONDecodeError:
                 logger.warning("Received invalid JSON data")
@@ -328,12 +720,15 @@ async def websocket_endpoint(websocket: WebSocket):
         
 
     finally:
+        inference_scheduler.forget(client_id)
+        # Closed streams stay in the ROI detection totals
+        for key, value in roi_planners.pop(client_id).stats.items():
+            roi_closed_stats[key] = roi_closed_stats.get(key, 0) + value
         if websocket in active_connections:
             active_connections.remove(websocket)
         logger.info(f"WebSocket connection closed. Total connections: {len(active_connections)}")
 
 
 if __name__ == "__main__":
-    initialize_services()
     logger.info("Open http://localhost:8000 in your browser to access the webcam stream")
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="debug")
\ No newline at end of file
@@ -3,7 +3,24 @@ vectorfaces - Face Analysis Module
 """
 
 from .face_analyzer import FaceAnalyzer
+from .face_result import FaceResult
+from .analysis_cache import AnalysisCache
 from .vector_search import VectorSearch
+from .stats_refresher import IndexStatsRefresher
+from .index_maintenance import IndexMaintainer
+from .startup import StartupTracker
+from .inference_service import InferenceService, RemoteFaceAnalyzer
+from .watchlist import WatchlistGallery
+from .face_tracker import FaceTracker, FaceTrack
+from .thumbnails import ThumbnailService
+from .scheduler import InferenceScheduler
+from .degradation import DegradationController
+from .enrollment import EnrollmentDeduplicator
+from .query_tuner import QueryTuner
+from .roi_planner import ROIPlanner
 
 __version__ = "1.0.0"
-__all__ = ["FaceAnalyzer", "VectorSearch"]
\ No newline at end of file
+__all__ = ["FaceAnalyzer", "FaceResult", "AnalysisCache", "VectorSearch", "IndexStatsRefresher", "IndexMaintainer", "StartupTracker",
+           "InferenceService", "RemoteFaceAnalyzer", "WatchlistGallery",
+           "FaceTracker", "FaceTrack", "ThumbnailService",
+           "InferenceScheduler", "DegradationController", "EnrollmentDeduplicator", "QueryTuner", "ROIPlanner"]
\ No newline at end of file
@@ -0,0 +1,249 @@
+"""
+Analysis Cache Module for vectorfaces
+Content-addressed cache of face analysis results, bounded in memory with an
+optional on-disk store that survives restarts
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+from .face_result import FaceResult
+
+
+# Bookkeeping bytes charged per entry and per face on top of the array buffers
+ENTRY_OVERHEAD_BYTES = 256
+FACE_OVERHEAD_BYTES = 200
+
+
+class AnalysisCache:
+    """LRU cache of analysis results keyed by a hash of the image file bytes"""
+
+    def __init__(self, max_bytes: int = None, disk_dir: str = None, max_disk_bytes: int = None):
+        """
+        Initialize the AnalysisCache
+
+        Args:
+            max_bytes: Memory budget of cached results (default: from ANALYSIS_CACHE_MB env var, or 64 MB)
+            disk_dir: Directory of the on-disk store; unset keeps the cache in memory only
+                (default: from ANALYSIS_CACHE_DIR env var)
+            max_disk_bytes: Size cap of the on-disk store (default: from ANALYSIS_CACHE_DISK_MB env var, or 1024 MB)
+        """
+        self.max_bytes = max_bytes or int(float(os.getenv('ANALYSIS_CACHE_MB', 64)) * 1024 * 1024)
+        self.disk_dir = disk_dir or os.getenv('ANALYSIS_CACHE_DIR')
+        self.max_disk_bytes = max_disk_bytes or int(float(os.getenv('ANALYSIS_CACHE_DISK_MB', 1024)) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._disk_entries: "OrderedDict[str, int]" = OrderedDict()
+        self.bytes = 0
+        self.disk_bytes = 0
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self.logger = logging.getLogger(__name__)
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def _load_disk_index(self):
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith('.npz'):
+                stat = os.stat(os.path.join(self.disk_dir, name))
+                files.append((stat.st_mtime, name[:-len('.npz')], stat.st_size))
+        for _, key, size in sorted(files):
+            self._disk_entries[key] = size
+            self.disk_bytes += size
+        self.logger.info(f"Analysis cache store has {len(files)} result(s), {self.disk_bytes / 1024 / 1024:.1f} MB")
+
+    @staticmethod
+    def key(image_bytes: bytes, config: str) -> str:
+        """
+        Content key of an image under an analyzer configuration
+
+        Args:
+            image_bytes: Encoded image file contents
+            config: Analyzer configuration tag (model pack, detection size)
+
+        Returns:
+            str: Hex digest
+        """
+        digest = hashlib.blake2b(image_bytes, digest_size=20)
+        digest.update(config.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up an analysis result
+
+        Args:
+            key: Content key from key()
+
+        Returns:
+            dict: Analysis result with fresh FaceResult objects, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if key in self._disk_entries:
+                    self._disk_entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._result(entry)
+            on_disk = key in self._disk_entries
+
+        if on_disk:
+            entry = self._read_disk(key)
+            if entry is not None:
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                    self._insert(key, entry)
+                    # The store evicts least recently used first, also across restarts (by mtime)
+                    if key in self._disk_entries:
+                        self._disk_entries.move_to_end(key)
+                try:
+                    os.utime(os.path.join(self.disk_dir, f"{key}.npz"))
+                except OSError:
+                    pass
+                return self._result(entry)
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """
+        Store a successful analysis result
+
+        Args:
+            key: Content key from key()
+            result: Analysis result with FaceResult faces
+        """
+        entry = (tuple(result.get('faces', [])), result.get('image_shape'))
+        with self._lock:
+            self._insert(key, entry)
+            self.stats["stores"] += 1
+            write_disk = self.disk_dir is not None and key not in self._disk_entries
+        if write_disk:
+            self._write_disk(key, entry)
+
+    @staticmethod
+    def _result(entry: tuple) -> Dict[str, Any]:
+        # Arrays are shared, but every caller gets its own FaceResult records
+        # since the chain sets per-request fields such as track_id
+        faces, image_shape = entry
+        results = []
+        for face in faces:
+            copy = FaceResult(face.bbox, face.confidence, face.age, face.gender, face.embedding, face.landmark)
+            results.append(copy)
+        result = {"success": True, "face_count": len(results), "faces": results, "cached": True}
+        if image_shape is not None:
+            result["image_shape"] = image_shape
+        return result
+
+    @staticmethod
+    def _entry_bytes(entry: tuple) -> int:
+        size = ENTRY_OVERHEAD_BYTES
+        for face in entry[0]:
+            size += FACE_OVERHEAD_BYTES + face.bbox.nbytes
+            if face.embedding is not None:
+                size += face.embedding.nbytes
+            if face.landmark is not None:
+                size += face.landmark.nbytes
+        return size
+
+    def _insert(self, key: str, entry: tuple):
+        # Caller holds self._lock
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        self._entries[key] = entry
+        self.bytes += self._entry_bytes(entry)
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= self._entry_bytes(evicted)
+            self.stats["evictions"] += 1
+
+    def _write_disk(self, key: str, entry: tuple):
+        faces, image_shape = entry
+        arrays = {
+            "bbox": np.array([face.bbox for face in faces], dtype=np.float32).reshape(-1, 4),
+            "confidence": np.array([face.confidence for face in faces], dtype=np.float32),
+            "age": np.array([-1 if face.age is None else face.age for face in faces], dtype=np.int16),
+            "gender": np.array([-1 if face.gender is None else face.gender for face in faces], dtype=np.int8),
+            "image_shape": np.array(image_shape if image_shape is not None else [], dtype=np.int32)
+        }
+        if faces and all(face.embedding is not None for face in faces):
+            arrays["embedding"] = np.stack([face.embedding for face in faces])
+        if faces and all(face.landmark is not None for face in faces):
+            arrays["landmark"] = np.stack([face.landmark for face in faces])
+
+        path = os.path.join(self.disk_dir, f"{key}.npz")
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.warning(f"Could not write analysis cache entry: {e}")
+            return
+
+        size = os.path.getsize(path)
+        evict = []
+        with self._lock:
+            # Concurrent puts of the same key both write it; count the file once
+            self.disk_bytes += size - self._disk_entries.pop(key, 0)
+            self._disk_entries[key] = size
+            while self.disk_bytes > self.max_disk_bytes and len(self._disk_entries) > 1:
+                evicted_key, evicted_size = self._disk_entries.popitem(last=False)
+                self.disk_bytes -= evicted_size
+                evict.append(evicted_key)
+        for evicted_key in evict:
+            try:
+                os.remove(os.path.join(self.disk_dir, f"{evicted_key}.npz"))
+            except FileNotFoundError:
+                pass
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        try:
+            with np.load(os.path.join(self.disk_dir, f"{key}.npz")) as data:
+                faces = []
+                for i in range(len(data["confidence"])):
+                    faces.append(FaceResult(
+                        bbox=data["bbox"][i],
+                        confidence=float(data["confidence"][i]),
+                        age=int(data["age"][i]) if data["age"][i] >= 0 else None,
+                        gender=int(data["gender"][i]) if data["gender"][i] >= 0 else None,
+                        embedding=data["embedding"][i] if "embedding" in data else None,
+                        landmark=data["landmark"][i] if "landmark" in data else None
+                    ))
+                image_shape = tuple(int(v) for v in data["image_shape"]) or None
+            return tuple(faces), image_shape
+        except (OSError, KeyError, ValueError) as e:
+            self.logger.warning(f"Could not read analysis cache entry {key}: {e}")
+            with self._lock:
+                self.disk_bytes -= self._disk_entries.pop(key, 0)
+            return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            dict: Entry counts, memory and disk usage, hit counters and hit rate
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self.bytes
+            stats["disk_entries"] = len(self._disk_entries)
+            stats["disk_bytes"] = self.disk_bytes
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["max_bytes"] = self.max_bytes
+        stats["disk_dir"] = self.disk_dir
+        stats["hit_rate"] = round((stats["hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
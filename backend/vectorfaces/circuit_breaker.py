@@ -0,0 +1,108 @@
+"""
+Circuit Breaker Module for vectorfaces
+Stops sending requests to a failing backend until a probe sees it recover
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any
+
+
+class CircuitBreaker:
+    """
+    Three-state circuit breaker
+
+    closed: requests flow and consecutive failures are counted.
+    open: requests are refused until a background probe succeeds.
+    half_open: requests flow again; the first success closes the breaker and
+    the first failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5):
+        """
+        Initialize the CircuitBreaker
+
+        Args:
+            failure_threshold: Consecutive failures that open the breaker
+        """
+        self.failure_threshold = failure_threshold
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.opened_at = None
+        self.trips = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """
+        Check whether a request may be sent
+
+        Returns:
+            bool: False while the breaker is open
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                self.rejected += 1
+                return False
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self.opened_at = None
+
+    def record_failure(self, error: str):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = error
+            if self.state == self.HALF_OPEN or \
+                    (self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self._trip()
+
+    def record_probe(self, healthy: bool, error: str = None):
+        """
+        Feed the result of a background health probe
+
+        Args:
+            healthy: Whether the backend answered the probe
+            error: Probe error if it failed
+        """
+        with self._lock:
+            if healthy:
+                if self.state == self.OPEN:
+                    self.state = self.HALF_OPEN
+            else:
+                self.last_error = error
+                if self.state != self.OPEN:
+                    self._trip()
+
+    def _trip(self):
+        self.state = self.OPEN
+        self.opened_at = time.time()
+        self.trips += 1
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get breaker state
+
+        Returns:
+            dict: State, failure counters and the last error
+        """
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "opened_at": datetime.fromtimestamp(self.opened_at).isoformat() if self.opened_at else None,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "last_error": self.last_error
+            }
@@ -0,0 +1,103 @@
+"""
+Request Coalescer Module for vectorfaces
+Single-flight execution of concurrent identical requests
+"""
+
+import threading
+from typing import Dict, Any, Callable, Hashable, Optional, Tuple
+
+
+class _Flight:
+    """One in-progress call shared by every caller with the same key"""
+
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class RequestCoalescer:
+    """
+    Runs at most one call per key at a time
+
+    Callers arriving while a call with the same key is in flight wait for it
+    and share its result instead of issuing their own. Nothing is cached once
+    the call completes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Run fn, or wait for the identical call already in flight
+
+        Args:
+            key: Identity of the request
+            fn: Function issuing the request
+            timeout: Seconds a caller waits for another caller's call; the leader's
+                own call is not bounded here (default: no limit)
+
+        Returns:
+            tuple: Result of fn and whether it was shared from another caller
+
+        Raises:
+            TimeoutError: The call in flight did not complete within timeout
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                flight = _Flight()
+                self._flights[key] = flight
+                self.calls += 1
+                leader = True
+
+        if not leader:
+            # The leader may have a later deadline than this caller
+            if not flight.done.wait(timeout if timeout is None else max(timeout, 0)):
+                with self._lock:
+                    self.timeouts += 1
+                raise TimeoutError("Shared request did not complete within the caller's timeout")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get coalescing statistics
+
+        Returns:
+            dict: Issued calls, coalesced callers, callers that gave up waiting and calls currently in flight
+        """
+        with self._lock:
+            in_flight = len(self._flights)
+        requests = self.calls + self.coalesced
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "in_flight": in_flight,
+            "coalesced_ratio": round(self.coalesced / requests, 3) if requests else 0.0
+        }
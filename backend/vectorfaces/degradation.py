@@ -0,0 +1,172 @@
+"""
+Degradation Module for vectorfaces
+Load-aware controller that trades live frame quality for latency
+"""
+
+import os
+import time
+from collections import deque
+from typing import Dict, Any, List
+
+import numpy as np
+
+
+def _level(previous: Dict[str, Any], **changes) -> Dict[str, Any]:
+    # Every level keeps the reductions of the levels before it
+    return dict(previous, **changes)
+
+
+class DegradationController:
+    """
+    Steps live frame processing through degradation levels as load rises
+
+    Load is the inference backlog per analysis slot and the 90th percentile
+    of recent frame latencies against the frame budget. The controller steps
+    up one level at a time while either signal is above its limit, and steps
+    back down once both have stayed low for the recovery interval.
+    """
+
+    _FULL = {"name": "full", "det_size": None, "models": None,
+             "max_k": None, "max_num_candidates": None, "max_size": None,
+             "search_every": 1, "search": True}
+    _REDUCED_DETECTION = _level(_FULL, name="reduced_detection", det_size=(480, 480))
+    _RECOGNITION_ONLY = _level(_REDUCED_DETECTION, name="recognition_only", models=("recognition",))
+    _CAPPED_SEARCH = _level(_RECOGNITION_ONLY, name="capped_search", max_k=20, max_num_candidates=100, max_size=20)
+    _SPARSE_SEARCH = _level(_CAPPED_SEARCH, name="sparse_search", search_every=3)
+    _DETECTION_ONLY = _level(_SPARSE_SEARCH, name="detection_only", det_size=(320, 320), models=(), search=False)
+
+    # Index in the list is the level reported in timing_stats
+    LEVELS: List[Dict[str, Any]] = [
+        _FULL, _REDUCED_DETECTION, _RECOGNITION_ONLY, _CAPPED_SEARCH, _SPARSE_SEARCH, _DETECTION_ONLY
+    ]
+
+    def __init__(self,
+                 scheduler=None,
+                 frame_budget_ms: float = None,
+                 max_queue_depth: float = None,
+                 step_interval: float = None,
+                 recover_interval: float = None,
+                 max_level: int = None,
+                 window: int = 20):
+        """
+        Initialize the DegradationController
+
+        Args:
+            scheduler: InferenceScheduler whose backlog is watched (default: latency only)
+            frame_budget_ms: Target frame latency (default: from FRAME_BUDGET_MS env var, or 1500)
+            max_queue_depth: Queued analysis jobs per concurrency slot tolerated before degrading
+                (default: from DEGRADE_QUEUE_DEPTH env var, or 2)
+            step_interval: Seconds between two steps up (default: from DEGRADE_STEP_INTERVAL env var, or 1.0)
+            recover_interval: Seconds of low load before stepping down one level
+                (default: from DEGRADE_RECOVER_INTERVAL env var, or 5.0)
+            max_level: Highest level the controller may reach; 0 disables degradation
+                (default: from DEGRADE_MAX_LEVEL env var, or the last level)
+            window: Recent frames the latency percentile is computed over
+        """
+        self.scheduler = scheduler
+        self.frame_budget_ms = frame_budget_ms or float(os.getenv('FRAME_BUDGET_MS', 1500))
+        self.max_queue_depth = max_queue_depth or float(os.getenv('DEGRADE_QUEUE_DEPTH', 2))
+        self.step_interval = step_interval or float(os.getenv('DEGRADE_STEP_INTERVAL', 1.0))
+        self.recover_interval = recover_interval or float(os.getenv('DEGRADE_RECOVER_INTERVAL', 5.0))
+        if max_level is None:
+            max_level = int(os.getenv('DEGRADE_MAX_LEVEL', len(self.LEVELS) - 1))
+        self.max_level = max(0, min(len(self.LEVELS) - 1, max_level))
+        self.level = 0
+        self._frame_ms = deque(maxlen=window)
+        self._analysis_ms = deque(maxlen=window)
+        self._search_ms = deque(maxlen=window)
+        self._changed_at = time.monotonic()
+        self._calm_since = None
+        self.transitions = 0
+
+    @property
+    def profile(self) -> Dict[str, Any]:
+        """Reductions of the active level, with its index under 'level'"""
+        return dict(self.LEVELS[self.level], level=self.level)
+
+    def queue_depth(self) -> float:
+        """Queued analysis jobs per concurrency slot"""
+        if self.scheduler is None:
+            return 0.0
+        return self.scheduler.queued() / max(1, self.scheduler.concurrency)
+
+    def frame_p90_ms(self) -> float:
+        """90th percentile latency of the recent frames at the active level"""
+        return float(np.percentile(self._frame_ms, 90)) if self._frame_ms else 0.0
+
+    def observe(self, frame_ms: float, timing_stats: Dict[str, Any] = None) -> int:
+        """
+        Record a finished frame and re-evaluate the level
+
+        Args:
+            frame_ms: End-to-end latency of the frame, including queueing
+            timing_stats: Stage timings of the frame
+
+        Returns:
+            int: Active level after the update
+        """
+        timing_stats = timing_stats or {}
+        self._frame_ms.append(frame_ms)
+        if 'face_analysis_ms' in timing_stats:
+            self._analysis_ms.append(timing_stats['face_analysis_ms'])
+        if 'elasticsearch_total_ms' in timing_stats:
+            self._search_ms.append(timing_stats['elasticsearch_total_ms'])
+        return self.update()
+
+    def update(self) -> int:
+        """
+        Step the level up or down from the current load signals
+
+        Returns:
+            int: Active level after the update
+        """
+        now = time.monotonic()
+        queue_depth = self.queue_depth()
+        # A few frames must have finished at this level before their latency counts
+        latency_known = len(self._frame_ms) >= min(5, self._frame_ms.maxlen)
+        p90 = self.frame_p90_ms()
+
+        overloaded = queue_depth > self.max_queue_depth or (latency_known and p90 > self.frame_budget_ms)
+        calm = queue_depth <= self.max_queue_depth / 4 and (not latency_known or p90 < self.frame_budget_ms / 2)
+
+        if overloaded:
+            self._calm_since = None
+            if self.level < self.max_level and now - self._changed_at >= self.step_interval:
+                self._set_level(self.level + 1, now)
+        elif calm and self.level > 0:
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.recover_interval:
+                self._set_level(self.level - 1, now)
+                # The next step down needs a full calm interval of its own
+                self._calm_since = now
+        else:
+            self._calm_since = None
+
+        return self.level
+
+    def _set_level(self, level: int, now: float):
+        print(f"Degradation level {self.level} -> {level} ({self.LEVELS[level]['name']})")
+        self.level = level
+        self._changed_at = now
+        self._frame_ms.clear()
+        self.transitions += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the active level and the load signals it was chosen from
+
+        Returns:
+            dict: Level, load signals and recent stage latencies
+        """
+        return {
+            "level": self.level,
+            "name": self.LEVELS[self.level]['name'],
+            "max_level": self.max_level,
+            "transitions": self.transitions,
+            "queue_depth": round(self.queue_depth(), 2),
+            "frame_p90_ms": round(self.frame_p90_ms(), 2),
+            "frame_budget_ms": self.frame_budget_ms,
+            "avg_analysis_ms": round(float(np.mean(self._analysis_ms)), 2) if self._analysis_ms else 0.0,
+            "avg_search_ms": round(float(np.mean(self._search_ms)), 2) if self._search_ms else 0.0
+        }
@@ -0,0 +1,277 @@
+"""
+Enrollment Module for vectorfaces
+Near-duplicate suppression for faces enrolled into the uploads index
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Union
+
+import numpy as np
+
+from .vector_search import VectorSearch
+
+
+class EnrollmentDeduplicator:
+    """
+    Checks every enrolled face against recent enrollments and the uploads index
+
+    A face at least `threshold` cosine-similar to an enrolled face of the same
+    name (or an unnamed one) is a duplicate and is handled by the policy:
+
+    - skip: the duplicate is not indexed
+    - merge: the existing document's embedding becomes the quality-weighted
+      mean of all its enrollments
+    - best: the document keeps whichever face has the higher quality
+    - off: every face is indexed
+
+    A name given with a duplicate is copied onto an unnamed document under
+    every policy. Only the recent cache is shared under a lock; concurrent
+    enrollments probe and write Elasticsearch in parallel, and updates of one
+    document take turns.
+    """
+
+    # Policies
+    SKIP = "skip"
+    MERGE = "merge"
+    BEST = "best"
+    OFF = "off"
+
+    # Enrollment actions
+    INDEX = "index"
+    SKIPPED = "skipped"
+    MERGED = "merged"
+    REPLACED = "replaced"
+
+    def __init__(self,
+                 vector_search: VectorSearch,
+                 policy: str = None,
+                 threshold: float = None,
+                 recent_size: int = None):
+        """
+        Initialize the EnrollmentDeduplicator
+
+        Args:
+            vector_search: Connected VectorSearch writing to the uploads index
+            policy: skip, merge, best or off (default: from ENROLL_DEDUP_POLICY env var, or skip)
+            threshold: Lowest cosine similarity counted as a duplicate
+                (default: from ENROLL_DEDUP_THRESHOLD env var, or 0.85)
+            recent_size: Recent enrollments checked locally; they cover faces indexed
+                less than a refresh interval ago, which the kNN probe cannot see yet
+                (default: from ENROLL_DEDUP_RECENT env var, or 256)
+        """
+        self.vector_search = vector_search
+        self.policy = (policy or os.getenv('ENROLL_DEDUP_POLICY', self.SKIP)).lower()
+        if self.policy not in (self.SKIP, self.MERGE, self.BEST, self.OFF):
+            raise ValueError(f"Unknown enrollment dedup policy '{self.policy}'")
+        self.threshold = threshold or float(os.getenv('ENROLL_DEDUP_THRESHOLD', 0.85))
+        self._recent = deque(maxlen=recent_size or int(os.getenv('ENROLL_DEDUP_RECENT', 256)))
+        # Guards the recent cache and stats only; Elasticsearch round trips run outside it
+        self._lock = threading.Lock()
+        # Striped locks serializing merges and replacements of one document
+        self._document_locks = [threading.Lock() for _ in range(64)]
+        self.stats = {"checked": 0, "indexed": 0, "skipped": 0, "merged": 0, "replaced": 0,
+                      "recent_hits": 0, "probe_hits": 0, "probe_errors": 0}
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _unit(embedding: Union[List[float], np.ndarray]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    @staticmethod
+    def _same_identity(name: Optional[str], metadata: Dict[str, Any]) -> bool:
+        # Two enrollments under different names are kept apart however alike they look
+        other = metadata.get('name')
+        return not name or not other or name == other
+
+    def _find_recent(self, unit: np.ndarray, name: Optional[str]) -> Optional[Dict[str, Any]]:
+        # Caller holds self._lock
+        best = None
+        for entry in self._recent:
+            similarity = float(np.dot(entry['unit'], unit))
+            if similarity >= self.threshold and self._same_identity(name, entry['metadata']):
+                if best is None or similarity > best['similarity']:
+                    best = dict(entry, similarity=similarity)
+        if best is not None:
+            self.stats["recent_hits"] += 1
+        return best
+
+    def _probe(self, unit: np.ndarray, name: Optional[str]) -> Optional[Dict[str, Any]]:
+        # Runs without self._lock; the kNN round trip must not serialize enrollments
+        try:
+            for duplicate in self.vector_search.find_near_duplicates(unit, self.threshold):
+                if self._same_identity(name, duplicate['metadata']):
+                    with self._lock:
+                        self.stats["probe_hits"] += 1
+                    duplicate['unit'] = self._unit(duplicate['embedding'])
+                    return duplicate
+        except Exception as e:
+            # Enrollment goes on without dedup rather than failing
+            with self._lock:
+                self.stats["probe_errors"] += 1
+            self.logger.warning(f"Near-duplicate probe failed: {e}")
+        return None
+
+    def find_duplicate(self, embedding: Union[List[float], np.ndarray], name: str = None) -> Optional[Dict[str, Any]]:
+        """
+        Find the enrolled face an embedding duplicates
+
+        Args:
+            embedding: Face embedding to enroll
+            name: Name the face is enrolled under
+
+        Returns:
+            dict: Duplicate with document_id, similarity, embedding and metadata, or None
+        """
+        unit = self._unit(embedding)
+        with self._lock:
+            duplicate = self._find_recent(unit, name)
+        return duplicate or self._probe(unit, name)
+
+    def _document_lock(self, document_id: str) -> threading.Lock:
+        return self._document_locks[hash(document_id) % len(self._document_locks)]
+
+    def enroll(self,
+               embedding: Union[List[float], np.ndarray],
+               metadata: Dict[str, Any],
+               quality: float,
+               face_id: str) -> Dict[str, Any]:
+        """
+        Index a face unless the policy suppresses it as a near duplicate
+
+        Args:
+            embedding: Face embedding
+            metadata: Document metadata (name, image_path, bbox, ...)
+            quality: Face quality weight (see FaceTracker.quality_weight)
+            face_id: Face and document ID used if the face is indexed
+
+        Returns:
+            dict: Result with success status, the action taken (index, skipped, merged
+                or replaced), the document_id holding the face and, for duplicates,
+                duplicate_of, similarity and the replaced metadata
+        """
+        name = metadata.get('name')
+        unit = self._unit(embedding)
+        probed = self._probe(unit, name) if self.policy != self.OFF else None
+
+        # Held until the document exists, so a concurrent enrollment that finds the
+        # reservation below waits for the index call before updating the document.
+        # A thread holds at most one document lock and takes self._lock only inside it.
+        with self._document_lock(face_id):
+            with self._lock:
+                self.stats["checked"] += 1
+                # The recent cache also holds enrollments that started while this one was probing
+                duplicate = self._find_recent(unit, name) if self.policy != self.OFF else None
+                duplicate = duplicate or probed
+                if duplicate is None:
+                    metadata = dict(metadata, quality=quality, enrollments=1)
+                    self._remember(face_id, embedding, metadata)
+
+            if duplicate is None:
+                result = self.vector_search.index_face(
+                    embedding=embedding,
+                    index_name=self.vector_search.index_name,
+                    metadata=metadata,
+                    face_id=face_id,
+                    document_id=face_id
+                )
+                with self._lock:
+                    if result.get('success'):
+                        self.stats["indexed"] += 1
+                    else:
+                        self._forget(face_id)
+                return dict(result, action=self.INDEX)
+
+        # Updates of one document are serialized; each starts from the latest copy
+        with self._document_lock(duplicate['document_id']):
+            with self._lock:
+                latest = next((entry for entry in reversed(self._recent)
+                               if entry['document_id'] == duplicate['document_id']), None)
+            if latest is not None:
+                duplicate = dict(latest, similarity=duplicate['similarity'])
+            return self._update_duplicate(duplicate, embedding, metadata, quality)
+
+    def _update_duplicate(self, duplicate: Dict[str, Any], embedding: Union[List[float], np.ndarray],
+                          metadata: Dict[str, Any], quality: float) -> Dict[str, Any]:
+        existing = duplicate['metadata']
+        existing_quality = float(existing.get('quality') or 0.0)
+        info = {
+            "duplicate_of": duplicate['document_id'],
+            "similarity": round(duplicate['similarity'], 4),
+            "previous_metadata": existing
+        }
+
+        if self.policy == self.SKIP or (self.policy == self.BEST and quality <= existing_quality):
+            self.logger.info(f"Skipped near duplicate of {duplicate['document_id']} "
+                             f"(similarity {duplicate['similarity']:.3f})")
+            # The face is not stored, but the name it was enrolled under is
+            if metadata.get('name') and not existing.get('name'):
+                new_metadata = dict(existing, name=metadata['name'])
+                result = self.vector_search.update_face(duplicate['document_id'], metadata=new_metadata)
+                with self._lock:
+                    if result.get('success'):
+                        self._forget(duplicate['document_id'])
+                        self._remember(duplicate['document_id'], duplicate['embedding'], new_metadata)
+                    self.stats["skipped"] += 1
+                return dict(result, **info, action=self.SKIPPED, document_id=duplicate['document_id'])
+            with self._lock:
+                self.stats["skipped"] += 1
+            return dict(info, success=True, action=self.SKIPPED, document_id=duplicate['document_id'])
+
+        if self.policy == self.MERGE:
+            # Enrollments are weighted by quality; documents without one count as one average face
+            existing_weight = float(existing.get('quality') or quality)
+            total = existing_weight + quality
+            merged = (existing_weight * duplicate['unit'] + quality * self._unit(embedding)) / total
+            new_embedding = self._unit(merged)
+            new_metadata = dict(existing, quality=total, enrollments=int(existing.get('enrollments') or 1) + 1)
+            if metadata.get('name') and not existing.get('name'):
+                new_metadata['name'] = metadata['name']
+            action, counter = self.MERGED, "merged"
+        else:
+            new_embedding = embedding
+            new_metadata = dict(metadata, quality=quality, enrollments=int(existing.get('enrollments') or 1) + 1)
+            # A better but unnamed face keeps the person's name, in the index and in the recent cache
+            if existing.get('name') and not metadata.get('name'):
+                new_metadata['name'] = existing['name']
+            action, counter = self.REPLACED, "replaced"
+
+        result = self.vector_search.update_face(duplicate['document_id'], new_embedding, new_metadata)
+        with self._lock:
+            if result.get('success'):
+                self.stats[counter] += 1
+                self._forget(duplicate['document_id'])
+                self._remember(duplicate['document_id'], new_embedding, new_metadata)
+        return dict(result, **info, action=action, document_id=duplicate['document_id'])
+
+    def _remember(self, document_id: str, embedding: Union[List[float], np.ndarray], metadata: Dict[str, Any]):
+        self._recent.append({
+            "document_id": document_id,
+            "unit": self._unit(embedding),
+            "embedding": np.asarray(embedding, dtype=np.float32),
+            "metadata": metadata
+        })
+
+    def _forget(self, document_id: str):
+        for entry in list(self._recent):
+            if entry['document_id'] == document_id:
+                self._recent.remove(entry)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get dedup statistics
+
+        Returns:
+            dict: Policy, threshold and counts of checked, indexed and suppressed faces
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        stats["policy"] = self.policy
+        stats["threshold"] = self.threshold
+        stats["suppressed"] = stats["skipped"] + stats["merged"] + stats["replaced"]
+        stats["recent"] = len(self._recent)
+        return stats
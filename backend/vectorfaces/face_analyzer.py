@@ -6,26 +6,53 @@ Handles face detection, analysis, and embedding generation using InsightFace
 import cv2
 import numpy as np
 from insightface.app import FaceAnalysis
+from insightface.app.common import Face
+from insightface.utils import face_align
 from PIL import Image
 import io
 import base64
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Any, Optional, Union
+
+from .face_result import FaceResult
+from .analysis_cache import AnalysisCache
+
+
+# ArcFace 5-point landmark template for a 112x112 aligned face, used to warm up the models
+# and as the landmark estimate of face crops sent without landmarks
+ARCFACE_KPS_TEMPLATE = np.array([
+    [38.2946, 51.6963],
+    [73.5318, 51.5014],
+    [56.0252, 71.7366],
+    [41.5493, 92.3655],
+    [70.7299, 92.2041]
+], dtype=np.float32)
+
+# Smallest detector input of a region of interest; smaller crops are upscaled to it
+ROI_MIN_DET_SIZE = 128
 
 
 class FaceAnalyzer:
     """Face analysis class using InsightFace"""
     
-    def __init__(self, providers: List[str] = None, det_size: tuple = (640, 640)):
+    def __init__(self,
+                 providers: List[str] = None,
+                 det_size: tuple = (640, 640),
+                 model_pack: str = 'buffalo_l',
+                 cache: AnalysisCache = None):
         """
         Initialize the FaceAnalyzer
         
         Args:
             providers: List of execution providers (default: ['CPUExecutionProvider'])
             det_size: Detection size for face analysis
+            model_pack: InsightFace model pack name
+            cache: Cache of analysis results keyed by image content (default: no caching)
         """
         self.face_app = None
         self.providers = providers or ['CPUExecutionProvider']
         self.det_size = det_size
+        self.model_pack = model_pack
+        self.cache = cache
         self.is_initialized = False
     
     def initialize(self) -> bool:
@@ -36,7 +63,7 @@ class FaceAnalyzer:
             bool: True if initialization successful, False otherwise
         """
         try:
-            self.face_app = FaceAnalysis(providers=self.providers)
+            self.face_app = FaceAnalysis(name=self.model_pack, providers=self.providers)
             self.face_app.prepare(ctx_id=0, det_size=self.det_size)
             self.is_initialized = True
             print("FaceAnalyzer initialized successfully")
@@ -47,44 +74,153 @@ class FaceAnalyzer:
             self.is_initialized = False
             return False
     
-    def analyze_from_base64(self, image_base64: str) -> Dict:
+    def warmup(self) -> bool:
+        """
+        Run every loaded model once on a blank frame so ONNX sessions allocate
+        their buffers before the first real request
+        
+        Returns:
+            bool: True if warmup successful, False otherwise
+        """
+        if not self.is_initialized or self.face_app is None:
+            return False
+        
+        try:
+            width, height = self.det_size
+            blank = np.zeros((height, width, 3), dtype=np.uint8)
+            face = Face(
+                bbox=np.array([0, 0, 112, 112], dtype=np.float32),
+                kps=ARCFACE_KPS_TEMPLATE,
+                det_score=1.0
+            )
+            for taskname, model in self.face_app.models.items():
+                if taskname == 'detection':
+                    model.detect(blank, max_num=0, metric='default')
+                else:
+                    model.get(blank, face)
+            print("FaceAnalyzer warmup completed")
+            return True
+        except Exception as e:
+            print(f"Error warming up FaceAnalyzer: {e}")
+            return False
+    
+    def analyze_from_base64(self, image_base64: str, use_cache: bool = True, quality: Dict[str, Any] = None) -> Dict:
         """
         Analyze faces in a base64 encoded image
         
         Args:
             image_base64: Base64 encoded image (with or without data URL prefix)
+            use_cache: Look up and store the result in the analysis cache
+            quality: Reduced detection profile, see detect_faces (default: full quality)
         
         Returns:
             dict: Analysis results containing face information
         """
-        if not self.is_initialized or self.face_app is None:
+        if not self.is_initialized:
             return {"error": "FaceAnalyzer not initialized"}
         
         try:
-            # Remove data URL prefix if present
-            if image_base64.startswith('data:image'):
-                image_base64 = image_base64.split(',')[1]
-            
-            # Decode base64 to bytes
-            image_bytes = base64.b64decode(image_base64)
-            
-            # Convert to PIL Image
-            pil_image = Image.open(io.BytesIO(image_bytes))
-            
-            # Convert PIL to OpenCV format (BGR)
-            opencv_image = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
+            image_bytes = self.decode_base64_bytes(image_base64)
+        except Exception as e:
+            return {"error": f"Base64 image analysis failed: {str(e)}"}
+        
+        return self.analyze_from_bytes(image_bytes, use_cache, quality)
+    
+    def analyze_from_bytes(self, image_bytes: bytes, use_cache: bool = True, quality: Dict[str, Any] = None) -> Dict:
+        """
+        Analyze faces in an encoded image (JPEG, PNG, ...) without a base64 round trip
+        
+        Resubmitted images are answered from the analysis cache, if one is configured.
+        Reduced quality results are neither looked up nor stored.
+        
+        Args:
+            image_bytes: Encoded image file contents
+            use_cache: Look up and store the result in the analysis cache
+            quality: Reduced detection profile, see detect_faces (default: full quality)
+        
+        Returns:
+            dict: Analysis results containing face information
+        """
+        if not self.is_initialized:
+            return {"error": "FaceAnalyzer not initialized"}
+        
+        key = None
+        if use_cache and self.cache is not None and not quality:
+            key = self.cache.key(image_bytes, self.cache_config)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        result = self._analyze_bytes(image_bytes, quality)
+        if key is not None and result.get('success'):
+            self.cache.put(key, result)
+        return result
+    
+    @property
+    def cache_config(self) -> str:
+        """Analyzer configuration that cached results depend on"""
+        return f"{self.model_pack}:{self.det_size[0]}x{self.det_size[1]}"
+    
+    def _analyze_bytes(self, image_bytes: bytes, quality: Dict[str, Any] = None) -> Dict:
+        try:
+            opencv_image = cv2.cvtColor(self.decode_image_rgb(image_bytes), cv2.COLOR_RGB2BGR)
             
-            return self.analyze_from_opencv(opencv_image)
+            return self.analyze_from_opencv(opencv_image, quality)
             
         except Exception as e:
-            return {"error": f"Base64 image analysis failed: {str(e)}"}
+            return {"error": f"Image analysis failed: {str(e)}"}
+    
+    @staticmethod
+    def decode_base64_bytes(image_base64: str) -> bytes:
+        """
+        Decode a base64 encoded image to the encoded file bytes
+        
+        Args:
+            image_base64: Base64 encoded image (with or without data URL prefix)
+        
+        Returns:
+            bytes: Encoded image file contents
+        """
+        # Remove data URL prefix if present
+        if image_base64.startswith('data:image'):
+            image_base64 = image_base64.split(',')[1]
+        
+        return base64.b64decode(image_base64)
+    
+    @staticmethod
+    def decode_image_rgb(image_bytes: bytes) -> np.ndarray:
+        """
+        Decode an encoded image to an RGB array
+        
+        Args:
+            image_bytes: Encoded image file contents
+        
+        Returns:
+            np.ndarray: Image in RGB format
+        """
+        return np.array(Image.open(io.BytesIO(image_bytes)).convert('RGB'))
+    
+    @staticmethod
+    def decode_base64_rgb(image_base64: str) -> np.ndarray:
+        """
+        Decode a base64 encoded image to an RGB array
+        
+        Args:
+            image_base64: Base64 encoded image (with or without data URL prefix)
+        
+        Returns:
+            np.ndarray: Image in RGB format
+        """
+        # PNG crops may carry alpha and others may be grayscale; normalize like full frames
+        return FaceAnalyzer.decode_image_rgb(FaceAnalyzer.decode_base64_bytes(image_base64))
     
-    def analyze_from_opencv(self, opencv_image: np.ndarray) -> Dict:
+    def analyze_from_opencv(self, opencv_image: np.ndarray, quality: Dict[str, Any] = None) -> Dict:
         """
         Analyze faces in an OpenCV image
         
         Args:
             opencv_image: OpenCV image in BGR format
+            quality: Reduced detection profile, see detect_faces (default: full quality)
         
         Returns:
             dict: Analysis results containing face information
@@ -94,20 +230,10 @@ class FaceAnalyzer:
         
         try:
             # Analyze faces
-            faces = self.face_app.get(opencv_image)
+            faces = self.detect_faces(opencv_image, quality)
             
-            # Extract face information
-            face_results = []
-            for face in faces:
-                face_info = {
-                    "bbox": face.bbox.tolist(),  # Bounding box [x1, y1, x2, y2]
-                    "confidence": float(face.det_score),  # Detection confidence
-                    "age": int(face.age) if hasattr(face, 'age') else None,
-                    "gender": int(face.gender) if hasattr(face, 'gender') else None,  # 0: female, 1: male
-                    "embedding": face.embedding.tolist() if hasattr(face, 'embedding') else None,
-                    "landmark": face.landmark_2d_106.tolist() if hasattr(face, 'landmark_2d_106') else None
-                }
-                face_results.append(face_info)
+            # Extract face information (float32 buffers are kept, not converted to lists)
+            face_results = [FaceResult.from_insightface(face) for face in faces]
             
             return {
                 "success": True,
@@ -119,7 +245,180 @@ class FaceAnalyzer:
         except Exception as e:
             return {"error": f"OpenCV image analysis failed: {str(e)}"}
     
-    def extract_face_embedding(self, image_base64: str, face_index: int = 0) -> Optional[List[float]]:
+    def detect_faces(self, opencv_image: np.ndarray, quality: Dict[str, Any] = None) -> List[Face]:
+        """
+        Run detection and the per-face models, optionally at reduced quality
+        
+        Args:
+            opencv_image: OpenCV image in BGR format
+            quality: Optional 'det_size' (detector input size, smaller is faster),
+                'models' (names of the per-face models to run after detection, e.g.
+                ('recognition',); an empty tuple detects only; None runs all) and
+                'rois' ([x1, y1, x2, y2] frame regions to detect in instead of the
+                whole frame, see detect_rois)
+        
+        Returns:
+            list: InsightFace Face objects
+        """
+        det_size = quality.get('det_size') if quality else None
+        models = quality.get('models') if quality else None
+        rois = quality.get('rois') if quality else None
+        if det_size is None and models is None and not rois:
+            return self.face_app.get(opencv_image)
+        
+        # Same steps as FaceAnalysis.get, with the detector size, regions and model set overridden
+        if rois:
+            bboxes, kpss = self.detect_rois(opencv_image, rois, det_size)
+        else:
+            bboxes, kpss = self.face_app.det_model.detect(
+                opencv_image, input_size=tuple(det_size) if det_size else None, max_num=0, metric='default'
+            )
+        faces = []
+        for i in range(bboxes.shape[0]):
+            face = Face(bbox=bboxes[i, 0:4], kps=kpss[i] if kpss is not None else None, det_score=bboxes[i, 4])
+            for taskname, model in self.face_app.models.items():
+                if taskname == 'detection' or (models is not None and taskname not in models):
+                    continue
+                model.get(opencv_image, face)
+            faces.append(face)
+        return faces
+    
+    def detect_rois(self, opencv_image: np.ndarray, rois: List[List[int]], det_size: tuple = None) -> tuple:
+        """
+        Run the detector on regions of a frame only
+        
+        Each region gets a detector input that keeps the scale of a full-frame
+        scan, so detection cost follows the area searched. Boxes and landmarks
+        are mapped back to frame coordinates.
+        
+        Args:
+            opencv_image: OpenCV image in BGR format
+            rois: Non-overlapping [x1, y1, x2, y2] regions in frame coordinates
+            det_size: Detector input size of a full-frame scan (default: the analyzer's)
+        
+        Returns:
+            tuple: Detections (N x 5 boxes with scores) and landmarks (N x 5 x 2, or None)
+        """
+        full_size = max(det_size or self.det_size)
+        height, width = opencv_image.shape[:2]
+        # Detector pixels per frame pixel in a full-frame scan
+        scale = full_size / max(height, width)
+        
+        all_bboxes, all_kpss = [], []
+        for roi in rois:
+            x1, y1 = max(0, int(roi[0])), max(0, int(roi[1]))
+            x2, y2 = min(width, int(roi[2])), min(height, int(roi[3]))
+            if x2 - x1 < 2 or y2 - y1 < 2:
+                continue
+            crop = opencv_image[y1:y2, x1:x2]
+            side = int(np.ceil(max(x2 - x1, y2 - y1) * scale / 32)) * 32
+            side = max(ROI_MIN_DET_SIZE, min(side, full_size))
+            bboxes, kpss = self.face_app.det_model.detect(crop, input_size=(side, side), max_num=0, metric='default')
+            if bboxes.shape[0] == 0:
+                continue
+            bboxes = bboxes.copy()
+            bboxes[:, 0:4] += np.array([x1, y1, x1, y1], dtype=bboxes.dtype)
+            all_bboxes.append(bboxes)
+            if kpss is not None:
+                all_kpss.append(kpss + np.array([x1, y1], dtype=kpss.dtype))
+        
+        if not all_bboxes:
+            return np.zeros((0, 5), dtype=np.float32), None
+        return np.concatenate(all_bboxes), np.concatenate(all_kpss) if all_kpss else None
+    
+    def analyze_crops_from_base64(self, crops: List[Dict[str, Any]], genderage: bool = True) -> Dict:
+        """
+        Recognize faces the client has already detected and cropped
+        
+        Args:
+            crops: Dictionaries with a base64 encoded 'image' and optional 'kps'
+                (5 landmark points in crop coordinates), 'bbox' (box in the client's
+                frame) and 'confidence' (client detection score)
+            genderage: Also estimate gender and age
+        
+        Returns:
+            dict: Analysis results containing face information, one face per crop
+        """
+        if not self.is_initialized:
+            return {"error": "FaceAnalyzer not initialized"}
+        
+        try:
+            decoded = []
+            for crop in crops:
+                crop = dict(crop)
+                crop['image'] = cv2.cvtColor(self.decode_base64_rgb(crop['image']), cv2.COLOR_RGB2BGR)
+                decoded.append(crop)
+        except Exception as e:
+            return {"error": f"Base64 crop decoding failed: {str(e)}"}
+        
+        return self.analyze_crops(decoded, genderage)
+    
+    def analyze_crops(self, crops: List[Dict[str, Any]], genderage: bool = True) -> Dict:
+        """
+        Align and embed face crops without running detection
+        
+        Crops without landmarks are assumed to be tight face boxes and are
+        aligned with the ArcFace template scaled to the crop, which is less
+        accurate than client-side landmarks.
+        
+        Args:
+            crops: Dictionaries with an OpenCV BGR 'image' and optional 'kps',
+                'bbox' and 'confidence' (see analyze_crops_from_base64)
+            genderage: Also estimate gender and age
+        
+        Returns:
+            dict: Analysis results containing face information, one face per crop
+        """
+        if not self.is_initialized or self.face_app is None:
+            return {"error": "FaceAnalyzer not initialized"}
+        
+        try:
+            recognition = self.face_app.models['recognition']
+            genderage_model = self.face_app.models.get('genderage') if genderage else None
+            
+            faces = []
+            aligned = []
+            for crop in crops:
+                image = crop['image']
+                height, width = image.shape[:2]
+                if crop.get('kps') is not None:
+                    kps = np.asarray(crop['kps'], dtype=np.float32).reshape(5, 2)
+                else:
+                    kps = ARCFACE_KPS_TEMPLATE * np.array([width / 112.0, height / 112.0], dtype=np.float32)
+                
+                face = Face(
+                    bbox=np.array([0, 0, width, height], dtype=np.float32),
+                    kps=kps,
+                    det_score=float(crop.get('confidence', 1.0))
+                )
+                if genderage_model is not None:
+                    genderage_model.get(image, face)
+                faces.append(face)
+                aligned.append(face_align.norm_crop(image, landmark=kps, image_size=recognition.input_size[0]))
+            
+            # One batched ArcFace run for all crops
+            if aligned:
+                embeddings = recognition.get_feat(aligned)
+                for face, embedding in zip(faces, embeddings):
+                    face.embedding = embedding
+            
+            face_results = []
+            for face, crop in zip(faces, crops):
+                result = FaceResult.from_insightface(face)
+                if crop.get('bbox') is not None:
+                    result.bbox = np.asarray(crop['bbox'], dtype=np.float32)
+                face_results.append(result)
+            
+            return {
+                "success": True,
+                "face_count": len(face_results),
+                "faces": face_results
+            }
+            
+        except Exception as e:
+            return {"error": f"Face crop analysis failed: {str(e)}"}
+    
+    def extract_face_embedding(self, image_base64: str, face_index: int = 0) -> Optional[np.ndarray]:
         """
         Extract face embedding for a specific face
         
@@ -128,7 +427,7 @@ class FaceAnalyzer:
             face_index: Index of the face to extract embedding for (default: 0)
         
         Returns:
-            List of floats representing the face embedding, or None if failed
+            float32 array representing the face embedding, or None if failed
         """
         result = self.analyze_from_base64(image_base64)
         
@@ -0,0 +1,96 @@
+"""
+Face Result Module for vectorfaces
+Compact per-face analysis record holding float32 NumPy buffers
+"""
+
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+
+class FaceResult:
+    """
+    Analysis result for one detected face
+
+    Bounding box, embedding and landmarks stay float32 NumPy arrays while the
+    result travels through the chain; to_dict() converts them to JSON-friendly
+    lists only at the client response edge. Dict-style get() and [] access are
+    supported for code reading the former dictionary results.
+    """
+
+    __slots__ = ("bbox", "confidence", "age", "gender", "embedding", "landmark", "track_id")
+
+    def __init__(self,
+                 bbox: np.ndarray,
+                 confidence: float,
+                 age: Optional[int] = None,
+                 gender: Optional[int] = None,
+                 embedding: Optional[np.ndarray] = None,
+                 landmark: Optional[np.ndarray] = None):
+        """
+        Initialize the FaceResult
+
+        Args:
+            bbox: Bounding box [x1, y1, x2, y2]
+            confidence: Detection confidence
+            age: Estimated age
+            gender: Estimated gender (0: female, 1: male)
+            embedding: Face embedding vector
+            landmark: 2D landmarks, shape (106, 2)
+        """
+        self.bbox = np.asarray(bbox, dtype=np.float32)
+        self.confidence = confidence
+        self.age = age
+        self.gender = gender
+        self.embedding = None if embedding is None else np.asarray(embedding, dtype=np.float32)
+        self.landmark = None if landmark is None else np.asarray(landmark, dtype=np.float32)
+        self.track_id = None
+
+    @classmethod
+    def from_insightface(cls, face: Any) -> 'FaceResult':
+        """
+        Build a FaceResult from an InsightFace Face without copying float32 buffers
+
+        Args:
+            face: InsightFace Face object
+
+        Returns:
+            FaceResult: Compact face result
+        """
+        return cls(
+            bbox=face.bbox,
+            confidence=float(face.det_score),
+            age=int(face.age) if face.age is not None else None,
+            gender=int(face.gender) if face.gender is not None else None,
+            embedding=face.embedding,
+            landmark=face.landmark_2d_106
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self.__slots__:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert to the JSON-friendly dictionary sent to clients
+
+        Returns:
+            dict: Face information with lists instead of arrays
+        """
+        result = {
+            "bbox": self.bbox.tolist(),
+            "confidence": self.confidence,
+            "age": self.age,
+            "gender": self.gender,
+            "embedding": self.embedding.tolist() if self.embedding is not None else None,
+            "landmark": self.landmark.tolist() if self.landmark is not None else None
+        }
+        if self.track_id is not None:
+            result["track_id"] = self.track_id
+        return result
@@ -0,0 +1,202 @@
+"""
+Face Tracker Module for vectorfaces
+Follows faces across consecutive frames of one stream and aggregates their
+embeddings, so a track is searched again only when its identity estimate moves
+"""
+
+import itertools
+import os
+import time
+from typing import Dict, List, Any, Hashable, Optional
+
+import numpy as np
+
+from .face_result import FaceResult
+
+
+def bbox_iou(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Intersection over union of two [x1, y1, x2, y2] boxes
+
+    Args:
+        a: First bounding box
+        b: Second bounding box
+
+    Returns:
+        float: IoU in [0, 1]
+    """
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    intersection = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return float(intersection / union) if union > 0 else 0.0
+
+
+class FaceTrack:
+    """One face followed across frames with a quality-weighted running mean embedding"""
+
+    def __init__(self, track_id: int, face: FaceResult, weight: float, frame_index: int):
+        self.track_id = track_id
+        self.bbox = face.bbox
+        self.embedding = face.embedding.astype(np.float32, copy=True)
+        self.weight_sum = weight
+        self.frames = 1
+        self.last_seen = frame_index
+
+        self.search_key = None
+        self.search_embedding = None
+        self.searched_at = None
+        self.matches = []
+
+    def update(self, face: FaceResult, weight: float, decay: float, frame_index: int):
+        """
+        Fold a new observation into the running mean
+
+        Older observations decay so the mean follows the recent frames.
+
+        Args:
+            face: Face observed in the current frame
+            weight: Quality weight of the observation
+            decay: Weight kept by the previous mean per frame
+            frame_index: Index of the current frame
+        """
+        self.weight_sum = self.weight_sum * decay + weight
+        self.embedding += (weight / self.weight_sum) * (face.embedding - self.embedding)
+        self.bbox = face.bbox
+        self.frames += 1
+        self.last_seen = frame_index
+
+    def can_reuse(self, search_key: Hashable, shift_threshold: float, refresh_interval: float) -> bool:
+        """
+        Check whether the last matches still answer this track
+
+        Args:
+            search_key: Query parameters of the current frame
+            shift_threshold: Minimum cosine similarity between the current aggregate
+                and the one last searched
+            refresh_interval: Maximum age of the last search in seconds
+
+        Returns:
+            bool: True if the last matches can be returned without searching
+        """
+        if self.search_embedding is None or self.search_key != search_key:
+            return False
+        if time.time() - self.searched_at > refresh_interval:
+            return False
+        return self.similarity_to(self.search_embedding) >= shift_threshold
+
+    def record_search(self, search_key: Hashable, matches: List[Dict[str, Any]]):
+        """Remember the matches found for the current aggregate"""
+        self.search_key = search_key
+        self.search_embedding = self.embedding.copy()
+        self.searched_at = time.time()
+        self.matches = matches
+
+    def similarity_to(self, embedding: np.ndarray) -> float:
+        norm = np.linalg.norm(self.embedding) * np.linalg.norm(embedding)
+        return float(np.dot(self.embedding, embedding) / norm) if norm > 0 else 0.0
+
+
+class FaceTracker:
+    """Associates the faces of consecutive frames with tracks by bounding box overlap"""
+
+    def __init__(self,
+                 decay: float = None,
+                 iou_threshold: float = None,
+                 max_missed_frames: int = None,
+                 shift_threshold: float = None,
+                 refresh_interval: float = None):
+        """
+        Initialize the FaceTracker
+
+        Args:
+            decay: Weight kept by a track's previous mean per frame (default: from TRACK_DECAY env var, or 0.8)
+            iou_threshold: Minimum box overlap to continue a track (default: from TRACK_IOU env var, or 0.3)
+            max_missed_frames: Frames a track survives without a detection (default: from TRACK_MAX_MISSED env var, or 5)
+            shift_threshold: Cosine similarity to the last searched aggregate below which a track
+                is searched again (default: from TRACK_SHIFT_THRESHOLD env var, or 0.97)
+            refresh_interval: Seconds after which a track is searched again regardless
+                (default: from TRACK_REFRESH_INTERVAL env var, or 2.0)
+        """
+        self.decay = decay if decay is not None else float(os.getenv('TRACK_DECAY', 0.8))
+        self.iou_threshold = iou_threshold if iou_threshold is not None else float(os.getenv('TRACK_IOU', 0.3))
+        self.max_missed_frames = max_missed_frames if max_missed_frames is not None else int(os.getenv('TRACK_MAX_MISSED', 5))
+        self.shift_threshold = shift_threshold if shift_threshold is not None else float(os.getenv('TRACK_SHIFT_THRESHOLD', 0.97))
+        self.refresh_interval = refresh_interval if refresh_interval is not None else float(os.getenv('TRACK_REFRESH_INTERVAL', 2.0))
+        self.tracks: Dict[int, FaceTrack] = {}
+        self.frame_index = 0
+        self._ids = itertools.count(1)
+
+    @staticmethod
+    def quality_weight(face: FaceResult) -> float:
+        """
+        Weight of an observation: detection confidence times the face's side length,
+        so sharp, large faces dominate the mean
+
+        Args:
+            face: Face observation
+
+        Returns:
+            float: Quality weight
+        """
+        width = max(0.0, float(face.bbox[2] - face.bbox[0]))
+        height = max(0.0, float(face.bbox[3] - face.bbox[1]))
+        return max(face.confidence, 1e-3) * max(np.sqrt(width * height), 1.0)
+
+    def update(self, faces: List[FaceResult]) -> List[Optional[FaceTrack]]:
+        """
+        Associate the faces of a new frame with tracks and update their aggregates
+
+        Args:
+            faces: Faces of the current frame
+
+        Returns:
+            list: Track of each face (None for faces without an embedding)
+        """
+        self.frame_index += 1
+
+        # Greedy association, best overlapping pairs first
+        pairs = []
+        for i, face in enumerate(faces):
+            if face.embedding is None:
+                continue
+            for track_id, track in self.tracks.items():
+                iou = bbox_iou(face.bbox, track.bbox)
+                if iou >= self.iou_threshold:
+                    pairs.append((iou, i, track_id))
+        pairs.sort(reverse=True)
+
+        assigned: List[Optional[FaceTrack]] = [None] * len(faces)
+        used_tracks = set()
+        for _, i, track_id in pairs:
+            if assigned[i] is not None or track_id in used_tracks:
+                continue
+            track = self.tracks[track_id]
+            track.update(faces[i], self.quality_weight(faces[i]), self.decay, self.frame_index)
+            assigned[i] = track
+            used_tracks.add(track_id)
+
+        for i, face in enumerate(faces):
+            if assigned[i] is None and face.embedding is not None:
+                track = FaceTrack(next(self._ids), face, self.quality_weight(face), self.frame_index)
+                self.tracks[track.track_id] = track
+                assigned[i] = track
+
+        for track_id in [tid for tid, track in self.tracks.items()
+                         if self.frame_index - track.last_seen > self.max_missed_frames]:
+            del self.tracks[track_id]
+
+        return assigned
+
+    def can_reuse(self, track: FaceTrack, search_key: Hashable) -> bool:
+        """
+        Check whether a track's last matches can be returned without searching
+
+        Args:
+            track: Face track
+            search_key: Query parameters of the current frame
+
+        Returns:
+            bool: True if no new search is needed
+        """
+        return track.can_reuse(search_key, self.shift_threshold, self.refresh_interval)
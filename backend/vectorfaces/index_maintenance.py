@@ -0,0 +1,273 @@
+"""
+Index Maintenance Module for vectorfaces
+Background segment monitoring, force-merges and refresh interval control
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from .vector_search import VectorSearch
+
+
+class IndexMaintainer:
+    """
+    Background task keeping the kNN indices merged
+
+    Every small segment carries its own HNSW/BBQ graph, and a kNN query
+    searches each graph, so an index fed one document at a time slows down.
+    The maintainer watches segment counts, force-merges the uploads index once
+    it passes the segment threshold, and merges any monitored index with more
+    than the target segment count once search traffic has stayed low. During
+    bulk enrollments it lengthens the uploads refresh interval and restores it
+    afterwards.
+    """
+
+    def __init__(self,
+                 vector_search: VectorSearch,
+                 interval: float = None,
+                 max_segments: int = None,
+                 target_segments: int = None,
+                 idle_qps: float = None,
+                 idle_seconds: float = None,
+                 merge_cooldown: float = None,
+                 bulk_rate: float = None,
+                 bulk_refresh_interval: str = None):
+        """
+        Initialize the IndexMaintainer
+
+        Args:
+            vector_search: Connected VectorSearch instance
+            interval: Seconds between maintenance checks (default: from ES_MAINT_INTERVAL env var, or 10)
+            max_segments: Segment count that triggers a merge (default: from ES_MAINT_MAX_SEGMENTS env var, or 20)
+            target_segments: Segments per shard after a merge (default: from ES_MAINT_TARGET_SEGMENTS env var, or 1)
+            idle_qps: Search rate below which traffic counts as low
+                (default: from ES_MAINT_IDLE_QPS env var, or 0.5)
+            idle_seconds: Seconds traffic must stay low before a low-traffic merge
+                (default: from ES_MAINT_IDLE_SECONDS env var, or 300)
+            merge_cooldown: Seconds before the same index is merged again
+                (default: from ES_MAINT_MERGE_COOLDOWN env var, or 3600)
+            bulk_rate: Enrollments per second that count as a bulk enrollment
+                (default: from ES_MAINT_BULK_RATE env var, or 2)
+            bulk_refresh_interval: Uploads refresh interval during bulk enrollments
+                (default: from ES_MAINT_BULK_REFRESH env var, or 30s)
+        """
+        self.vector_search = vector_search
+        self.interval = interval or float(os.getenv('ES_MAINT_INTERVAL', 10))
+        self.max_segments = max_segments or int(os.getenv('ES_MAINT_MAX_SEGMENTS', 20))
+        self.target_segments = target_segments or int(os.getenv('ES_MAINT_TARGET_SEGMENTS', 1))
+        self.idle_qps = idle_qps if idle_qps is not None else float(os.getenv('ES_MAINT_IDLE_QPS', 0.5))
+        self.idle_seconds = idle_seconds if idle_seconds is not None else float(os.getenv('ES_MAINT_IDLE_SECONDS', 300))
+        self.merge_cooldown = merge_cooldown or float(os.getenv('ES_MAINT_MERGE_COOLDOWN', 3600))
+        self.bulk_rate = bulk_rate or float(os.getenv('ES_MAINT_BULK_RATE', 2))
+        self.bulk_refresh_interval = bulk_refresh_interval or os.getenv('ES_MAINT_BULK_REFRESH', '30s')
+        self.uploads_index = os.getenv('ES_UPLOADS_INDEX')
+
+        self.segment_stats = {}
+        self.merges = deque(maxlen=20)
+        self.merging = None
+        self.bulk_mode = False
+        self.normal_refresh_interval = None
+        self.search_qps = 0.0
+        self.enroll_rate = 0.0
+        self.idle_since = None
+        self.checked_at = None
+        self.last_error = None
+        self._last_merge: Dict[str, float] = {}
+        self._last_counts = None
+        self._task: Optional[asyncio.Task] = None
+        # Referenced so the event loop cannot collect a running merge, and cancelled by stop()
+        self._merge_task: Optional[asyncio.Task] = None
+        self.logger = logging.getLogger(__name__)
+
+    def monitored_indices(self) -> List[str]:
+        """Dataset indices from ES_INDICES plus the uploads index"""
+        indices = self.vector_search.get_stats_indices()
+        if self.uploads_index and self.uploads_index not in indices:
+            indices.append(self.uploads_index)
+        return indices
+
+    def _update_rates(self, now: float):
+        searches = self.vector_search.search_stats["searches"]
+        enrollments = self.vector_search.enrollments
+        if self._last_counts is not None:
+            last_time, last_searches, last_enrollments = self._last_counts
+            elapsed = max(now - last_time, 1e-3)
+            self.search_qps = (searches - last_searches) / elapsed
+            self.enroll_rate = (enrollments - last_enrollments) / elapsed
+            if self.search_qps >= self.idle_qps:
+                self.idle_since = None
+            elif self.idle_since is None:
+                self.idle_since = now
+        self._last_counts = (now, searches, enrollments)
+
+    def is_idle(self, now: float) -> bool:
+        """True once search traffic has stayed below idle_qps for idle_seconds"""
+        return self.idle_since is not None and now - self.idle_since >= self.idle_seconds
+
+    def should_merge(self, index: str, segments: int, now: float) -> bool:
+        """
+        Decide whether an index is due for a force-merge
+
+        Args:
+            index: Index name
+            segments: Current primary segment count
+            now: time.monotonic() of the check
+
+        Returns:
+            bool: True if the index should be merged now
+        """
+        if segments <= self.target_segments:
+            return False
+        if now - self._last_merge.get(index, float('-inf')) < self.merge_cooldown:
+            return False
+        if index == self.uploads_index:
+            # Bulk enrollments keep adding segments; merge once they settle
+            if self.bulk_mode:
+                return False
+            # The small uploads index is merged past the threshold whatever the traffic
+            if segments >= self.max_segments:
+                return True
+        # Merging competes with searches, and a dataset index merge is heavy
+        return self.is_idle(now)
+
+    async def check(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Refresh segment stats, switch bulk mode and start a due merge
+
+        Returns:
+            dict: Freshly collected segment statistics
+        """
+        if not self.vector_search.is_connected:
+            self.last_error = "Not connected to Elasticsearch"
+            return self.segment_stats
+
+        now = time.monotonic()
+        self._update_rates(now)
+        try:
+            self.segment_stats = await asyncio.to_thread(
+                self.vector_search.collect_segment_stats, self.monitored_indices()
+            )
+        except Exception as e:
+            self.logger.error(f"Error collecting segment stats: {e}")
+            self.last_error = str(e)
+            return self.segment_stats
+        self.checked_at = time.time()
+        self.last_error = None
+
+        await self._update_bulk_mode()
+
+        # One merge at a time, in the background so checks keep running
+        if self.merging is None:
+            for index, stats in self.segment_stats.items():
+                if self.should_merge(index, stats['segments'], now):
+                    self.merging = index
+                    self._last_merge[index] = now
+                    self._merge_task = asyncio.create_task(self._merge(index, stats))
+                    break
+        return self.segment_stats
+
+    async def _update_bulk_mode(self):
+        uploads = self.segment_stats.get(self.uploads_index)
+        if uploads is None:
+            return
+        if not self.bulk_mode and self.enroll_rate >= self.bulk_rate:
+            self.normal_refresh_interval = uploads.get('refresh_interval') or '1s'
+            if await asyncio.to_thread(self.vector_search.set_refresh_interval,
+                                       self.uploads_index, self.bulk_refresh_interval):
+                self.bulk_mode = True
+                self.logger.info(f"Bulk enrollment at {self.enroll_rate:.1f}/s: "
+                                 f"refresh interval {self.bulk_refresh_interval}")
+        elif self.bulk_mode and self.enroll_rate < self.bulk_rate / 2:
+            # Refresh right away so the last enrollments become searchable
+            if await asyncio.to_thread(self.vector_search.set_refresh_interval,
+                                       self.uploads_index, self.normal_refresh_interval, True):
+                self.bulk_mode = False
+                self.logger.info(f"Bulk enrollment over: refresh interval {self.normal_refresh_interval}")
+
+    async def _merge(self, index: str, before: Dict[str, Any]):
+        try:
+            self.logger.info(f"Force-merging {index} ({before['segments']} segments)")
+            knn_before_ms = await asyncio.to_thread(self.vector_search.measure_knn_latency, index)
+            started_at = datetime.now().isoformat()
+            result = await asyncio.to_thread(self.vector_search.force_merge, index, self.target_segments)
+            knn_after_ms = await asyncio.to_thread(self.vector_search.measure_knn_latency, index)
+            after = (await asyncio.to_thread(self.vector_search.collect_segment_stats, [index])).get(index, {})
+
+            merge = {
+                "index": index,
+                "started_at": started_at,
+                "success": result['success'],
+                "merge_ms": result['merge_ms'],
+                "segments_before": before['segments'],
+                "segments_after": after.get('segments'),
+                "size_bytes_before": before['size_bytes'],
+                "size_bytes_after": after.get('size_bytes'),
+                "knn_before_ms": knn_before_ms,
+                "knn_after_ms": knn_after_ms
+            }
+            if not result['success']:
+                merge["error"] = result.get('error')
+            self.merges.append(merge)
+            self.logger.info(f"Merged {index}: {merge['segments_before']} -> {merge['segments_after']} segments, "
+                             f"kNN {knn_before_ms}ms -> {knn_after_ms}ms")
+        except asyncio.CancelledError:
+            # Elasticsearch finishes a started merge on its own; only the wait is abandoned
+            self.merges.append({"index": index, "success": False, "error": "Cancelled at shutdown"})
+            raise
+        except Exception as e:
+            self.logger.error(f"Error merging {index}: {e}")
+            self.merges.append({"index": index, "success": False, "error": str(e)})
+        finally:
+            self.merging = None
+
+    async def _run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start the background maintenance loop on the running event loop"""
+        if self._task is None or self._task.done():
+            self.logger.info(f"Checking index segments every {self.interval}s")
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background maintenance loop and any merge it started, then leave bulk mode"""
+        for task in (self._task, self._merge_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._merge_task = None
+        if self.bulk_mode:
+            await asyncio.to_thread(self.vector_search.set_refresh_interval,
+                                    self.uploads_index, self.normal_refresh_interval, True)
+            self.bulk_mode = False
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get segment stats, traffic rates, bulk mode and recent merges
+
+        Returns:
+            dict: Maintenance state with before/after kNN latency of each merge
+        """
+        return {
+            "checked_at": datetime.fromtimestamp(self.checked_at).isoformat() if self.checked_at else None,
+            "last_error": self.last_error,
+            "max_segments": self.max_segments,
+            "search_qps": round(self.search_qps, 2),
+            "idle": self.is_idle(time.monotonic()),
+            "enroll_rate": round(self.enroll_rate, 2),
+            "bulk_mode": self.bulk_mode,
+            "merging": self.merging,
+            "indices": self.segment_stats,
+            "merges": list(self.merges)
+        }
@@ -0,0 +1,562 @@
+"""
+Inference Service Module for vectorfaces
+Shares a pool of model-holding processes between several lightweight web workers
+over a local IPC channel, so the model count is sized to cores instead of web workers
+(run with inference_server.py)
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from multiprocessing.connection import Client, Listener
+from typing import Dict, List, Any, Optional, Tuple, Union
+
+import numpy as np
+
+import cv2
+
+from .face_analyzer import FaceAnalyzer
+from .analysis_cache import AnalysisCache
+from .shm_transport import FrameRing, SlotAllocator
+
+
+DEFAULT_ADDRESS = "/home/vectorfaces/run/inference.sock"
+DEFAULT_AUTHKEY = "vectorfaces"
+
+# Model-holding analyzer and shared frame ring of the current pool process (set by _init_worker)
+_worker_analyzer = None
+_worker_ring = None
+
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """
+    Parse an IPC address: a Unix socket path, or host:port for TCP
+
+    Args:
+        address: Address string
+
+    Returns:
+        Socket path, or (host, port) tuple
+    """
+    if not address.startswith('/') and ':' in address:
+        host, port = address.rsplit(':', 1)
+        return host, int(port)
+    return address
+
+
+def parse_frame_shape(value: str) -> Tuple[int, int, int]:
+    """
+    Parse a WIDTHxHEIGHT frame size into a (height, width, channels) BGR shape
+
+    Args:
+        value: Frame size such as "1280x720"
+
+    Returns:
+        tuple: Frame shape
+    """
+    width, height = value.lower().split('x')
+    return int(height), int(width), 3
+
+
+def _init_worker(providers: List[str], det_size: tuple, ring_description: Optional[Dict] = None):
+    global _worker_analyzer, _worker_ring
+    _worker_analyzer = FaceAnalyzer(providers=providers, det_size=det_size)
+    if _worker_analyzer.initialize():
+        _worker_analyzer.warmup()
+    if ring_description:
+        _worker_ring = FrameRing.attach(ring_description)
+
+
+def _analyze_in_worker(opencv_image: np.ndarray, quality: Optional[Dict] = None) -> Dict:
+    return _worker_analyzer.analyze_from_opencv(opencv_image, quality)
+
+
+def _analyze_slot_in_worker(index: int, shape: Tuple[int, int, int], quality: Optional[Dict] = None) -> Dict:
+    # The frame is read from and the results written to shared memory; only
+    # this small status dictionary crosses the process boundary
+    if not _worker_analyzer.is_initialized:
+        return {"error": "FaceAnalyzer not initialized"}
+
+    try:
+        slot = _worker_ring.slot(index)
+        slot.header["height"], slot.header["width"], slot.header["channels"] = shape
+        faces = _worker_analyzer.detect_faces(slot.frame_view(shape), quality)
+        slot.write_faces(faces)
+        return {"success": True, "face_count": int(slot.header["face_count"])}
+    except Exception as e:
+        return {"error": f"OpenCV image analysis failed: {str(e)}"}
+
+
+def _analyze_crops_in_worker(crops: List[Dict], genderage: bool) -> Dict:
+    # Crops are small enough to pickle; no shared memory slot is involved
+    return _worker_analyzer.analyze_crops(crops, genderage)
+
+
+def _worker_status() -> Tuple[int, bool]:
+    # Held briefly so the status checks of one round spread over the idle workers
+    time.sleep(0.05)
+    return os.getpid(), _worker_analyzer is not None and _worker_analyzer.is_initialized
+
+
+class InferenceService:
+    """Local inference service backed by a pool of FaceAnalyzer processes"""
+
+    def __init__(self,
+                 address: str = None,
+                 num_workers: int = None,
+                 authkey: str = None,
+                 providers: List[str] = None,
+                 det_size: tuple = (640, 640),
+                 shm_slots: int = None,
+                 shm_max_frame: str = None,
+                 start_timeout: float = None):
+        """
+        Initialize the InferenceService
+
+        Args:
+            address: Unix socket path or host:port (default: from INFERENCE_SERVICE_ADDRESS env var)
+            num_workers: Number of model-holding processes (default: from INFERENCE_WORKERS env var,
+                or half the CPU cores since every ONNX session runs its own intra-op thread pool)
+            authkey: Shared secret for IPC connections (default: from INFERENCE_SERVICE_AUTHKEY env var)
+            providers: List of execution providers passed to every FaceAnalyzer
+            det_size: Detection size passed to every FaceAnalyzer
+            shm_slots: Shared memory frame slots, one per client connection; 0 disables the
+                shared memory transport (default: from INFERENCE_SHM_SLOTS env var, or 16)
+            shm_max_frame: Largest WIDTHxHEIGHT frame a slot holds; larger frames are pickled
+                (default: from INFERENCE_SHM_MAX_FRAME env var, or 1280x720)
+            start_timeout: Seconds to wait for every worker to load its models
+                (default: from INFERENCE_START_TIMEOUT env var, or 300)
+        """
+        self.address = address or os.getenv('INFERENCE_SERVICE_ADDRESS', DEFAULT_ADDRESS)
+        self.num_workers = num_workers or int(os.getenv('INFERENCE_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+        self.authkey = (authkey or os.getenv('INFERENCE_SERVICE_AUTHKEY', DEFAULT_AUTHKEY)).encode('utf-8')
+        self.providers = providers or ['CPUExecutionProvider']
+        self.det_size = det_size
+        self.shm_slots = shm_slots if shm_slots is not None else int(os.getenv('INFERENCE_SHM_SLOTS', 16))
+        self.shm_max_frame = parse_frame_shape(shm_max_frame or os.getenv('INFERENCE_SHM_MAX_FRAME', '1280x720'))
+        self.start_timeout = start_timeout or float(os.getenv('INFERENCE_START_TIMEOUT', 300))
+        self.ring = None
+        self.slots = None
+        self.executor = None
+        self.is_ready = False
+        self.started_at = None
+
+        self._lock = threading.Lock()
+        self.clients = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.total_inference_ms = 0.0
+
+        self.logger = logging.getLogger(__name__)
+
+    def start(self):
+        """
+        Spawn the model-holding processes and wait until every one has loaded its models
+
+        The service is ready only if all num_workers processes reported loaded models
+        within start_timeout seconds.
+
+        Raises:
+            RuntimeError: A worker failed to load its models or did not report in time
+        """
+        self.logger.info(f"Starting {self.num_workers} inference worker(s)...")
+        start = time.time()
+        if self.shm_slots > 0:
+            self.ring = FrameRing(num_slots=self.shm_slots, max_frame_shape=self.shm_max_frame)
+            self.slots = SlotAllocator(self.ring)
+            self.logger.info(f"Shared memory transport: {self.shm_slots} slot(s) of {self.ring.slot_size} bytes")
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.providers, self.det_size, self.ring.describe() if self.ring else None)
+        )
+        # A task only runs once its worker's initializer has returned, but one fast worker can
+        # take every task of a round, so rounds repeat until each worker has reported
+        workers = {}
+        deadline = start + self.start_timeout
+        try:
+            while len(workers) < self.num_workers and time.time() < deadline:
+                futures = [self.executor.submit(_worker_status) for _ in range(self.num_workers)]
+                # A worker hanging in its initializer must not hold startup past the deadline
+                for future in futures:
+                    workers.update([future.result(timeout=max(deadline - time.time(), 0))])
+        except FutureTimeoutError:
+            pass
+        self.started_at = time.time()
+        failed = [pid for pid, initialized in workers.items() if not initialized]
+        self.is_ready = len(workers) == self.num_workers and not failed
+        if self.is_ready:
+            self.logger.info(f"{len(workers)} inference worker(s) ready in "
+                             f"{round((self.started_at - start) * 1000, 2)}ms")
+            return
+
+        if failed:
+            error = f"Inference worker(s) {', '.join(map(str, failed))} failed to load their models"
+        else:
+            error = f"Only {len(workers)} of {self.num_workers} inference worker(s) reported within {self.start_timeout}s"
+        self.logger.error(error)
+        # A worker stuck in its initializer would keep the pool, and interpreter exit, waiting on it
+        processes = list((self.executor._processes or {}).values())
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        if self.ring:
+            self.ring.close()
+        raise RuntimeError(error)
+
+    def analyze(self, opencv_image: np.ndarray, quality: Dict = None) -> Dict:
+        """
+        Analyze faces in an OpenCV image on the next free worker process
+
+        Args:
+            opencv_image: OpenCV image in BGR format
+            quality: Reduced detection profile (see FaceAnalyzer.detect_faces)
+
+        Returns:
+            dict: Analysis results containing face information
+        """
+        if self.slots:
+            with self._lock:
+                self.slots.pickled_frames += 1
+        return self._run(_analyze_in_worker, opencv_image, quality)
+
+    def analyze_slot(self, index: int, shape: Tuple[int, int, int], quality: Dict = None) -> Dict:
+        """
+        Analyze the frame a client wrote into its shared memory slot
+
+        Args:
+            index: Slot index assigned to the client connection
+            shape: Frame shape (height, width, channels)
+            quality: Reduced detection profile (see FaceAnalyzer.detect_faces)
+
+        Returns:
+            dict: Status and face count; face results are left in the slot
+        """
+        with self._lock:
+            self.slots.begin_frame()
+        try:
+            return self._run(_analyze_slot_in_worker, index, shape, quality)
+        finally:
+            with self._lock:
+                self.slots.end_frame()
+
+    def analyze_crops(self, crops: List[Dict], genderage: bool = True) -> Dict:
+        """
+        Align and embed face crops on the next free worker process
+
+        Args:
+            crops: Dictionaries with an OpenCV BGR 'image' and optional 'kps', 'bbox' and 'confidence'
+            genderage: Also estimate gender and age
+
+        Returns:
+            dict: Analysis results containing face information, one face per crop
+        """
+        return self._run(_analyze_crops_in_worker, crops, genderage)
+
+    def _run(self, fn, *args) -> Dict:
+        with self._lock:
+            self.in_flight += 1
+            self.requests += 1
+        start = time.time()
+        try:
+            result = self.executor.submit(fn, *args).result()
+            if not result.get('success'):
+                with self._lock:
+                    self.errors += 1
+            return result
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            return {"error": f"Inference worker failed: {str(e)}"}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.total_inference_ms += (time.time() - start) * 1000
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get service statistics
+
+        Returns:
+            dict: Worker count, connected clients, in-flight and completed requests
+        """
+        with self._lock:
+            return {
+                "ready": self.is_ready,
+                "workers": self.num_workers,
+                "clients": self.clients,
+                "in_flight": self.in_flight,
+                "requests": self.requests,
+                "errors": self.errors,
+                "avg_inference_ms": round(self.total_inference_ms / self.requests, 2) if self.requests else 0.0,
+                "uptime_s": round(time.time() - self.started_at, 2) if self.started_at else 0.0,
+                "shared_memory": self.slots.get_stats() if self.slots else None
+            }
+
+    def _handle_client(self, conn):
+        slot_index = None
+        with self._lock:
+            self.clients += 1
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except EOFError:
+                    break
+
+                command = request[0]
+                # The quality profile is optional so older clients keep working
+                if command == "analyze":
+                    response = self.analyze(request[1], request[2] if len(request) > 2 else None)
+                elif command == "analyze_crops":
+                    response = self.analyze_crops(request[1], request[2])
+                elif command == "analyze_slot" and slot_index is not None:
+                    response = self.analyze_slot(slot_index, request[1], request[2] if len(request) > 2 else None)
+                elif command == "attach":
+                    if self.slots and slot_index is None:
+                        with self._lock:
+                            slot_index = self.slots.acquire()
+                    response = {
+                        "success": slot_index is not None,
+                        "slot": slot_index,
+                        "ring": self.ring.describe() if self.ring else None
+                    }
+                elif command == "stats":
+                    response = self.get_stats()
+                elif command == "ping":
+                    response = {"success": self.is_ready}
+                else:
+                    response = {"error": f"Unknown command: {command}"}
+                conn.send(response)
+        except Exception as e:
+            self.logger.error(f"Inference client error: {e}")
+        finally:
+            conn.close()
+            with self._lock:
+                self.clients -= 1
+                if slot_index is not None:
+                    self.slots.release(slot_index)
+
+    def serve_forever(self):
+        """Start the workers and accept web worker connections until interrupted"""
+        address = parse_address(self.address)
+        if isinstance(address, str):
+            os.makedirs(os.path.dirname(address), exist_ok=True)
+            if os.path.exists(address):
+                os.remove(address)
+
+        self.start()
+
+        with Listener(address, authkey=self.authkey) as listener:
+            self.logger.info(f"Inference service listening on {self.address}")
+            try:
+                while True:
+                    conn = listener.accept()
+                    threading.Thread(target=self._handle_client, args=(conn,), daemon=True).start()
+            except KeyboardInterrupt:
+                self.logger.info("Shutting down inference service...")
+            finally:
+                self.executor.shutdown(cancel_futures=True)
+                if self.ring:
+                    self.ring.close()
+
+
+class RemoteFaceAnalyzer(FaceAnalyzer):
+    """FaceAnalyzer that decodes frames locally and forwards them to an InferenceService"""
+
+    def __init__(self,
+                 address: str = None,
+                 authkey: str = None,
+                 det_size: tuple = (640, 640),
+                 connect_timeout: float = 300.0,
+                 use_shared_memory: bool = None,
+                 model_pack: str = 'buffalo_l',
+                 cache: AnalysisCache = None):
+        """
+        Initialize the RemoteFaceAnalyzer
+
+        Args:
+            address: Unix socket path or host:port (default: from INFERENCE_SERVICE_ADDRESS env var)
+            authkey: Shared secret for IPC connections (default: from INFERENCE_SERVICE_AUTHKEY env var)
+            det_size: Detection size configured on the service
+            connect_timeout: Seconds to wait for the service to become ready in initialize()
+            use_shared_memory: Pass frames and results through the service's shared memory
+                slots instead of pickling them (default: from INFERENCE_SHM env var, or True)
+            model_pack: InsightFace model pack loaded by the service
+            cache: Cache of analysis results keyed by image content (default: no caching)
+        """
+        super().__init__(det_size=det_size, model_pack=model_pack, cache=cache)
+        self.address = address or os.getenv('INFERENCE_SERVICE_ADDRESS', DEFAULT_ADDRESS)
+        self.authkey = (authkey or os.getenv('INFERENCE_SERVICE_AUTHKEY', DEFAULT_AUTHKEY)).encode('utf-8')
+        self.connect_timeout = connect_timeout
+        if use_shared_memory is None:
+            use_shared_memory = os.getenv('INFERENCE_SHM', 'true').lower() == 'true'
+        self.use_shared_memory = use_shared_memory
+        self._ring = None
+        self._ring_lock = threading.Lock()
+        self._channels = queue.LifoQueue()
+
+    def _acquire_channel(self) -> Tuple[Any, Any]:
+        # One connection (and its shared memory slot) per concurrent caller, reused from a pool
+        try:
+            return self._channels.get_nowait()
+        except queue.Empty:
+            pass
+
+        conn = Client(parse_address(self.address), authkey=self.authkey)
+        slot = None
+        if self.use_shared_memory:
+            try:
+                conn.send(("attach",))
+                reply = conn.recv()
+            except Exception:
+                conn.close()
+                raise
+            if reply.get('success'):
+                with self._ring_lock:
+                    if self._ring is None:
+                        self._ring = FrameRing.attach(reply['ring'])
+                slot = self._ring.slot(reply['slot'])
+        return conn, slot
+
+    def _request(self, channel: Tuple[Any, Any], *request) -> Any:
+        conn, _ = channel
+        try:
+            conn.send(request)
+            response = conn.recv()
+        except Exception:
+            conn.close()
+            raise
+        self._channels.put(channel)
+        return response
+
+    def _call(self, *request) -> Any:
+        return self._request(self._acquire_channel(), *request)
+
+    def initialize(self) -> bool:
+        """
+        Wait for the inference service to accept connections and report ready
+
+        Returns:
+            bool: True if the service is ready, False otherwise
+        """
+        deadline = time.time() + self.connect_timeout
+        while time.time() < deadline:
+            try:
+                if self._call("ping").get('success'):
+                    self.is_initialized = True
+                    print(f"Connected to inference service at {self.address}")
+                    return True
+            except (OSError, EOFError):
+                pass
+            time.sleep(1.0)
+
+        print(f"Error connecting to inference service at {self.address}")
+        self.is_initialized = False
+        return False
+
+    def warmup(self) -> bool:
+        """Models are warmed up by the inference service itself"""
+        return self.is_initialized
+
+    def _analyze_bytes(self, image_bytes: bytes, quality: Dict = None) -> Dict:
+        # Decode locally, straight into shared memory, and analyze on the service
+        try:
+            rgb_image = self.decode_image_rgb(image_bytes)
+        except Exception as e:
+            return {"error": f"Image analysis failed: {str(e)}"}
+
+        return self._analyze(rgb_image, cv2.COLOR_RGB2BGR, quality)
+
+    def analyze_from_opencv(self, opencv_image: np.ndarray, quality: Dict = None) -> Dict:
+        """
+        Analyze faces in an OpenCV image on the inference service
+
+        Args:
+            opencv_image: OpenCV image in BGR format
+            quality: Reduced detection profile (see FaceAnalyzer.detect_faces)
+
+        Returns:
+            dict: Analysis results containing face information
+        """
+        if not self.is_initialized:
+            return {"error": "FaceAnalyzer not initialized"}
+
+        return self._analyze(opencv_image, quality=quality)
+
+    def analyze_crops(self, crops: List[Dict], genderage: bool = True) -> Dict:
+        """
+        Align and embed face crops on the inference service
+
+        Args:
+            crops: Dictionaries with an OpenCV BGR 'image' and optional 'kps', 'bbox' and 'confidence'
+            genderage: Also estimate gender and age
+
+        Returns:
+            dict: Analysis results containing face information, one face per crop
+        """
+        if not self.is_initialized:
+            return {"error": "FaceAnalyzer not initialized"}
+
+        try:
+            return self._call("analyze_crops", crops, genderage)
+        except Exception as e:
+            return {"error": f"Inference service request failed: {str(e)}"}
+
+    def _analyze(self, image: np.ndarray, color_conversion: int = None, quality: Dict = None) -> Dict:
+        try:
+            channel = self._acquire_channel()
+            _, slot = channel
+
+            if slot is None or not slot.fits(image.shape):
+                if color_conversion is not None:
+                    image = cv2.cvtColor(image, color_conversion)
+                return self._request(channel, "analyze", image, quality)
+
+            # Write the BGR frame directly into the slot and read results from it;
+            # the slot stays ours until the channel goes back to the pool
+            shape = (image.shape[0], image.shape[1], 3)
+            frame = slot.frame_view(shape)
+            if color_conversion is not None:
+                cv2.cvtColor(image, color_conversion, dst=frame)
+            else:
+                np.copyto(frame, image)
+
+            conn, _ = channel
+            try:
+                conn.send(("analyze_slot", shape, quality))
+                response = conn.recv()
+            except Exception:
+                conn.close()
+                raise
+
+            if response.get('success'):
+                response = {
+                    "success": True,
+                    "face_count": response['face_count'],
+                    "faces": slot.read_faces(),
+                    "image_shape": shape
+                }
+            self._channels.put(channel)
+            return response
+        except Exception as e:
+            return {"error": f"Inference service request failed: {str(e)}"}
+
+    def get_service_stats(self) -> Dict[str, Any]:
+        """
+        Get statistics of the shared inference service
+
+        Returns:
+            dict: Service statistics, or an error entry if unreachable
+        """
+        try:
+            return self._call("stats")
+        except Exception as e:
+            return {"error": str(e)}
+
@@ -0,0 +1,299 @@
+"""
+Query Tuner Module for vectorfaces
+Per-index kNN parameters adapted online to a search latency target
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from .vector_search import VectorSearch
+
+
+class _IndexState:
+    __slots__ = ("rung", "latencies", "since_change", "cap", "k_cap", "base_oversample", "p95_ms", "stability",
+                 "queries", "steps_up", "steps_down", "probes", "probing")
+
+    def __init__(self, rung: int, window: int, base_oversample: Optional[float]):
+        self.rung = rung
+        self.latencies = deque(maxlen=window)
+        self.since_change = 0
+        self.cap = None
+        self.k_cap = None
+        self.base_oversample = base_oversample
+        self.p95_ms = None
+        self.stability = None
+        self.queries = 0
+        self.steps_up = 0
+        self.steps_down = 0
+        self.probes = 0
+        self.probing = False
+
+
+class QueryTuner:
+    """
+    Picks num_candidates, k and oversample for every backing index
+
+    Each index climbs or descends a ladder of num_candidates values on its own.
+    The tuner steps down a rung when the index's p95 search latency at the
+    current rung is over the target, and steps up a rung when it is well under
+    it. It does not step up when probes show that the next rung returns the
+    same neighbours anyway. Indices whose mapping sets a rescore_vector
+    oversample also get an oversample that grows with the rung, equal to the
+    mapping's at the start rung. The client's k and num_candidates are upper
+    bounds.
+
+    Tuned searches go to every backing index separately, so tuning is off
+    unless a latency target is configured.
+    """
+
+    # Same values the sidebar offers
+    CANDIDATE_LADDER = (50, 100, 200, 400, 600, 1000)
+    # Rung of the default num_candidates of 200
+    START_RUNG = 2
+
+    def __init__(self,
+                 vector_search: VectorSearch,
+                 target_p95_ms: float = None,
+                 window: int = None,
+                 adjust_every: int = None,
+                 headroom: float = None,
+                 max_oversample: float = None,
+                 probe_every: int = None,
+                 stable_overlap: float = None):
+        """
+        Initialize the QueryTuner
+
+        Args:
+            vector_search: VectorSearch the tuned searches go through
+            target_p95_ms: p95 search latency per index to stay under; 0 disables tuning
+                (default: from QUERY_TUNER_P95_MS env var, or 0)
+            window: Recent searches per index the p95 is computed over
+                (default: from QUERY_TUNER_WINDOW env var, or 50)
+            adjust_every: Searches at a rung before the next decision
+                (default: from QUERY_TUNER_ADJUST_EVERY env var, or 10)
+            headroom: Fraction of the target the p95 must stay under to step up
+                (default: from QUERY_TUNER_HEADROOM env var, or 0.6)
+            max_oversample: Oversample of the top rung (default: from QUERY_TUNER_MAX_OVERSAMPLE
+                env var, or 5, or the mapping's oversample if higher)
+            probe_every: Searches per index between probes of the next rung; 0 disables probes
+                (default: from QUERY_TUNER_PROBE_EVERY env var, or 50)
+            stable_overlap: Overlap with the next rung's results above which stepping up
+                is pointless (default: from QUERY_TUNER_STABLE_OVERLAP env var, or 0.95)
+        """
+        self.vector_search = vector_search
+        if target_p95_ms is None:
+            target_p95_ms = float(os.getenv('QUERY_TUNER_P95_MS', 0))
+        self.target_p95_ms = target_p95_ms
+        self.enabled = target_p95_ms > 0
+        self.window = window or int(os.getenv('QUERY_TUNER_WINDOW', 50))
+        self.adjust_every = adjust_every or int(os.getenv('QUERY_TUNER_ADJUST_EVERY', 10))
+        self.headroom = headroom or float(os.getenv('QUERY_TUNER_HEADROOM', 0.6))
+        self.max_oversample = max_oversample or float(os.getenv('QUERY_TUNER_MAX_OVERSAMPLE', 5))
+        self.probe_every = probe_every if probe_every is not None else int(os.getenv('QUERY_TUNER_PROBE_EVERY', 50))
+        self.stable_overlap = stable_overlap or float(os.getenv('QUERY_TUNER_STABLE_OVERLAP', 0.95))
+
+        self._indices: Dict[str, _IndexState] = {}
+        self._lock = threading.Lock()
+        # Probes run one at a time beside live traffic; an index with a probe pending skips the next one
+        self._probe_executor = None
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def match_id(match: Dict[str, Any]) -> str:
+        """Identity of a search match, the field searches collapse on"""
+        document = match.get('document') or {}
+        return document.get('id') or match.get('face_id') or f"{match.get('index')}/{match.get('document_id')}"
+
+    def _state(self, index: str) -> _IndexState:
+        state = self._indices.get(index)
+        if state is None:
+            state = self._indices[index] = _IndexState(self.START_RUNG, self.window, None)
+        return state
+
+    def _load_options(self, indices: List[str]):
+        missing = [index for index in indices if index not in self._indices]
+        if not missing:
+            return
+        try:
+            options = self.vector_search.get_vector_index_options(missing)
+        except Exception as e:
+            # Unknown indices are tuned on num_candidates only
+            self.logger.warning(f"Could not read index options of {', '.join(missing)}: {e}")
+            options = {}
+        with self._lock:
+            for index in missing:
+                if index not in self._indices:
+                    oversample = (options.get(index) or {}).get('oversample')
+                    self._indices[index] = _IndexState(self.START_RUNG, self.window, oversample)
+
+    def _oversample(self, state: _IndexState, rung: int) -> Optional[float]:
+        # The start rung searches with the mapping's own oversample; only rungs the
+        # latency forced down go below it, and rungs above grow it towards max_oversample
+        if state.base_oversample is None:
+            return None
+        base = state.base_oversample
+        if rung <= self.START_RUNG:
+            return round(1.0 + (base - 1.0) * rung / self.START_RUNG, 2)
+        top = max(self.max_oversample, base)
+        return round(base + (top - base) * (rung - self.START_RUNG) / (len(self.CANDIDATE_LADDER) - 1 - self.START_RUNG), 2)
+
+    def _rung_params(self, state: _IndexState, rung: int, k: int, cap: int) -> Dict[str, Any]:
+        num_candidates = min(self.CANDIDATE_LADDER[rung], cap)
+        # A client cap below the rung also holds the oversample back to the rung it falls on
+        capped_rung = min(rung, max([i for i, value in enumerate(self.CANDIDATE_LADDER) if value <= cap] or [0]))
+        return {
+            "k": min(k, num_candidates),
+            "num_candidates": num_candidates,
+            "oversample": self._oversample(state, capped_rung)
+        }
+
+    def plan(self, indices: Optional[List[str]], k: int, num_candidates: int) -> Dict[str, Dict[str, Any]]:
+        """
+        Choose the query parameters of every index a search targets
+
+        Blocking: the first plan for an index reads its mapping.
+
+        Args:
+            indices: Indices selected by the client (default: all indices behind the alias)
+            k: Client k, an upper bound
+            num_candidates: Client num_candidates, an upper bound
+
+        Returns:
+            dict: Per index, the k, num_candidates and oversample (None where the
+                mapping has no rescore_vector) to search it with
+        """
+        targets = self.vector_search.plan_search_indices(indices)
+        self._load_options(targets)
+        plans = {}
+        with self._lock:
+            for index in targets:
+                state = self._state(index)
+                state.cap = num_candidates
+                state.k_cap = k
+                plans[index] = self._rung_params(state, state.rung, k, num_candidates)
+        return plans
+
+    def observe(self,
+                index: str,
+                params: Dict[str, Any],
+                took_ms: float,
+                matches: List[Dict[str, Any]],
+                embedding=None,
+                filters: Dict = None):
+        """
+        Record a search made with planned parameters and re-evaluate the index's rung
+
+        Args:
+            index: Searched index
+            params: Parameters the search used, as returned by plan
+            took_ms: Server-side search latency
+            matches: Returned matches, compared against probes of the next rung
+            embedding: Query embedding, reused by probes
+            filters: Metadata filters of the search, reused by probes
+        """
+        probe = False
+        with self._lock:
+            state = self._state(index)
+            state.latencies.append(took_ms)
+            state.since_change += 1
+            state.queries += 1
+            if state.since_change >= self.adjust_every:
+                self._adjust(index, state)
+            probe = (self.probe_every > 0 and embedding is not None and bool(matches) and not state.probing
+                     and state.queries % self.probe_every == 0 and self._can_step_up(state))
+            if probe:
+                state.probing = True
+                rung = state.rung
+
+        if probe:
+            if self._probe_executor is None:
+                self._probe_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="query-tuner-probe")
+            self._probe_executor.submit(self._probe, index, rung, matches, embedding, filters)
+
+    def _can_step_up(self, state: _IndexState) -> bool:
+        return state.rung < len(self.CANDIDATE_LADDER) - 1 and \
+            state.cap is not None and self.CANDIDATE_LADDER[state.rung] < state.cap
+
+    def _adjust(self, index: str, state: _IndexState):
+        state.p95_ms = float(np.percentile(list(state.latencies), 95))
+        state.since_change = 0
+        if state.p95_ms > self.target_p95_ms and state.rung > 0:
+            self._set_rung(index, state, state.rung - 1)
+            state.steps_down += 1
+        elif state.p95_ms < self.target_p95_ms * self.headroom and self._can_step_up(state):
+            # The next rung would only cost latency if it finds the same neighbours
+            if state.stability is None or state.stability < self.stable_overlap:
+                self._set_rung(index, state, state.rung + 1)
+                state.steps_up += 1
+
+    def _set_rung(self, index: str, state: _IndexState, rung: int):
+        self.logger.info(f"{index}: num_candidates {self.CANDIDATE_LADDER[state.rung]} -> "
+                         f"{self.CANDIDATE_LADDER[rung]} (p95 {state.p95_ms:.1f}ms, target {self.target_p95_ms}ms)")
+        state.rung = rung
+        # Latencies and stability describe the previous rung
+        state.latencies.clear()
+        state.stability = None
+
+    def _probe(self, index: str, rung: int, matches: List[Dict[str, Any]], embedding, filters):
+        try:
+            with self._lock:
+                state = self._state(index)
+                probe_params = self._rung_params(state, rung + 1, state.k_cap, state.cap)
+            served = [self.match_id(match) for match in matches]
+            probe_matches, timing = self.vector_search.search_similar_faces(
+                embedding,
+                top_k=probe_params['k'],
+                num_candidates=probe_params['num_candidates'],
+                size=len(served),
+                filters=filters,
+                indices=[index],
+                oversample=probe_params['oversample']
+            )
+            if timing.get('error'):
+                return
+            probed = {self.match_id(match) for match in probe_matches}
+            overlap = len(probed.intersection(served)) / len(served)
+            with self._lock:
+                # A probe finishing after the rung changed no longer describes it
+                if state.rung == rung:
+                    state.stability = overlap if state.stability is None else 0.7 * state.stability + 0.3 * overlap
+                    state.probes += 1
+        except Exception as e:
+            self.logger.warning(f"Query tuner probe on {index} failed: {e}")
+        finally:
+            self._indices[index].probing = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get the tuning state of every index seen so far
+
+        Returns:
+            dict: Target, and per index the chosen num_candidates and oversample,
+                the p95 latency at the current rung, result stability and step counts
+        """
+        with self._lock:
+            indices = {
+                index: {
+                    "num_candidates": self.CANDIDATE_LADDER[state.rung],
+                    "oversample": self._oversample(state, state.rung),
+                    "p95_ms": round(state.p95_ms, 2) if state.p95_ms is not None else None,
+                    "samples": len(state.latencies),
+                    "stability": round(state.stability, 3) if state.stability is not None else None,
+                    "queries": state.queries,
+                    "steps_up": state.steps_up,
+                    "steps_down": state.steps_down,
+                    "probes": state.probes
+                }
+                for index, state in self._indices.items()
+            }
+        return {
+            "enabled": self.enabled,
+            "target_p95_ms": self.target_p95_ms,
+            "indices": indices
+        }
@@ -0,0 +1,185 @@
+"""
+ROI Planner Module for vectorfaces
+Chooses the regions of a live frame the face detector has to look at
+"""
+
+import os
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+
+class ROIPlanner:
+    """
+    Restricts detection on a stream to the neighbourhood of the faces it last saw
+
+    Faces in a fixed webcam move little between frames, so after a full-frame
+    scan the following frames are only searched in padded squares around the
+    previous boxes (see FaceAnalyzer.detect_rois). A full-frame scan runs every
+    `full_scan_every` frames to catch newcomers, right after a frame in which
+    fewer faces were found than were looked for, and whenever the regions
+    would cover too much of the frame to save anything.
+
+    One planner follows one stream.
+    """
+
+    def __init__(self,
+                 enabled: bool = None,
+                 full_scan_every: int = None,
+                 padding: float = None,
+                 max_area: float = None):
+        """
+        Initialize the ROIPlanner
+
+        Args:
+            enabled: Detect in regions of interest (default: from ROI_DETECTION env var, or true)
+            full_scan_every: Frames between two full-frame scans (default: from ROI_FULL_SCAN_EVERY env var, or 10)
+            padding: Margin around a face, as a fraction of its larger side on every edge
+                (default: from ROI_PADDING env var, or 0.5)
+            max_area: Fraction of the frame the regions may cover before a full-frame scan
+                is cheaper (default: from ROI_MAX_AREA env var, or 0.5)
+        """
+        if enabled is None:
+            enabled = os.getenv('ROI_DETECTION', 'true').lower() in ('1', 'true', 'yes')
+        self.enabled = enabled
+        self.full_scan_every = full_scan_every or int(os.getenv('ROI_FULL_SCAN_EVERY', 10))
+        self.padding = padding if padding is not None else float(os.getenv('ROI_PADDING', 0.5))
+        self.max_area = max_area or float(os.getenv('ROI_MAX_AREA', 0.5))
+
+        self._boxes: List[np.ndarray] = []
+        self._image_shape = None
+        self._since_full_scan = 0
+        self._rescan = True
+        self.stats = {"frames": 0, "roi_frames": 0, "full_scans": 0, "lost_rescans": 0, "searched_area": 0.0,
+                      "full_scan_ms": 0.0, "roi_ms": 0.0}
+
+    def _regions(self) -> List[List[int]]:
+        height, width = self._image_shape[:2]
+        regions = []
+        for x1, y1, x2, y2 in self._boxes:
+            half = max(x2 - x1, y2 - y1) * (0.5 + self.padding)
+            cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+            regions.append([max(0, int(cx - half)), max(0, int(cy - half)),
+                            min(width, int(np.ceil(cx + half))), min(height, int(np.ceil(cy + half)))])
+
+        # Overlapping regions become their bounding box, so no face is detected twice
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(regions)):
+                for j in range(i + 1, len(regions)):
+                    a, b = regions[i], regions[j]
+                    if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                        regions[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                        del regions[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return regions
+
+    def area_fraction(self, regions: List[List[int]]) -> float:
+        """Fraction of the last frame size covered by non-overlapping regions"""
+        if not regions or self._image_shape is None:
+            return 1.0
+        height, width = self._image_shape[:2]
+        return sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions) / float(width * height)
+
+    def plan(self) -> Optional[List[List[int]]]:
+        """
+        Choose where to detect in the next frame
+
+        Returns:
+            list: [x1, y1, x2, y2] regions in frame coordinates, or None for a full-frame scan
+        """
+        self.stats["frames"] += 1
+        regions = None
+        if self.enabled and not self._rescan and self._boxes and self._since_full_scan < self.full_scan_every - 1:
+            regions = self._regions()
+            if self.area_fraction(regions) > self.max_area:
+                regions = None
+
+        if regions is None:
+            self.stats["full_scans"] += 1
+            self.stats["searched_area"] += 1.0
+        else:
+            self.stats["roi_frames"] += 1
+            self.stats["searched_area"] += self.area_fraction(regions)
+        return regions
+
+    def observe(self, analysis_result: Optional[Dict[str, Any]], regions: Optional[List[List[int]]],
+                analysis_ms: float = None):
+        """
+        Record the faces a planned frame produced
+
+        Args:
+            analysis_result: Face analysis result of the frame (None or an error result
+                forces a full-frame scan next)
+            regions: Regions the frame was planned with, None for a full-frame scan
+            analysis_ms: Face analysis time of the frame, averaged per detection mode in the stats
+        """
+        if analysis_ms is not None:
+            self.stats["full_scan_ms" if regions is None else "roi_ms"] += analysis_ms
+        if not analysis_result or not analysis_result.get('success'):
+            self._boxes = []
+            self._rescan = True
+            return
+
+        boxes = [np.asarray(face['bbox'], dtype=np.float32) for face in analysis_result.get('faces', [])]
+        image_shape = analysis_result.get('image_shape')
+
+        if regions is None:
+            self._since_full_scan = 0
+            self._rescan = False
+        else:
+            self._since_full_scan += 1
+            # A face that left its region (or the frame) may be anywhere now
+            if len(boxes) < len(self._boxes):
+                self._rescan = True
+                self.stats["lost_rescans"] += 1
+
+        # Regions from a frame of another size do not fit
+        if self._image_shape is not None and image_shape is not None and \
+                tuple(image_shape[:2]) != tuple(self._image_shape[:2]):
+            self._rescan = True
+        self._image_shape = image_shape
+        self._boxes = boxes
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get ROI detection statistics of the stream
+
+        Returns:
+            dict: Frame counts by mode, rescans after lost faces, the mean fraction
+                of the frame searched and the mean analysis time per mode
+        """
+        stats = self.summarize([self.stats])
+        stats["enabled"] = self.enabled
+        return stats
+
+    @staticmethod
+    def summarize(counters: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Combine the raw counters (ROIPlanner.stats) of several streams
+
+        Args:
+            counters: stats dictionaries of planners
+
+        Returns:
+            dict: Totals and means in the format of get_stats
+        """
+        totals = {"frames": 0, "roi_frames": 0, "full_scans": 0, "lost_rescans": 0, "searched_area": 0.0,
+                  "full_scan_ms": 0.0, "roi_ms": 0.0}
+        for stats in counters:
+            for key in totals:
+                totals[key] += stats.get(key, 0)
+        frames, full_scans, roi_frames = totals["frames"], totals["full_scans"], totals["roi_frames"]
+        return {
+            "frames": frames,
+            "roi_frames": roi_frames,
+            "full_scans": full_scans,
+            "lost_rescans": totals["lost_rescans"],
+            "mean_searched_area": round(totals["searched_area"] / frames, 3) if frames else None,
+            "mean_full_scan_ms": round(totals["full_scan_ms"] / full_scans, 2) if full_scans else None,
+            "mean_roi_ms": round(totals["roi_ms"] / roi_frames, 2) if roi_frames else None
+        }
@@ -0,0 +1,193 @@
+"""
+Inference Scheduler Module for vectorfaces
+Fair dispatch of face analysis work across connections and priority classes
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Any, Callable, Optional
+
+
+class _Job:
+    __slots__ = ("fn", "args", "future", "enqueued_at")
+
+    def __init__(self, fn: Callable, args: tuple, future: asyncio.Future):
+        self.fn = fn
+        self.args = args
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class _ClientStats:
+    __slots__ = ("priority", "submitted", "completed", "wait_ms", "max_wait_ms")
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.submitted = 0
+        self.completed = 0
+        self.wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+
+class InferenceScheduler:
+    """
+    Runs blocking analysis calls in threads, at most `concurrency` at a time
+
+    Jobs wait in per-client queues grouped by priority class. Classes are
+    picked by stride scheduling on their weights, so lower classes are slowed
+    down but never starved, and clients within a class take turns round-robin,
+    so one client sending frames as fast as it can gets no more than its share.
+    """
+
+    # Priority classes
+    LIVE = "live"
+    INDEX = "index"
+    BATCH = "batch"
+
+    # Out of every 7 jobs dispatched under full load, 4 are live frames,
+    # 2 enrollments and 1 batch image
+    DEFAULT_WEIGHTS = {LIVE: 4, INDEX: 2, BATCH: 1}
+
+    def __init__(self, concurrency: int = None, weights: Dict[str, int] = None):
+        """
+        Initialize the InferenceScheduler
+
+        Args:
+            concurrency: Analysis calls running at once (default: from INFERENCE_CONCURRENCY env var, or 2;
+                the server raises it to the worker count of a shared inference service)
+            weights: Dispatch weight per priority class (default: live 4, index 2, batch 1)
+        """
+        self.concurrency = concurrency or int(os.getenv('INFERENCE_CONCURRENCY', 2))
+        self.weights = weights or dict(self.DEFAULT_WEIGHTS)
+        # priority -> client -> queued jobs; client order is the round-robin order
+        self._queues: Dict[str, "OrderedDict[str, deque]"] = {priority: OrderedDict() for priority in self.weights}
+        self._pass = {priority: 0.0 for priority in self.weights}
+        self._clients: Dict[str, _ClientStats] = {}
+        self.running = 0
+
+    async def run(self, client_id: str, priority: str, fn: Callable, *args) -> Any:
+        """
+        Queue a blocking call and wait for its turn and result
+
+        Args:
+            client_id: Connection or caller the job is accounted to
+            priority: Priority class (LIVE, INDEX or BATCH)
+            fn: Blocking function to run in a worker thread
+            *args: Arguments of fn
+
+        Returns:
+            Result of fn
+        """
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class '{priority}'")
+
+        job = _Job(fn, args, asyncio.get_running_loop().create_future())
+        queue = self._queues[priority].get(client_id)
+        if queue is None:
+            queue = self._queues[priority][client_id] = deque()
+        queue.append(job)
+
+        stats = self._clients.get(client_id)
+        if stats is None:
+            stats = self._clients[client_id] = _ClientStats(priority)
+        stats.submitted += 1
+
+        self._dispatch()
+        return await job.future
+
+    def _next_job(self) -> Optional[tuple]:
+        # Stride scheduling across classes: the busy class with the lowest pass goes next
+        busy = [priority for priority, clients in self._queues.items() if clients]
+        if not busy:
+            return None
+        priority = min(busy, key=lambda p: (self._pass[p], -self.weights[p]))
+        # A class becoming busy again must not cash in the turns it skipped while idle
+        floor = min(self._pass[p] for p in busy)
+        for p in self._queues:
+            if p not in busy:
+                self._pass[p] = max(self._pass[p], floor)
+        self._pass[priority] += 1.0 / self.weights[priority]
+
+        # Round-robin within the class: serve the first client, then move it to the back
+        clients = self._queues[priority]
+        client_id, queue = next(iter(clients.items()))
+        job = queue.popleft()
+        if queue:
+            clients.move_to_end(client_id)
+        else:
+            del clients[client_id]
+        return client_id, job
+
+    def _dispatch(self):
+        while self.running < self.concurrency:
+            item = self._next_job()
+            if item is None:
+                return
+            client_id, job = item
+            if job.future.cancelled():
+                continue
+            self.running += 1
+            asyncio.ensure_future(self._execute(client_id, job))
+
+    async def _execute(self, client_id: str, job: _Job):
+        wait_ms = (time.monotonic() - job.enqueued_at) * 1000
+        # The client may have been forgotten while the job was being dispatched
+        stats = self._clients.get(client_id) or _ClientStats(self.LIVE)
+        stats.wait_ms += wait_ms
+        stats.max_wait_ms = max(stats.max_wait_ms, wait_ms)
+        try:
+            result = await asyncio.to_thread(job.fn, *job.args)
+            if not job.future.done():
+                job.future.set_result(result)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            stats.completed += 1
+            self.running -= 1
+            self._dispatch()
+
+    def queued(self) -> int:
+        """Jobs waiting for a concurrency slot, across all classes"""
+        return sum(len(queue) for clients in self._queues.values() for queue in clients.values())
+
+    def forget(self, client_id: str):
+        """Drop the statistics of a client that has disconnected"""
+        if not any(client_id in clients for clients in self._queues.values()):
+            self._clients.pop(client_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get queue depth and wait time per priority class and per client
+
+        Returns:
+            dict: Running jobs, class weights and depths, per-client queue metrics
+        """
+        classes = {}
+        for priority, clients in self._queues.items():
+            classes[priority] = {
+                "weight": self.weights[priority],
+                "queued": sum(len(queue) for queue in clients.values()),
+                "clients": len(clients)
+            }
+
+        clients = {}
+        for client_id, stats in self._clients.items():
+            queue = self._queues[stats.priority].get(client_id)
+            clients[client_id] = {
+                "priority": stats.priority,
+                "queue_depth": len(queue) if queue else 0,
+                "submitted": stats.submitted,
+                "completed": stats.completed,
+                "avg_wait_ms": round(stats.wait_ms / stats.completed, 2) if stats.completed else 0.0,
+                "max_wait_ms": round(stats.max_wait_ms, 2)
+            }
+
+        return {
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "classes": classes,
+            "clients": clients
+        }
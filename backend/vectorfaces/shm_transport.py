@@ -0,0 +1,297 @@
+"""
+Shared Memory Transport Module for vectorfaces
+Fixed-size slots in a shared memory segment carry decoded frames to inference
+processes and face results back, as NumPy views instead of pickled copies
+"""
+
+import os
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+from .face_result import FaceResult
+
+
+# Per-slot header, written by the inference process after each frame
+HEADER_DTYPE = np.dtype([
+    ("seq", np.int64),
+    ("height", np.int32),
+    ("width", np.int32),
+    ("channels", np.int32),
+    ("face_count", np.int32),
+    ("flags", np.int32),
+    ("truncated", np.int32)
+])
+
+# Header flags: which per-face results are present in the slot
+HAS_GENDERAGE = 1
+HAS_EMBEDDING = 2
+HAS_LANDMARK = 4
+
+ALIGNMENT = 64
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class FrameSlot:
+    """NumPy views over one slot of a FrameRing"""
+
+    def __init__(self, ring: 'FrameRing', index: int):
+        self.index = index
+        self.max_frame_shape = ring.max_frame_shape
+        self.max_faces = ring.max_faces
+
+        buf = ring.shm.buf
+        base = index * ring.slot_size
+        views = {}
+        for name, (offset, shape, dtype) in ring.layout.items():
+            views[name] = np.ndarray(shape, dtype=dtype, buffer=buf, offset=base + offset)
+
+        self.header = views["header"][0]
+        self._frame = views["frame"]
+        self.bboxes = views["bboxes"]
+        self.det_scores = views["det_scores"]
+        self.ages = views["ages"]
+        self.genders = views["genders"]
+        self.embeddings = views["embeddings"]
+        self.landmarks = views["landmarks"]
+
+    def fits(self, shape: Tuple[int, ...]) -> bool:
+        """
+        Check whether a frame of the given shape fits in this slot
+
+        Args:
+            shape: Frame shape (height, width, channels)
+
+        Returns:
+            bool: True if the frame fits
+        """
+        return len(shape) == 3 and shape[2] == self.max_frame_shape[2] and \
+            shape[0] * shape[1] <= self.max_frame_shape[0] * self.max_frame_shape[1]
+
+    def frame_view(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """
+        Get a contiguous frame view of the given shape at the start of the frame area
+
+        Args:
+            shape: Frame shape (height, width, channels)
+
+        Returns:
+            np.ndarray: Writable uint8 view backed by shared memory
+        """
+        height, width, channels = shape
+        return self._frame[:height * width * channels].reshape(height, width, channels)
+
+    def write_faces(self, faces: List[Any]):
+        """
+        Write InsightFace results into the slot
+
+        Args:
+            faces: InsightFace Face objects (or anything with the same attributes)
+        """
+        count = min(len(faces), self.max_faces)
+        flags = 0
+        for i, face in enumerate(faces[:count]):
+            self.bboxes[i] = face.bbox
+            self.det_scores[i] = face.det_score
+            if getattr(face, 'age', None) is not None and getattr(face, 'gender', None) is not None:
+                self.ages[i] = face.age
+                self.genders[i] = face.gender
+                flags |= HAS_GENDERAGE
+            if getattr(face, 'embedding', None) is not None:
+                self.embeddings[i] = face.embedding
+                flags |= HAS_EMBEDDING
+            if getattr(face, 'landmark_2d_106', None) is not None:
+                self.landmarks[i] = face.landmark_2d_106
+                flags |= HAS_LANDMARK
+
+        self.header["seq"] += 1
+        self.header["face_count"] = count
+        self.header["flags"] = flags
+        self.header["truncated"] = len(faces) - count
+
+    def read_faces(self) -> List[FaceResult]:
+        """
+        Read the face results of the last frame in the analyze_from_opencv format
+
+        The arrays are copied out of the slot (a plain memcpy) because the slot is
+        reused by the next frame of the same connection.
+
+        Returns:
+            list: FaceResult records
+        """
+        flags = int(self.header["flags"])
+        face_results = []
+        for i in range(int(self.header["face_count"])):
+            face_results.append(FaceResult(
+                bbox=self.bboxes[i].copy(),
+                confidence=float(self.det_scores[i]),
+                age=int(self.ages[i]) if flags & HAS_GENDERAGE else None,
+                gender=int(self.genders[i]) if flags & HAS_GENDERAGE else None,
+                embedding=self.embeddings[i].copy() if flags & HAS_EMBEDDING else None,
+                landmark=self.landmarks[i].copy() if flags & HAS_LANDMARK else None
+            ))
+        return face_results
+
+
+class FrameRing:
+    """Shared memory segment split into fixed-size frame/result slots"""
+
+    def __init__(self,
+                 num_slots: int = 16,
+                 max_frame_shape: Tuple[int, int, int] = (720, 1280, 3),
+                 max_faces: int = 32,
+                 embedding_dim: int = 512,
+                 landmark_points: int = 106,
+                 name: str = None,
+                 create: bool = True,
+                 owner_pid: int = None):
+        """
+        Initialize the FrameRing
+
+        Args:
+            num_slots: Number of slots in the segment
+            max_frame_shape: Largest frame (height, width, channels) a slot can hold
+            max_faces: Maximum number of face results per slot
+            embedding_dim: Dimension of face embeddings
+            landmark_points: Number of 2D landmark points per face
+            name: Shared memory segment name (required when attaching)
+            create: Create the segment (True) or attach to an existing one (False)
+            owner_pid: Process id of the creating process (set when attaching)
+        """
+        self.num_slots = num_slots
+        self.max_frame_shape = tuple(max_frame_shape)
+        self.max_faces = max_faces
+        self.embedding_dim = embedding_dim
+        self.landmark_points = landmark_points
+        self.is_owner = create
+        self.owner_pid = os.getpid() if create else owner_pid
+
+        regions = [
+            ("header", (1,), HEADER_DTYPE),
+            ("frame", (int(np.prod(self.max_frame_shape)),), np.dtype(np.uint8)),
+            ("bboxes", (max_faces, 4), np.dtype(np.float32)),
+            ("det_scores", (max_faces,), np.dtype(np.float32)),
+            ("ages", (max_faces,), np.dtype(np.int32)),
+            ("genders", (max_faces,), np.dtype(np.int32)),
+            ("embeddings", (max_faces, embedding_dim), np.dtype(np.float32)),
+            ("landmarks", (max_faces, landmark_points, 2), np.dtype(np.float32))
+        ]
+        self.layout = {}
+        offset = 0
+        for region, shape, dtype in regions:
+            self.layout[region] = (offset, shape, dtype)
+            offset = _align(offset + int(np.prod(shape)) * dtype.itemsize)
+        self.slot_size = offset
+
+        self.shm = SharedMemory(name=name, create=create, size=self.slot_size * num_slots if create else 0)
+        if not create and os.getppid() != self.owner_pid:
+            # Only the owner may unlink the segment; keep the resource tracker of
+            # unrelated attaching processes from removing it when they exit
+            # (children of the owner share its tracker and must leave it alone)
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+
+        self.slots = [FrameSlot(self, i) for i in range(num_slots)]
+
+    @classmethod
+    def attach(cls, description: Dict[str, Any]) -> 'FrameRing':
+        """
+        Attach to an existing ring from its description
+
+        Args:
+            description: Output of describe() from the owning process
+
+        Returns:
+            FrameRing: Ring mapped into the current process
+        """
+        return cls(create=False, **description)
+
+    def describe(self) -> Dict[str, Any]:
+        """
+        Describe the ring so other processes can attach to it
+
+        Returns:
+            dict: Segment name and layout parameters
+        """
+        return {
+            "name": self.shm.name,
+            "owner_pid": self.owner_pid,
+            "num_slots": self.num_slots,
+            "max_frame_shape": self.max_frame_shape,
+            "max_faces": self.max_faces,
+            "embedding_dim": self.embedding_dim,
+            "landmark_points": self.landmark_points
+        }
+
+    def slot(self, index: int) -> FrameSlot:
+        """Get the slot at the given index"""
+        return self.slots[index]
+
+    def close(self):
+        """Release the views and unmap the segment (unlinking it if owned)"""
+        self.slots = []
+        self.shm.close()
+        if self.is_owner:
+            self.shm.unlink()
+
+
+class SlotAllocator:
+    """Hands out ring slots to client connections and tracks occupancy"""
+
+    def __init__(self, ring: FrameRing):
+        self.ring = ring
+        self._free = list(range(ring.num_slots - 1, -1, -1))
+        self.busy = 0
+        self.peak_busy = 0
+        self.shm_frames = 0
+        self.pickled_frames = 0
+        self.exhausted = 0
+
+    def acquire(self) -> Optional[int]:
+        """
+        Assign a free slot
+
+        Returns:
+            int: Slot index, or None if all slots are assigned
+        """
+        if not self._free:
+            self.exhausted += 1
+            return None
+        return self._free.pop()
+
+    def release(self, index: int):
+        """Return a slot to the free list"""
+        self._free.append(index)
+
+    def begin_frame(self):
+        self.busy += 1
+        self.shm_frames += 1
+        self.peak_busy = max(self.peak_busy, self.busy)
+
+    def end_frame(self):
+        self.busy -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get slot occupancy statistics
+
+        Returns:
+            dict: Slot counts, occupancy and transport counters
+        """
+        assigned = self.ring.num_slots - len(self._free)
+        return {
+            "segment_bytes": self.ring.slot_size * self.ring.num_slots,
+            "slot_bytes": self.ring.slot_size,
+            "slots": self.ring.num_slots,
+            "slots_assigned": assigned,
+            "slots_busy": self.busy,
+            "peak_slots_busy": self.peak_busy,
+            "occupancy": round(self.busy / self.ring.num_slots, 3),
+            "shm_frames": self.shm_frames,
+            "pickled_frames": self.pickled_frames,
+            "slot_exhausted": self.exhausted
+        }
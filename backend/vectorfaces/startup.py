@@ -0,0 +1,83 @@
+"""
+Startup Module for vectorfaces
+Tracks per-component startup state and timing for liveness and readiness probes
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, Any, List
+
+
+class StartupTracker:
+    """Records the startup state of each service component"""
+
+    PENDING = "pending"
+    STARTING = "starting"
+    READY = "ready"
+    DEGRADED = "degraded"
+    FAILED = "failed"
+
+    def __init__(self, components: List[str], required: List[str] = None):
+        """
+        Initialize the StartupTracker
+
+        Args:
+            components: Names of the components to track
+            required: Components that must be ready before serving traffic (default: all)
+        """
+        self.started_at = time.time()
+        self.completed_at = None
+        self.required = required if required is not None else list(components)
+        self.components = {
+            name: {"state": self.PENDING, "duration_ms": None, "error": None}
+            for name in components
+        }
+        self._component_start = {}
+
+    def begin(self, name: str):
+        """Mark a component as starting"""
+        self._component_start[name] = time.time()
+        self.components[name]["state"] = self.STARTING
+
+    def finish(self, name: str, state: str, error: str = None):
+        """
+        Mark a component as finished
+
+        Args:
+            name: Component name
+            state: Final state (ready, degraded or failed)
+            error: Optional error message
+        """
+        start = self._component_start.get(name, self.started_at)
+        self.components[name]["state"] = state
+        self.components[name]["duration_ms"] = round((time.time() - start) * 1000, 2)
+        self.components[name]["error"] = error
+
+    def complete(self):
+        """Mark the whole startup sequence as finished"""
+        self.completed_at = time.time()
+
+    def is_ready(self) -> bool:
+        """
+        Check whether all required components are ready
+
+        Returns:
+            bool: True if traffic can be routed to this instance
+        """
+        return all(self.components[name]["state"] == self.READY for name in self.required)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get per-component state and startup timing
+
+        Returns:
+            dict: Readiness, components and startup timing
+        """
+        end = self.completed_at or time.time()
+        return {
+            "ready": self.is_ready(),
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(),
+            "startup_complete": self.completed_at is not None,
+            "startup_ms": round((end - self.started_at) * 1000, 2),
+            "components": self.components
+        }
@@ -0,0 +1,115 @@
+"""
+Index Stats Refresher Module for vectorfaces
+Periodically refreshes Elasticsearch index statistics in the background
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from .vector_search import VectorSearch
+
+
+class IndexStatsRefresher:
+    """Background task keeping a cached copy of the index statistics"""
+
+    def __init__(self, vector_search: VectorSearch, interval: float = None):
+        """
+        Initialize the IndexStatsRefresher
+
+        Args:
+            vector_search: Connected VectorSearch instance to collect stats from
+            interval: Seconds between refreshes (default: from ES_STATS_REFRESH_INTERVAL env var, or 30)
+        """
+        self.vector_search = vector_search
+        self.interval = interval or float(os.getenv('ES_STATS_REFRESH_INTERVAL', 30))
+        self.index_stats = {}
+        self.thread_pool_stats = {}
+        self.refreshed_at = None
+        self.last_refresh_ms = None
+        self.last_error = None
+        self._task: Optional[asyncio.Task] = None
+        self.logger = logging.getLogger(__name__)
+
+    async def refresh(self) -> Dict[str, Dict]:
+        """
+        Fetch index and search thread pool stats concurrently and update the cache,
+        re-resolving the search alias at the same time
+
+        Returns:
+            dict: Freshly collected index statistics
+        """
+        if not self.vector_search.is_connected:
+            self.last_error = "Not connected to Elasticsearch"
+            return self.index_stats
+
+        start = time.time()
+        try:
+            index_stats, thread_pool_stats, _ = await asyncio.gather(
+                asyncio.to_thread(self.vector_search.collect_index_stats),
+                asyncio.to_thread(self.vector_search.collect_search_thread_pool_stats),
+                asyncio.to_thread(self.vector_search.resolve_alias_indices, True)
+            )
+        except Exception as e:
+            self.logger.error(f"Error refreshing index stats: {e}")
+            self.last_error = str(e)
+            return self.index_stats
+
+        self.index_stats = index_stats
+        self.thread_pool_stats = thread_pool_stats
+        self.vector_search.index_stats = index_stats
+        self.refreshed_at = time.time()
+        self.last_refresh_ms = round((self.refreshed_at - start) * 1000, 2)
+        self.last_error = None
+        return index_stats
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start the background refresh loop on the running event loop"""
+        if self._task is None or self._task.done():
+            self.logger.info(f"Refreshing index stats every {self.interval}s")
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background refresh loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_age_seconds(self) -> Optional[float]:
+        """
+        Get the age of the cached stats
+
+        Returns:
+            float: Seconds since the last successful refresh, or None if never refreshed
+        """
+        if self.refreshed_at is None:
+            return None
+        return round(time.time() - self.refreshed_at, 2)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get refresher state alongside live search thread pool figures
+
+        Returns:
+            dict: Cache age, refresh timing and search thread pool stats
+        """
+        return {
+            "refreshed_at": datetime.fromtimestamp(self.refreshed_at).isoformat() if self.refreshed_at else None,
+            "age_seconds": self.get_age_seconds(),
+            "refresh_interval_s": self.interval,
+            "last_refresh_ms": self.last_refresh_ms,
+            "last_error": self.last_error,
+            "search_thread_pool": self.thread_pool_stats
+        }
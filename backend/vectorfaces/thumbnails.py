@@ -0,0 +1,253 @@
+"""
+Thumbnail Module for vectorfaces
+Resized WebP/JPEG variants of indexed face images, cached on disk with an LRU size cap
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Iterable, Optional
+from urllib.parse import quote
+
+import requests
+from PIL import Image
+
+from .coalescer import RequestCoalescer
+
+
+THUMBNAIL_FORMATS = {
+    "webp": {"format": "WEBP", "options": {"method": 4}},
+    "jpeg": {"format": "JPEG", "options": {"optimize": True, "progressive": True}}
+}
+
+
+class ThumbnailService:
+    """Produces fixed-size thumbnails of result images on demand or in batch"""
+
+    def __init__(self,
+                 cache_dir: str = None,
+                 sizes: List[int] = None,
+                 quality: int = None,
+                 max_cache_bytes: int = None,
+                 uploads_dir: str = "/home/vectorfaces/uploads",
+                 source_url: str = None):
+        """
+        Initialize the ThumbnailService
+
+        Args:
+            cache_dir: Directory holding generated thumbnails
+                (default: from THUMBNAIL_DIR env var, or /home/vectorfaces/thumbnails)
+            sizes: Allowed longest-side sizes in pixels (default: from THUMBNAIL_SIZES env var, or 128,320)
+            quality: Encoder quality (default: from THUMBNAIL_QUALITY env var, or 80)
+            max_cache_bytes: Disk cache cap (default: from THUMBNAIL_CACHE_MB env var, or 512 MB)
+            uploads_dir: Directory of uploaded images (image paths starting with /uploads/)
+            source_url: Base URL of dataset images
+                (default: from THUMBNAIL_SOURCE_URL env var, or the public faces-dataset bucket)
+        """
+        self.cache_dir = cache_dir or os.getenv('THUMBNAIL_DIR', '/home/vectorfaces/thumbnails')
+        self.sizes = sizes or [int(s) for s in os.getenv('THUMBNAIL_SIZES', '128,320').split(',') if s.strip()]
+        self.quality = quality or int(os.getenv('THUMBNAIL_QUALITY', 80))
+        self.max_cache_bytes = max_cache_bytes or int(float(os.getenv('THUMBNAIL_CACHE_MB', 512)) * 1024 * 1024)
+        self.uploads_dir = uploads_dir
+        self.source_url = source_url or os.getenv('THUMBNAIL_SOURCE_URL', 'https://storage.googleapis.com/faces-dataset/')
+        self.http = requests.Session()
+        self.coalescer = RequestCoalescer()
+        self.logger = logging.getLogger(__name__)
+
+        # Cached files in least recently used order with their sizes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self.cache_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "generated": 0, "evictions": 0, "errors": 0}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_cache_index()
+
+    def _load_cache_index(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.tmp') or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self.cache_bytes += size
+        self.logger.info(f"Thumbnail cache has {len(files)} file(s), {self.cache_bytes / 1024 / 1024:.1f} MB")
+
+    def url_for(self, image_path: str, size: int) -> str:
+        """
+        Get the API URL of a thumbnail
+
+        Args:
+            image_path: Image path as stored in the document metadata
+            size: Thumbnail size
+
+        Returns:
+            str: URL served by /api/thumbnails, mirroring the nginx /local and /faces prefixes
+        """
+        prefix = "local" if image_path.startswith('/') else "faces"
+        return f"/api/thumbnails/{size}/{prefix}/{quote(image_path.lstrip('/'))}"
+
+    @staticmethod
+    def image_path_from_url(url_path: str) -> str:
+        """Map the path part of a thumbnail URL back to the stored image path"""
+        if url_path.startswith('local/'):
+            return url_path[len('local'):]
+        if url_path.startswith('faces/'):
+            return url_path[len('faces/'):]
+        return url_path
+
+    def urls_for(self, image_path: str) -> Dict[str, str]:
+        return {str(size): self.url_for(image_path, size) for size in self.sizes}
+
+    @staticmethod
+    def preferred_format(accept: Optional[str]) -> str:
+        """Pick WebP for clients that accept it, JPEG otherwise"""
+        return "webp" if accept and "image/webp" in accept else "jpeg"
+
+    def _cache_name(self, image_path: str, size: int, fmt: str) -> str:
+        digest = hashlib.sha1(image_path.encode('utf-8')).hexdigest()
+        return f"{digest}_{size}.{fmt}"
+
+    def get(self, image_path: str, size: int, fmt: str = "webp") -> bytes:
+        """
+        Get a thumbnail, generating it on a cache miss
+
+        The bytes are read while the cache lock is held, so a concurrent
+        generation cannot evict the file between lookup and read.
+
+        Args:
+            image_path: Image path as stored in the document metadata
+            size: Thumbnail size, one of self.sizes
+            fmt: 'webp' or 'jpeg'
+
+        Returns:
+            bytes: Encoded thumbnail
+        """
+        if size not in self.sizes:
+            raise ValueError(f"Unsupported thumbnail size {size}, expected one of {self.sizes}")
+        if fmt not in THUMBNAIL_FORMATS:
+            raise ValueError(f"Unsupported thumbnail format '{fmt}'")
+
+        name = self._cache_name(image_path, size, fmt)
+        path = os.path.join(self.cache_dir, name)
+        with self._lock:
+            if name in self._entries:
+                try:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                    self._entries.move_to_end(name)
+                    self.stats["hits"] += 1
+                    return data
+                except FileNotFoundError:
+                    pass
+            self.stats["misses"] += 1
+
+        # Concurrent requests for the same missing thumbnail generate it once and share its bytes
+        data, _ = self.coalescer.do(name, lambda: self._generate(image_path, size, fmt, name))
+        return data
+
+    def _generate(self, image_path: str, size: int, fmt: str, name: str) -> bytes:
+        try:
+            image = Image.open(io.BytesIO(self._read_source(image_path)))
+            image.thumbnail((size, size), Image.LANCZOS)
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+
+            encoder = THUMBNAIL_FORMATS[fmt]
+            buffer = io.BytesIO()
+            image.save(buffer, format=encoder["format"], quality=self.quality, **encoder["options"])
+        except Exception:
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+
+        # Write under a temporary name so readers never see a partial file
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = f"{path}.tmp"
+        data = buffer.getvalue()
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.cache_bytes += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self.stats["generated"] += 1
+            self._evict()
+        return data
+
+    def _read_source(self, image_path: str) -> bytes:
+        if '..' in image_path.split('/'):
+            raise ValueError(f"Invalid image path '{image_path}'")
+        if image_path.startswith('/uploads/'):
+            # An absolute remainder ("/uploads//etc/passwd") or a symlink must not escape the uploads directory
+            uploads_dir = os.path.realpath(self.uploads_dir)
+            path = os.path.realpath(os.path.join(uploads_dir, image_path[len('/uploads/'):]))
+            if os.path.commonpath([path, uploads_dir]) != uploads_dir:
+                raise ValueError(f"Invalid image path '{image_path}'")
+            with open(path, 'rb') as f:
+                return f.read()
+        response = self.http.get(self.source_url + quote(image_path.lstrip('/')), timeout=10)
+        response.raise_for_status()
+        return response.content
+
+    def _evict(self):
+        # Caller holds self._lock
+        while self.cache_bytes > self.max_cache_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            self.cache_bytes -= size
+            self.stats["evictions"] += 1
+
+    def pregenerate(self, image_paths: Iterable[str], formats: List[str] = None) -> Dict[str, int]:
+        """
+        Generate every size of the given images ahead of the first request
+
+        Args:
+            image_paths: Image paths as stored in the document metadata
+            formats: Formats to generate (default: webp and jpeg)
+
+        Returns:
+            dict: Numbers of generated, already cached and failed thumbnails
+        """
+        result = {"generated": 0, "cached": 0, "failed": 0}
+        for image_path in image_paths:
+            for fmt in formats or list(THUMBNAIL_FORMATS):
+                for size in self.sizes:
+                    name = self._cache_name(image_path, size, fmt)
+                    if name in self._entries:
+                        result["cached"] += 1
+                        continue
+                    try:
+                        self._generate(image_path, size, fmt, name)
+                        result["generated"] += 1
+                    except Exception as e:
+                        self.logger.warning(f"Could not generate thumbnail of {image_path}: {e}")
+                        result["failed"] += 1
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            dict: Cache size, cap, hit rate and generation counters
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["files"] = len(self._entries)
+            stats["cache_bytes"] = self.cache_bytes
+        requests_total = stats["hits"] + stats["misses"]
+        stats["max_cache_bytes"] = self.max_cache_bytes
+        stats["sizes"] = self.sizes
+        stats["hit_rate"] = round(stats["hits"] / requests_total, 3) if requests_total else 0.0
+        return stats
@@ -3,15 +3,56 @@ Vector Search Module for vectorfaces
 Handles Elasticsearch operations for face embedding similarity search
 """
 
-from elasticsearch import Elasticsearch
-from typing import List, Dict, Optional, Any
+from elasticsearch import Elasticsearch, ApiError, NotFoundError, helpers
+from elasticsearch.serializer import JsonSerializer
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Optional, Any, Union, Iterator
+from collections import deque
 import json
 import os
+import threading
+import time
 import uuid
 from datetime import datetime
 import logging
+import numpy as np
 from dotenv import load_dotenv
 
+from .circuit_breaker import CircuitBreaker
+from .coalescer import RequestCoalescer
+
+
+# Primary shard metrics reported per index by collect_index_stats
+INDEX_STATS_METRICS = ["docs", "dense_vector", "query_cache", "request_cache"]
+
+# Hit projections for search_similar_faces; none of them return the embeddings
+SEARCH_PROJECTIONS = {
+    # whole document except the vector
+    "full": {"_source": {"excludes": ["face_embeddings"]}},
+    # identity and metadata from _source
+    "metadata": {"_source": {"includes": ["id", "face_id", "timestamp", "metadata"]}},
+    # only the fields the UI renders, from doc values without loading _source
+    "docvalues": {
+        "_source": False,
+        "docvalue_fields": ["id", "metadata.name", "metadata.gender", "metadata.image_path"]
+    }
+}
+
+
+class TimedJsonSerializer(JsonSerializer):
+    """JSON serializer recording response size and parse time of the last call on each thread"""
+
+    def __init__(self):
+        super().__init__()
+        self.last = threading.local()
+
+    def loads(self, data: bytes) -> Any:
+        start = time.perf_counter()
+        result = super().loads(data)
+        self.last.response_bytes = len(data)
+        self.last.parse_ms = (time.perf_counter() - start) * 1000
+        return result
+
 
 class VectorSearch:
     """Vector search class for face embeddings using Elasticsearch (search-only)"""
@@ -21,7 +62,8 @@ class VectorSearch:
                  index_name: str = None,
                  api_key: str = None,
                  embedding_dim: int = 512,
-                 env_file: str = None):
+                 env_file: str = None,
+                 auto_connect: bool = True):
         """
         Initialize the VectorSearch client
         
@@ -31,6 +73,8 @@ class VectorSearch:
             api_key: Elasticsearch API key (default: from ES_API_KEY env var)
             embedding_dim: Dimension of face embeddings (default: 512 for InsightFace)
             env_file: Path to environment file (default: env.local)
+            auto_connect: Connect and create the uploads index immediately (default: True).
+                Pass False to defer to an explicit call of start()
         """
         # Load environment variables
         env_file = env_file or "env.local"
@@ -47,6 +91,26 @@ class VectorSearch:
         self.client = None
         self.is_connected = False
         self.index_stats = {}
+        self.alias_refresh_interval = float(os.getenv('ES_ALIAS_REFRESH_INTERVAL', 60))
+        self._alias_indices = None
+        self._alias_resolved_at = 0.0
+        self.search_projection = os.getenv('ES_SEARCH_PROJECTION', 'metadata')
+        self.serializer = TimedJsonSerializer()
+        self._search_stats_lock = threading.Lock()
+        self.search_stats = {"searches": 0, "response_bytes": 0, "parse_ms": 0.0}
+        # Identical concurrent searches share one request; 0 disables coalescing
+        self.coalesce_quantum = float(os.getenv('ES_COALESCE_QUANTUM', 0.005))
+        self.coalescer = RequestCoalescer()
+        # Searches are bounded by the caller's deadline, or ES_SEARCH_TIMEOUT seconds without one
+        self.search_timeout = float(os.getenv('ES_SEARCH_TIMEOUT', 5))
+        self.breaker = CircuitBreaker(int(os.getenv('ES_BREAKER_FAILURES', 5)))
+        # A duplicate request goes out once a search outlasts this percentile of recent latencies; 0 disables
+        self.hedge_percentile = float(os.getenv('ES_HEDGE_PERCENTILE', 0))
+        self._latencies = deque(maxlen=200)
+        self._hedge_executor = None
+        self.hedge_stats = {"hedged": 0, "hedge_wins": 0}
+        # Documents written to the uploads index, read by IndexMaintainer to spot bulk enrollments
+        self.enrollments = 0
         
         # Setup logging
         self.logger = logging.getLogger(__name__)
@@ -58,9 +122,45 @@ class VectorSearch:
         self.logger.info(f"  API Key: {'***' if self.api_key else 'Not provided'}")
         
         # Auto-connect and create index during initialization
-        if self.connect():
-            self.create_uploads_index_if_not_exists()
-            self.index_stats = self.collect_index_stats()
+        # (index stats are collected by IndexStatsRefresher in the background)
+        if auto_connect:
+            self.start()
+    
+    def start(self) -> bool:
+        """
+        Connect to Elasticsearch and make sure the uploads index exists
+        
+        Returns:
+            bool: True if connection successful, False otherwise
+        """
+        if not self.connect():
+            return False
+        if not self.check_index_exists():
+            self.logger.warning(f"Connected but index '{self.index_name}' does not exist")
+        self.create_uploads_index_if_not_exists()
+        self.resolve_alias_indices(refresh=True)
+        return True
+    
+    def warmup(self) -> bool:
+        """
+        Run a minimal kNN query so the first real search does not pay for cold
+        connections and vector data loading
+        
+        Returns:
+            bool: True if the warmup query succeeded, False otherwise
+        """
+        if not self.is_connected:
+            return False
+        
+        query_embedding = [1.0 / (self.embedding_dim ** 0.5)] * self.embedding_dim
+        results, search_timing = self.search_similar_faces(
+            query_embedding, top_k=1, num_candidates=10, size=1
+        )
+        if search_timing.get('error'):
+            self.logger.warning(f"Search warmup failed: {search_timing['error']}")
+            return False
+        self.logger.info(f"Search warmup completed (took: {search_timing['took']}ms)")
+        return True
     
     def connect(self) -> bool:
         """
@@ -75,8 +175,8 @@ class VectorSearch:
             # Configure connection parameters
             connection_params = {
                 "hosts": self.hosts,
-                "timeout": 30,
-                "max_retries": 3,
+                "request_timeout": float(os.getenv('ES_REQUEST_TIMEOUT', 30)),
+                "max_retries": int(os.getenv('ES_MAX_RETRIES', 3)),
                 "retry_on_timeout": True
             }
             # Add API key authentication if provided
@@ -91,6 +191,12 @@ class VectorSearch:
             connection_params["ssl_show_warn"] = False
             connection_params["ssl_context"] = ssl._create_unverified_context()
 
+            # Measure response size and JSON parse time of searches
+            connection_params["serializers"] = {
+                "application/json": self.serializer,
+                "application/vnd.elasticsearch+json": self.serializer
+            }
+
             self.client = Elasticsearch(**connection_params)
             
             # Test connection
@@ -114,18 +220,106 @@ class VectorSearch:
             return False
     
     def search_similar_faces(self, 
-                           query_embedding: List[float],
+                           query_embedding: Union[List[float], np.ndarray],
                            top_k: int = 10,
                            num_candidates: int = 100,
                            size: int = 50,
                            filters: Dict = None,
                            must_not: Dict = None,
-                           exclude_indices: List[str] = None) -> List[Dict]:
+                           exclude_indices: List[str] = None,
+                           indices: List[str] = None,
+                           projection: Union[str, Dict] = None,
+                           deadline: float = None,
+                           oversample: float = None) -> List[Dict]:
+        """
+        Find faces similar to the query embedding with a kNN search
         
+        Args:
+            query_embedding: Face embedding to search for
+            top_k: Number of nearest neighbors to return
+            num_candidates: Number of candidates per shard
+            size: Number of hits to return
+            filters: Metadata term filters
+            must_not: Metadata term exclusions
+            exclude_indices: Backing indices to leave out
+            indices: Backing indices to search (default: all indices behind the alias)
+            projection: Name in SEARCH_PROJECTIONS or a dict of search body options
+                selecting the returned fields (default: from ES_SEARCH_PROJECTION env var)
+            deadline: time.monotonic() by which the search must finish; the remaining
+                budget becomes the request timeout (default: ES_SEARCH_TIMEOUT from now)
+            oversample: Query-time rescore_vector oversample of quantized indices
+                (default: the oversample of the index mapping)
+        
+        Concurrent calls with the same quantized embedding and query parameters
+        are coalesced: only the first reaches Elasticsearch and the others share
+        its result, marked with "coalesced" in the search timing.
+        
+        Returns:
+            tuple: List of matches and search timing information
+        """
+        key = self._coalesce_key(query_embedding, top_k, num_candidates, size,
+                                 filters, must_not, exclude_indices, indices, projection, oversample)
+        if key is None:
+            return self._search_similar_faces(query_embedding, top_k, num_candidates, size, filters, must_not,
+                                              exclude_indices, indices, projection, deadline, oversample)
+        
+        try:
+            (results, search_timing), shared = self.coalescer.do(
+                key,
+                lambda: self._search_similar_faces(query_embedding, top_k, num_candidates, size, filters, must_not,
+                                                   exclude_indices, indices, projection, deadline, oversample),
+                timeout=deadline - time.monotonic() if deadline is not None else None
+            )
+        except TimeoutError:
+            return [], {"took": 0, "timed_out": True, "total_hits": 0, "max_score": None,
+                        "error": "Deadline exceeded waiting for a coalesced search", "coalesced": True}
+        if shared:
+            return list(results), dict(search_timing, coalesced=True)
+        return results, search_timing
+    
+    def _coalesce_key(self, query_embedding, top_k, num_candidates, size,
+                      filters, must_not, exclude_indices, indices, projection, oversample=None) -> Optional[tuple]:
+        # Round the unit-length embedding to a grid so re-encoded copies of one frame share a key
+        if self.coalesce_quantum <= 0 or not self.is_connected:
+            return None
+        embedding = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        if embedding.shape != (self.embedding_dim,) or norm == 0:
+            return None
+        quantized = np.round(embedding / (norm * self.coalesce_quantum)).astype(np.int32).tobytes()
+        return (
+            quantized, top_k, num_candidates, size,
+            json.dumps(filters, sort_keys=True), json.dumps(must_not, sort_keys=True),
+            tuple(exclude_indices) if exclude_indices is not None else None,
+            tuple(indices) if indices is not None else None,
+            projection if not isinstance(projection, dict) else json.dumps(projection, sort_keys=True),
+            oversample
+        )
+    
+    def _search_similar_faces(self,
+                              query_embedding: Union[List[float], np.ndarray],
+                              top_k: int,
+                              num_candidates: int,
+                              size: int,
+                              filters: Dict,
+                              must_not: Dict,
+                              exclude_indices: List[str],
+                              indices: List[str],
+                              projection: Union[str, Dict],
+                              deadline: Optional[float],
+                              oversample: Optional[float] = None) -> tuple:
         if not self.is_connected:
             self.logger.error("Not connected to Elasticsearch")
             return [], {"took": 0, "timed_out": False, "total_hits": 0, "max_score": None, "error": "Not connected to Elasticsearch"}
         
+        # Degraded mode: answer with no matches until the background probe sees Elasticsearch recover
+        if not self.breaker.allow_request():
+            return [], {"took": 0, "timed_out": False, "total_hits": 0, "max_score": None, "error": "Circuit breaker open", "degraded": True}
+        
+        timeout = deadline - time.monotonic() if deadline is not None else self.search_timeout
+        if timeout <= 0:
+            return [], {"took": 0, "timed_out": True, "total_hits": 0, "max_score": None, "error": "Deadline exceeded before search"}
+        
         if len(query_embedding) != self.embedding_dim:
             self.logger.error(f"Query embedding dimension mismatch: expected {self.embedding_dim}, got {len(query_embedding)}")
             return [], {"took": 0, "timed_out": False, "total_hits": 0, "max_score": None, "error": f"Embedding dimension mismatch: expected {self.embedding_dim}, got {len(query_embedding)}"}
@@ -145,7 +339,7 @@ class VectorSearch:
                                     "field": "face_embeddings",
                                     "k": top_k,
                                     "num_candidates": num_candidates,
-                                    "query_vector": query_embedding
+                                    "query_vector": self._to_list(query_embedding)
                                 }
                             }
                             
@@ -155,6 +349,8 @@ class VectorSearch:
                     }
                 }
             }
+            if oversample is not None:
+                body["query"]["bool"]["must"][0]["knn"]["rescore_vector"] = {"oversample": oversample}
             
             # Add filters if provided
             if filters:
@@ -172,32 +368,44 @@ class VectorSearch:
                         "term": {f"metadata.{field}": value}
                     })
 
-            if exclude_indices:
-                clause = {
-                    "terms": {
-                        "_index": exclude_indices
-                    }
-                }
-                body["query"]["bool"]["must_not"].append(clause)
+            # Target only the wanted backing indices instead of filtering hits on _index
+            target_indices = self.plan_search_indices(indices, exclude_indices)
+            if not target_indices:
+                self.logger.info("No indices selected, skipping search")
+                return [], {"took": 0, "timed_out": False, "total_hits": 0, "max_score": None, "indices": []}
+
+            projection = projection or self.search_projection
+            if isinstance(projection, str):
+                projection = SEARCH_PROJECTIONS[projection]
+            body.update(projection)
 
             # Execute search
-            response = self.client.search(
-                index=self.index_name,
-                body=body
-            )
+            response, response_bytes, parse_ms, hedged = self._execute_search(",".join(target_indices), body, timeout)
             
             results = []
             for hit in response['hits']['hits']:
+                source = hit.get('_source', {})
+                metadata = source.get('metadata', {})
+                for field, values in hit.get('fields', {}).items():
+                    if field.startswith('metadata.'):
+                        metadata[field[len('metadata.'):]] = values[0]
+                    elif field == 'id':
+                        source.setdefault('id', values[0])
                 result = {
                     "index": hit['_index'],
-                    "face_id": hit['_source'].get('face_id'),
+                    "document_id": hit['_id'],
+                    "face_id": source.get('face_id'),
                     "score": hit['_score'],
-                    "metadata": hit['_source'].get('metadata', {}),
-                    "timestamp": hit['_source'].get('timestamp'),
-                    "document": hit['_source']  # Full document for additional data
+                    "metadata": metadata,
+                    "timestamp": source.get('timestamp'),
+                    "document": source  # Projected document for additional data
                 }
                 results.append(result)
             
+            with self._search_stats_lock:
+                self.search_stats["searches"] += 1
+                self.search_stats["response_bytes"] += response_bytes
+                self.search_stats["parse_ms"] += parse_ms
 
             self.logger.debug(response)
             # Extract timing information from Elasticsearch response
@@ -205,7 +413,12 @@ class VectorSearch:
                 "took": response.get('took', 0),  # Time in milliseconds
                 "timed_out": response.get('timed_out', False),
                 "total_hits": response['hits']['total']['value'] if isinstance(response['hits']['total'], dict) else response['hits']['total'],
-                "max_score": response['hits'].get('max_score')
+                "max_score": response['hits'].get('max_score'),
+                "indices": target_indices,
+                "response_bytes": response_bytes,
+                "parse_ms": round(parse_ms, 3),
+                "timeout_ms": round(timeout * 1000),
+                "hedged": hedged
             }
             
             self.logger.info(f"Found {len(results)} similar faces using KNN search (took: {search_timing['took']}ms)")
@@ -213,8 +426,220 @@ class VectorSearch:
             
         except Exception as e:
             self.logger.error(f"Error searching similar faces: {e}")
+            # Rejected queries say nothing about cluster health
+            if not (isinstance(e, ApiError) and e.meta.status < 500):
+                self.breaker.record_failure(str(e))
             return [], {"took": 0, "timed_out": False, "total_hits": 0, "max_score": None, "error": str(e)}
     
+    def _timed_search(self, index: str, body: Dict, timeout: float) -> tuple:
+        # No client retries: a retry would not fit in the remaining budget
+        start = time.monotonic()
+        response = self.client.options(request_timeout=timeout, max_retries=0, retry_on_timeout=False).search(
+            index=index,
+            body=body,
+            timeout=f"{max(1, int(timeout * 1000))}ms"
+        )
+        self._latencies.append((time.monotonic() - start) * 1000)
+        self.breaker.record_success()
+        return (response,
+                getattr(self.serializer.last, 'response_bytes', 0),
+                getattr(self.serializer.last, 'parse_ms', 0.0))
+    
+    def _execute_search(self, index: str, body: Dict, timeout: float) -> tuple:
+        """
+        Run a search within the timeout, hedging with a duplicate request if the
+        first one is slower than hedge_percentile of recent searches
+        
+        Returns:
+            tuple: Response, response bytes, parse time and whether a hedge was sent
+        """
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is None or hedge_delay >= timeout:
+            return self._timed_search(index, body, timeout) + (False,)
+        
+        if self._hedge_executor is None:
+            self._hedge_executor = ThreadPoolExecutor(max_workers=int(os.getenv('ES_HEDGE_WORKERS', 8)),
+                                                      thread_name_prefix="es-hedge")
+        deadline = time.monotonic() + timeout
+        primary = self._hedge_executor.submit(self._timed_search, index, body, timeout)
+        done, _ = wait([primary], timeout=hedge_delay)
+        if done:
+            return primary.result() + (False,)
+        
+        with self._search_stats_lock:
+            self.hedge_stats["hedged"] += 1
+        hedge = self._hedge_executor.submit(self._timed_search, index, body, max(deadline - time.monotonic(), 0.001))
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0) + 0.1, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._search_stats_lock:
+                            self.hedge_stats["hedge_wins"] += 1
+                    return future.result() + (True,)
+                error = future.exception()
+        raise error or TimeoutError("Search and hedge both exceeded the deadline")
+    
+    def _hedge_delay(self) -> Optional[float]:
+        if self.hedge_percentile <= 0 or len(self._latencies) < 20:
+            return None
+        return float(np.percentile(list(self._latencies), self.hedge_percentile)) / 1000
+    
+    def probe(self) -> bool:
+        """
+        Check cluster health for the circuit breaker, connecting first if needed
+        
+        Returns:
+            bool: True if Elasticsearch answered
+        """
+        if not self.is_connected:
+            healthy = self.start()
+            self.breaker.record_probe(healthy, None if healthy else "Not connected to Elasticsearch")
+            return healthy
+        try:
+            healthy = bool(self.client.options(request_timeout=2, max_retries=0).ping())
+            self.breaker.record_probe(healthy, None if healthy else "Ping failed")
+        except Exception as e:
+            healthy = False
+            self.breaker.record_probe(False, str(e))
+        return healthy
+    
+    def get_breaker_status(self) -> Dict[str, Any]:
+        """
+        Get circuit breaker state and hedging counters
+        
+        Returns:
+            dict: Breaker state, hedging configuration and counters
+        """
+        status = self.breaker.get_status()
+        hedge_delay = self._hedge_delay()
+        with self._search_stats_lock:
+            status["hedging"] = dict(self.hedge_stats,
+                                     percentile=self.hedge_percentile,
+                                     delay_ms=round(hedge_delay * 1000, 2) if hedge_delay is not None else None)
+        status["search_timeout_s"] = self.search_timeout
+        return status
+    
+    @staticmethod
+    def _to_list(embedding: Union[List[float], np.ndarray]) -> List[float]:
+        # Embeddings stay float32 arrays until they are serialized into a request
+        return embedding.tolist() if isinstance(embedding, np.ndarray) else embedding
+    
+    def get_search_stats(self) -> Dict[str, Any]:
+        """
+        Get cumulative search response payload statistics
+        
+        Returns:
+            dict: Search count, response bytes and JSON parse time, totals and averages
+        """
+        with self._search_stats_lock:
+            stats = dict(self.search_stats)
+        searches = stats["searches"]
+        stats["parse_ms"] = round(stats["parse_ms"], 3)
+        stats["avg_response_bytes"] = round(stats["response_bytes"] / searches) if searches else 0
+        stats["avg_parse_ms"] = round(stats["parse_ms"] / searches, 3) if searches else 0.0
+        stats["projection"] = self.search_projection
+        stats["coalescing"] = self.coalescer.get_stats()
+        return stats
+    
+    def resolve_alias_indices(self, refresh: bool = False) -> List[str]:
+        """
+        Resolve the search alias to its backing indices, cached for alias_refresh_interval seconds
+        
+        Args:
+            refresh: Force a lookup even if the cached resolution is still fresh
+        
+        Returns:
+            list: Backing index names, or [index_name] if it is not an alias
+        """
+        if not refresh and self._alias_indices is not None and \
+                time.time() - self._alias_resolved_at < self.alias_refresh_interval:
+            return self._alias_indices
+        
+        try:
+            response = self.client.indices.get_alias(name=self.index_name)
+            self._alias_indices = sorted(response.keys())
+        except NotFoundError:
+            self._alias_indices = [self.index_name]
+        except Exception as e:
+            self.logger.error(f"Error resolving alias '{self.index_name}': {e}")
+            if self._alias_indices is None:
+                return [self.index_name]
+            return self._alias_indices
+        
+        self._alias_resolved_at = time.time()
+        self.logger.info(f"Alias '{self.index_name}' resolves to: {', '.join(self._alias_indices)}")
+        return self._alias_indices
+    
+    @staticmethod
+    def _alias_holders(name: str, available: List[str]) -> List[str]:
+        # data/setup.py --reindex-from swaps the alias to "<name>-<suffix>", so a definition
+        # name selected by the client also stands for the index that replaced it
+        if name in available:
+            return [name]
+        return [idx for idx in available if idx.startswith(f"{name}-")]
+    
+    def plan_search_indices(self,
+                            indices: List[str] = None,
+                            exclude_indices: List[str] = None) -> List[str]:
+        """
+        Work out which backing indices a search should target
+        
+        Args:
+            indices: Indices to search (default: all indices behind the alias); a name
+                no longer behind the alias selects its reindexed "<name>-<suffix>" successor
+            exclude_indices: Indices to leave out, resolved the same way
+        
+        Returns:
+            list: Deduplicated index names, empty if nothing is selected
+        """
+        available = self.resolve_alias_indices()
+        
+        if indices is None:
+            candidates = available
+        else:
+            candidates = [holder for idx in indices for holder in self._alias_holders(idx, available)]
+        
+        excluded = {holder for idx in exclude_indices or [] for holder in self._alias_holders(idx, available)}
+        planned = []
+        for idx in candidates:
+            if idx not in excluded and idx not in planned:
+                planned.append(idx)
+        return planned
+    
+    def scan_faces(self, index: str, query: Dict = None, max_docs: int = None,
+                   source: List[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over face documents including their embeddings
+        
+        Args:
+            index: Index or alias to read from
+            query: Query selecting the documents (default: match_all)
+            max_docs: Stop after this many documents
+            source: Source fields to return (default: id, face_embeddings and metadata)
+        
+        Yields:
+            dict: Document source with id, face_embeddings and metadata
+        """
+        if not self.is_connected:
+            self.logger.error("Not connected to Elasticsearch")
+            return
+        
+        hits = helpers.scan(
+            self.client,
+            index=index,
+            query={"query": query or {"match_all": {}}, "_source": source or ["id", "face_embeddings", "metadata"]},
+            size=1000
+        )
+        for count, hit in enumerate(hits):
+            if max_docs is not None and count >= max_docs:
+                break
+            yield hit['_source']
+    
     def check_index_exists(self) -> bool:
         """
         Check if the index exists
@@ -257,10 +682,38 @@ class VectorSearch:
         """
         return self.index_stats
 
+    def get_stats_indices(self) -> List[str]:
+        """
+        Get the list of indices specified in ES_INDICES environment variable
+        
+        Returns:
+            list: Deduplicated index names, in configuration order
+        """
+        indices_str = os.getenv('ES_INDICES', '')
+        indices = []
+        for idx in indices_str.split(','):
+            idx = idx.strip()
+            if idx and idx not in indices:
+                indices.append(idx)
+        return indices
+
+    def _indices_stats(self, indices: List[str], metric: str = None, filter_path: str = None) -> Dict[str, Any]:
+        # The 8.x client's indices.stats() does not take ignore_unavailable, and without it
+        # one missing index fails the whole multi-index call
+        params = {"level": "indices", "ignore_unavailable": "true"}
+        if filter_path:
+            params["filter_path"] = filter_path
+        path = f"/{','.join(indices)}/_stats" + (f"/{metric}" if metric else "")
+        return self.client.perform_request("GET", path, params=params, headers={"accept": "application/json"}).body
+
     def collect_index_stats(self) -> Dict[str, Dict]:
         """
         Collect statistics for all indices specified in ES_INDICES environment variable
         
+        All indices are fetched with a single multi-index stats call. Each entry keeps
+        the per-index `_all.primaries` shape the frontend reads, extended with query
+        and request cache figures.
+        
         Returns:
             dict: Dictionary with index names as keys and their stats as values
         """
@@ -269,50 +722,210 @@ class VectorSearch:
             return {}
         
         self.logger.info("Collecting index stats...")
-        # Get indices from environment variable
-        indices_str = os.getenv('ES_INDICES', '')
-        if not indices_str:
-            self.logger.warning("ES_INDICES environment variable not set")
-            return {}
-        
-        # Parse comma-separated indices
-        indices = [idx.strip() for idx in indices_str.split(',') if idx.strip()]
+        indices = self.get_stats_indices()
         if not indices:
-            self.logger.warning("No indices found in ES_INDICES")
+            self.logger.warning("ES_INDICES environment variable not set")
             return {}
         
         stats_dict = {}
         
+        try:
+            response = self._indices_stats(
+                indices,
+                filter_path=",".join(
+                    f"indices.*.primaries.{metric}" for metric in INDEX_STATS_METRICS
+                )
+            )
+        except Exception as e:
+            self.logger.error(f"Error collecting index stats: {e}")
+            return {index_name: {"error": str(e)} for index_name in indices}
+        
+        indices_stats = response.get('indices', {}) if response else {}
+        
         for index_name in indices:
+            if index_name not in indices_stats:
+                self.logger.warning(f"Index '{index_name}' does not exist")
+                stats_dict[index_name] = {"error": "Index does not exist"}
+                continue
+            
+            primaries = indices_stats[index_name].get('primaries', {})
+            stats_dict[index_name] = {"_all": {"primaries": primaries}}
+            
+            doc_count = primaries.get('docs', {}).get('count', 0)
+            vector_count = primaries.get('dense_vector', {}).get('value_count', 0)
+            self.logger.info(f"Index '{index_name}': {doc_count} docs, {vector_count} vectors")
+        
+        return stats_dict
+
+    def collect_segment_stats(self, indices: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Collect primary segment count and size per index
+        
+        Args:
+            indices: Index names to collect
+        
+        Returns:
+            dict: Index name to segment count, segment memory, store size, doc count
+                and refresh interval (missing indices are left out)
+        """
+        response = self._indices_stats(
+            indices,
+            metric="segments,store,docs",
+            filter_path="indices.*.primaries.segments.count,indices.*.primaries.store.size_in_bytes,"
+                        "indices.*.primaries.docs.count"
+        )
+        settings = self.client.indices.get_settings(
+            index=",".join(indices),
+            name="index.refresh_interval",
+            include_defaults=True,
+            ignore_unavailable=True
+        )
+        
+        segment_stats = {}
+        for index_name, entry in (response or {}).get('indices', {}).items():
+            primaries = entry.get('primaries', {})
+            index_settings = settings.get(index_name, {})
+            refresh_interval = (index_settings.get('settings', {}).get('index', {}).get('refresh_interval')
+                                or index_settings.get('defaults', {}).get('index', {}).get('refresh_interval'))
+            segment_stats[index_name] = {
+                "segments": primaries.get('segments', {}).get('count', 0),
+                "size_bytes": primaries.get('store', {}).get('size_in_bytes', 0),
+                "docs": primaries.get('docs', {}).get('count', 0),
+                "refresh_interval": refresh_interval
+            }
+        return segment_stats
+    
+    def force_merge(self, index: str, max_num_segments: int = 1, timeout: float = 3600) -> Dict[str, Any]:
+        """
+        Force-merge an index down to a number of segments, waiting for completion
+        
+        Args:
+            index: Index to merge
+            max_num_segments: Segments per shard after the merge
+            timeout: Seconds to wait for the merge
+        
+        Returns:
+            dict: Result with success status and merge duration
+        """
+        start = time.monotonic()
+        try:
+            self.client.options(request_timeout=timeout, max_retries=0).indices.forcemerge(
+                index=index, max_num_segments=max_num_segments, wait_for_completion=True
+            )
+            return {"success": True, "merge_ms": round((time.monotonic() - start) * 1000, 2)}
+        except Exception as e:
+            self.logger.error(f"Error force-merging {index}: {e}")
+            return {"success": False, "error": str(e), "merge_ms": round((time.monotonic() - start) * 1000, 2)}
+    
+    def set_refresh_interval(self, index: str, interval: str, refresh: bool = False) -> bool:
+        """
+        Change the refresh interval of an index
+        
+        Args:
+            index: Index to update
+            interval: Refresh interval such as "1s", "30s" or "-1"
+            refresh: Refresh right after the change so pending documents become searchable
+        
+        Returns:
+            bool: True if the setting was applied, False otherwise
+        """
+        try:
+            self.client.indices.put_settings(index=index, settings={"index": {"refresh_interval": interval}})
+            if refresh:
+                self.client.indices.refresh(index=index)
+            return True
+        except Exception as e:
+            self.logger.error(f"Error setting refresh interval of {index} to {interval}: {e}")
+            return False
+    
+    def measure_knn_latency(self, index: str, probes: int = 5, num_candidates: int = 100) -> Optional[float]:
+        """
+        Median server-side latency of kNN probes with fixed pseudo-random vectors
+        
+        The probe vectors are the same on every call, so measurements taken
+        before and after a maintenance operation are comparable.
+        
+        Args:
+            index: Index to probe
+            probes: Number of queries
+            num_candidates: Number of candidates per shard
+        
+        Returns:
+            float: Median took in milliseconds, or None if no probe succeeded
+        """
+        rng = np.random.default_rng(0)
+        took = []
+        for _ in range(probes):
+            vector = rng.standard_normal(self.embedding_dim).astype(np.float32)
+            vector /= np.linalg.norm(vector)
             try:
-                # Check if index exists
-                if not self.client.indices.exists(index=index_name):
-                    self.logger.warning(f"Index '{index_name}' does not exist")
-                    stats_dict[index_name] = {"error": "Index does not exist"}
-                    continue
-                
-                # Query stats with filter_path
-                response = self.client.indices.stats(
-                    index=index_name,
-                    filter_path="_all.primaries.docs,_all.primaries.dense_vector"
+                response = self.client.search(
+                    index=index,
+                    knn={"field": "face_embeddings", "query_vector": vector.tolist(),
+                         "k": 10, "num_candidates": num_candidates},
+                    size=10,
+                    source=False,
+                    request_cache=False
                 )
-                
-                stats_dict[index_name] = response
-
-                self.logger.info(response)
-                
-                # Log summary
-                if '_all' in response and 'primaries' in response['_all']:
-                    primaries = response['_all']['primaries']
-                    doc_count = primaries.get('docs', {}).get('count', 0)
-                    vector_count = primaries.get('dense_vector', {}).get('value_count', 0)
-                    self.logger.info(f"Index '{index_name}': {doc_count} docs, {vector_count} vectors")
-                
+                took.append(response.get('took', 0))
             except Exception as e:
-                self.logger.error(f"Error collecting stats for index '{index_name}': {e}")
-                stats_dict[index_name] = {"error": str(e)}
+                self.logger.warning(f"kNN latency probe on {index} failed: {e}")
+        return float(np.median(took)) if took else None
+
+    def get_vector_index_options(self, indices: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Read the face_embeddings index_options of indices from their mappings
+
+        Args:
+            indices: Index names
+
+        Returns:
+            dict: Per index, the quantization type and the mapping's rescore_vector
+                oversample (None if the mapping sets none); missing indices are left out
+        """
+        response = self.client.indices.get_mapping(
+            index=",".join(indices),
+            ignore_unavailable=True,
+            filter_path="*.mappings.properties.face_embeddings.index_options"
+        )
+        options = {}
+        for index, mapping in response.body.items():
+            index_options = mapping.get('mappings', {}).get('properties', {}) \
+                .get('face_embeddings', {}).get('index_options', {})
+            options[index] = {
+                "type": index_options.get('type'),
+                "oversample": index_options.get('rescore_vector', {}).get('oversample')
+            }
+        return options
+
+    def collect_search_thread_pool_stats(self) -> Dict[str, Any]:
+        """
+        Collect search thread pool figures summed over all nodes
         
-        return stats_dict
+        Returns:
+            dict: Threads, active workers, queue depth, rejections and utilization
+        """
+        if not self.is_connected:
+            return {"error": "Not connected to Elasticsearch"}
+        
+        try:
+            response = self.client.nodes.stats(
+                metric="thread_pool",
+                filter_path="nodes.*.thread_pool.search"
+            )
+        except Exception as e:
+            self.logger.warning(f"Could not collect search thread pool stats: {e}")
+            return {"error": str(e)}
+        
+        totals = {"nodes": 0, "threads": 0, "active": 0, "queue": 0, "rejected": 0, "completed": 0}
+        for node in (response or {}).get('nodes', {}).values():
+            search_pool = node.get('thread_pool', {}).get('search', {})
+            totals["nodes"] += 1
+            for key in ("threads", "active", "queue", "rejected", "completed"):
+                totals[key] += search_pool.get(key, 0)
+        
+        totals["utilization"] = round(totals["active"] / totals["threads"], 3) if totals["threads"] else 0.0
+        return totals
 
     def create_uploads_index_if_not_exists(self) -> bool:
         """
@@ -371,7 +984,7 @@ class VectorSearch:
             return False
 
     def index_face(self,
-                   embedding: List[float],
+                   embedding: Union[List[float], np.ndarray],
                    index_name: str,
                    metadata: Dict[str, Any] = None,
                    face_id: str = None,
@@ -410,7 +1023,7 @@ class VectorSearch:
             
             document = {
                 "id": face_id,
-                "face_embeddings": embedding,
+                "face_embeddings": self._to_list(embedding),
                 "metadata": metadata or {},
                 "timestamp": datetime.now().isoformat(),
                 "indexed_at": datetime.now().isoformat()
@@ -421,6 +1034,7 @@ class VectorSearch:
                 id=document_id,
                 document=document
             )
+            self.enrollments += 1
             
             result = {
                 "success": True,
@@ -440,4 +1054,98 @@ class VectorSearch:
                 "success": False,
                 "error": str(e),
                 "face_id": face_id if 'face_id' in locals() else None
-            }
\ No newline at end of file
+            }
+    def find_near_duplicates(self,
+                             embedding: Union[List[float], np.ndarray],
+                             min_similarity: float,
+                             k: int = 5,
+                             num_candidates: int = 50) -> List[Dict[str, Any]]:
+        """
+        Find enrolled faces in the uploads index nearly identical to an embedding
+        
+        The kNN similarity threshold prunes candidates on the quantized vectors;
+        the cosine similarity of each candidate is recomputed from its stored
+        float embedding before it is returned.
+        
+        Args:
+            embedding: Face embedding to look up
+            min_similarity: Lowest cosine similarity counted as a duplicate
+            k: Number of nearest neighbors to probe
+            num_candidates: Number of candidates per shard
+        
+        Returns:
+            list: Duplicates with document_id, similarity, embedding and metadata, most similar first
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if not self.is_connected or query_norm == 0:
+            return []
+        
+        response = self.client.search(
+            index=os.getenv('ES_UPLOADS_INDEX'),
+            knn={
+                "field": "face_embeddings",
+                "query_vector": self._to_list(query),
+                "k": k,
+                "num_candidates": max(k, num_candidates),
+                # Loosened so quantization error cannot drop a true duplicate
+                "similarity": max(-1.0, min_similarity - 0.05)
+            },
+            source=["metadata", "face_embeddings"],
+            size=k
+        )
+        
+        duplicates = []
+        for hit in response['hits']['hits']:
+            source = hit.get('_source', {})
+            stored = np.asarray(source.get('face_embeddings') or [], dtype=np.float32)
+            norm = np.linalg.norm(stored)
+            if stored.shape != query.shape or norm == 0:
+                continue
+            similarity = float(np.dot(stored, query) / (norm * query_norm))
+            if similarity >= min_similarity:
+                duplicates.append({
+                    "document_id": hit['_id'],
+                    "similarity": similarity,
+                    "embedding": stored,
+                    "metadata": source.get('metadata', {})
+                })
+        duplicates.sort(key=lambda duplicate: duplicate['similarity'], reverse=True)
+        return duplicates
+
+    def update_face(self,
+                    document_id: str,
+                    embedding: Union[List[float], np.ndarray] = None,
+                    metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Update the embedding and/or metadata of an enrolled face
+        
+        Args:
+            document_id: Elasticsearch document ID in the uploads index
+            embedding: New face embedding (default: unchanged)
+            metadata: Metadata fields to set (default: unchanged)
+        
+        Returns:
+            dict: Update result with success status
+        """
+        if not self.is_connected:
+            return {"success": False, "error": "Not connected to Elasticsearch"}
+        
+        doc = {"indexed_at": datetime.now().isoformat()}
+        if embedding is not None:
+            doc["face_embeddings"] = self._to_list(embedding)
+        if metadata:
+            doc["metadata"] = metadata
+        
+        try:
+            response = self.client.update(index=os.getenv('ES_UPLOADS_INDEX'), id=document_id, doc=doc)
+            return {
+                "success": True,
+                "document_id": response['_id'],
+                "index": response['_index'],
+                "result": response['result'],
+                "version": response.get('_version')
+            }
+        except Exception as e:
+            self.logger.error(f"Error updating face {document_id}: {e}")
+            return {"success": False, "error": str(e)}
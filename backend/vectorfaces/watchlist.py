@@ -0,0 +1,185 @@
+"""
+Watchlist Module for vectorfaces
+In-memory gallery of watchlisted identities matched with exact cosine similarity
+before falling through to Elasticsearch
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Any, Union
+
+import numpy as np
+
+from .vector_search import VectorSearch
+
+
+class WatchlistGallery:
+    """Hot tier of face embeddings held in a normalized float32 matrix"""
+
+    def __init__(self, threshold: float = None, embedding_dim: int = 512):
+        """
+        Initialize the WatchlistGallery
+
+        Args:
+            threshold: Minimum cosine similarity for a gallery match to answer the query
+                (default: from WATCHLIST_THRESHOLD env var, or 0.5)
+            embedding_dim: Dimension of face embeddings
+        """
+        self.threshold = threshold if threshold is not None else float(os.getenv('WATCHLIST_THRESHOLD', 0.5))
+        self.embedding_dim = embedding_dim
+        # (matrix, entries) is swapped as one tuple so readers never see a half-loaded gallery
+        self._gallery = (np.zeros((0, embedding_dim), dtype=np.float32), [])
+        self._reload_lock = threading.Lock()
+        self.source = None
+        self.loaded_at = None
+        self.load_ms = None
+        self.queries = 0
+        self.hits = 0
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def size(self) -> int:
+        return len(self._gallery[1])
+
+    def load(self, embeddings: Union[np.ndarray, List[List[float]]], entries: List[Dict[str, Any]], source: str):
+        """
+        Replace the gallery contents
+
+        Args:
+            embeddings: Face embeddings, one row per entry
+            entries: Per-row dictionaries with 'id' and 'metadata'
+            source: Description of where the gallery was loaded from
+        """
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.embedding_dim)
+        if len(matrix) != len(entries):
+            raise ValueError(f"Got {len(matrix)} embeddings for {len(entries)} entries")
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._gallery = (np.ascontiguousarray(matrix / norms), entries)
+        self.source = source
+        self.loaded_at = time.time()
+        self.logger.info(f"Watchlist loaded {len(entries)} face(s) from {source}")
+
+    def load_file(self, path: str):
+        """
+        Load the gallery from a file
+
+        Supported formats are .npz (an 'embeddings' array plus a 'metadata' array of
+        JSON strings) and .ndjson/.json in the index dump format (one document with
+        'id', 'face_embeddings' and 'metadata' per line).
+
+        Args:
+            path: Path to the gallery file
+        """
+        with self._reload_lock:
+            start = time.time()
+            if path.endswith('.npz'):
+                data = np.load(path, allow_pickle=False)
+                entries = []
+                for i, metadata in enumerate(data['metadata']):
+                    metadata = json.loads(str(metadata))
+                    entries.append({"id": metadata.get('id', str(i)), "metadata": metadata})
+                self.load(data['embeddings'], entries, path)
+            else:
+                embeddings = []
+                entries = []
+                with open(path, 'r') as f:
+                    for line in f:
+                        line = line.strip()
+                        if line:
+                            doc = json.loads(line)
+                            embeddings.append(doc['face_embeddings'])
+                            entries.append({"id": doc.get('id'), "metadata": doc.get('metadata', {})})
+                self.load(embeddings, entries, path)
+            self.load_ms = round((time.time() - start) * 1000, 2)
+
+    def load_elasticsearch(self, vector_search: VectorSearch, index: str, query: Dict = None, max_faces: int = 10000):
+        """
+        Load the gallery from the documents matching an Elasticsearch query
+
+        Args:
+            vector_search: Connected VectorSearch instance
+            index: Index or alias to read from
+            query: Query selecting the watchlisted faces (default: match_all)
+            max_faces: Maximum number of faces to load
+        """
+        with self._reload_lock:
+            start = time.time()
+            embeddings = []
+            entries = []
+            for doc in vector_search.scan_faces(index, query=query, max_docs=max_faces):
+                embeddings.append(doc['face_embeddings'])
+                entries.append({"id": doc.get('id'), "metadata": doc.get('metadata', {})})
+            self.load(embeddings, entries, f"elasticsearch:{index}")
+            self.load_ms = round((time.time() - start) * 1000, 2)
+
+    def match(self, embedding: Union[np.ndarray, List[float]], top_k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Find gallery faces whose cosine similarity clears the threshold
+
+        Gender is not used as a filter: a watchlisted identity should not be
+        hidden by a wrong gender estimate.
+
+        Args:
+            embedding: Query face embedding
+            top_k: Maximum number of matches
+
+        Returns:
+            list: Matches in the search_similar_faces format, best first; empty if
+                no gallery face clears the threshold
+        """
+        matrix, entries = self._gallery
+        self.queries += 1
+        if not entries:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+
+        similarities = matrix @ (query / norm)
+        k = min(top_k, len(entries))
+        candidates = np.argpartition(-similarities, k - 1)[:k]
+        candidates = candidates[np.argsort(-similarities[candidates])]
+
+        matches = []
+        for i in candidates:
+            similarity = float(similarities[i])
+            if similarity < self.threshold:
+                break
+            matches.append({
+                "index": "watchlist",
+                "face_id": entries[i]['id'],
+                # Same scale as Elasticsearch cosine scores
+                "score": (1.0 + similarity) / 2.0,
+                "similarity": similarity,
+                "metadata": entries[i]['metadata']
+            })
+
+        if matches:
+            self.hits += 1
+        return matches
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get gallery statistics
+
+        Returns:
+            dict: Size, source, load time and hit rate
+        """
+        return {
+            "size": self.size,
+            "threshold": self.threshold,
+            "source": self.source,
+            "loaded_at": datetime.fromtimestamp(self.loaded_at).isoformat() if self.loaded_at else None,
+            "load_ms": self.load_ms,
+            "queries": self.queries,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.queries, 3) if self.queries else 0.0
+        }
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Export the embeddings of an index to a memory-mappable snapshot
+
+The snapshot directory holds:
+  embeddings.npy   float32 (N, dims), or int8 with --int8
+  scales.npy       per-row float32 scales of int8 embeddings (row = int8 * scale)
+  metadata.npz     columnar sidecar: id, name, gender, image_path, index (row-aligned)
+  manifest.json    source index, row count, dtype and the watermark of --incremental
+
+The index is read through a point in time, split into slices that are read
+by parallel workers with search_after. Every worker checkpoints after each
+page, so an interrupted export continues where it stopped when run again.
+
+Usage: python export.py <index_name> [--out <dir>] [--slices <n>] [--page-size <n>] [--int8]
+                        [--incremental] [--since-field <field>] [--keep-alive <time>] [--restart]
+                        [--es_url <url>] [--es_apikey <key>]
+
+  np.load('snapshots/<index>/embeddings.npy', mmap_mode='r') maps the embeddings without reading them.
+"""
+import sys
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from elasticsearch import Elasticsearch, NotFoundError
+
+
+METADATA_COLUMNS = ["id", "name", "gender", "image_path", "index"]
+# Rows copied per block when assembling the snapshot
+COPY_BLOCK_ROWS = 65536
+
+
+def write_atomic(path: Path, write):
+    """Write a file through a temporary name so readers never see a partial file."""
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def quantize_int8(embeddings: np.ndarray):
+    """Symmetric per-row int8 quantization; returns the int8 rows and their float32 scales."""
+    scales = np.abs(embeddings).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    quantized = np.clip(np.rint(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+class SliceExporter:
+    """Reads one slice of a point in time page by page, writing a chunk file per page."""
+
+    def __init__(self, es: Elasticsearch, state: dict, parts_dir: Path, slice_id: int, page_size: int,
+                 query: dict, since_field: str, lock: threading.Lock):
+        self.es = es
+        self.state = state
+        self.parts_dir = parts_dir
+        self.slice_id = slice_id
+        self.page_size = page_size
+        self.query = query
+        self.since_field = since_field
+        self.lock = lock
+        self.checkpoint_path = parts_dir / f"slice-{slice_id}.json"
+        if self.checkpoint_path.exists():
+            with open(self.checkpoint_path) as f:
+                self.checkpoint = json.load(f)
+        else:
+            self.checkpoint = {"search_after": None, "chunks": 0, "docs": 0, "done": False, "watermark": None}
+
+    def run(self) -> dict:
+        while not self.checkpoint["done"]:
+            body = {
+                "size": self.page_size,
+                "query": self.query,
+                "pit": {"id": self.state["pit"], "keep_alive": self.state["keep_alive"]},
+                "sort": [{"_shard_doc": "asc"}],
+                "_source": ["id", "face_embeddings", "metadata", self.since_field]
+            }
+            if self.state["slices"] > 1:
+                body["slice"] = {"id": self.slice_id, "max": self.state["slices"]}
+            if self.checkpoint["search_after"] is not None:
+                body["search_after"] = self.checkpoint["search_after"]
+
+            response = self.es.search(**body)
+            with self.lock:
+                # The point in time id may change between requests; the latest one must be used
+                self.state["pit"] = response.get("pit_id", self.state["pit"])
+            hits = response["hits"]["hits"]
+            if hits:
+                self.write_chunk(hits)
+                self.checkpoint["search_after"] = hits[-1]["sort"]
+            self.checkpoint["done"] = len(hits) < self.page_size
+            write_atomic(self.checkpoint_path, lambda f: f.write(json.dumps(self.checkpoint).encode('utf-8')))
+        return self.checkpoint
+
+    def write_chunk(self, hits: list):
+        embeddings = []
+        columns = {column: [] for column in METADATA_COLUMNS}
+        for hit in hits:
+            source = hit.get("_source", {})
+            vector = source.get("face_embeddings")
+            if not vector:
+                continue
+            metadata = source.get("metadata") or {}
+            embeddings.append(vector)
+            columns["id"].append(str(source.get("id") or hit["_id"]))
+            columns["name"].append(str(metadata.get("name") or ""))
+            columns["gender"].append(str(metadata.get("gender") or ""))
+            columns["image_path"].append(str(metadata.get("image_path") or ""))
+            columns["index"].append(hit["_index"])
+            value = source.get(self.since_field)
+            if value is not None and (self.checkpoint["watermark"] is None or value > self.checkpoint["watermark"]):
+                self.checkpoint["watermark"] = value
+
+        if not embeddings:
+            return
+        chunk = self.checkpoint["chunks"]
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        write_atomic(self.parts_dir / f"slice-{self.slice_id}-{chunk:06d}.npy", lambda f: np.save(f, embeddings))
+        write_atomic(self.parts_dir / f"slice-{self.slice_id}-{chunk:06d}.meta.npz",
+                     lambda f: np.savez(f, **{column: np.array(values, dtype=str) for column, values in columns.items()}))
+        self.checkpoint["chunks"] = chunk + 1
+        self.checkpoint["docs"] += len(embeddings)
+
+
+def open_point_in_time(es: Elasticsearch, index_name: str, keep_alive: str) -> str:
+    return es.open_point_in_time(index=index_name, keep_alive=keep_alive)["id"]
+
+
+def load_parts(parts_dir: Path, slices: int):
+    """
+    Yield (embeddings path, metadata columns) of every chunk file in slice and chunk order.
+
+    Embeddings stay on disk; assemble maps one chunk at a time.
+    """
+    for slice_id in range(slices):
+        for path in sorted(parts_dir.glob(f"slice-{slice_id}-*.npy")):
+            with np.load(path.with_name(path.name[:-len('.npy')] + '.meta.npz')) as meta:
+                yield path, {column: meta[column] for column in METADATA_COLUMNS}
+
+
+def assemble(out_dir: Path, parts_dir: Path, slices: int, int8: bool, previous: dict = None) -> int:
+    """
+    Write the snapshot files from the chunk files, after the rows of the previous
+    snapshot when exporting incrementally. Rows with an id exported again replace
+    their older copy.
+
+    Embeddings are copied from memory-mapped files in blocks of COPY_BLOCK_ROWS,
+    so the export never has to fit in memory.
+
+    Returns the number of rows written.
+    """
+    # (embeddings path, int8 scales or None, metadata columns)
+    sources = []
+    if previous is not None:
+        previous_scales = np.load(out_dir / "scales.npy") if previous.get("dtype") == "int8" else None
+        with np.load(out_dir / "metadata.npz") as meta:
+            sources.append((out_dir / "embeddings.npy", previous_scales,
+                            {column: meta[column] for column in METADATA_COLUMNS}))
+    sources.extend((path, None, columns) for path, columns in load_parts(parts_dir, slices))
+
+    # The last occurrence of an id wins
+    keep = []
+    row_of = {}
+    for source_index, (_, _, columns) in enumerate(sources):
+        for row, doc_id in enumerate(columns["id"]):
+            if doc_id in row_of:
+                keep[row_of[doc_id]] = None
+            row_of[doc_id] = len(keep)
+            keep.append((source_index, row))
+    selected_rows = {}
+    for entry in keep:
+        if entry is not None:
+            selected_rows.setdefault(entry[0], []).append(entry[1])
+    total = sum(len(selected) for selected in selected_rows.values())
+
+    dims = 0
+    for path, _, columns in sources:
+        if len(columns["id"]):
+            dims = np.load(path, mmap_mode='r').shape[1]
+            break
+    dtype = np.int8 if int8 else np.float32
+    tmp_embeddings = out_dir / "embeddings.npy.tmp"
+    output = np.lib.format.open_memmap(tmp_embeddings, mode='w+', dtype=dtype, shape=(total, dims))
+    scales = np.empty(total, dtype=np.float32)
+    columns = {column: [] for column in METADATA_COLUMNS}
+
+    start = 0
+    for source_index, (path, source_scales, source_columns) in enumerate(sources):
+        selected = selected_rows.get(source_index)
+        if not selected:
+            continue
+        embeddings = np.load(path, mmap_mode='r')
+        # The previous snapshot is one large source; copy it in bounded blocks too
+        for offset in range(0, len(selected), COPY_BLOCK_ROWS):
+            rows = selected[offset:offset + COPY_BLOCK_ROWS]
+            block = np.asarray(embeddings[rows], dtype=np.float32)
+            if source_scales is not None:
+                block *= source_scales[rows, None]
+            if int8:
+                output[start:start + len(block)], scales[start:start + len(block)] = quantize_int8(block)
+            else:
+                output[start:start + len(block)] = block
+            start += len(block)
+        del embeddings
+        for column in METADATA_COLUMNS:
+            columns[column].append(source_columns[column][selected])
+    output.flush()
+    del output
+
+    os.replace(tmp_embeddings, out_dir / "embeddings.npy")
+    if int8:
+        write_atomic(out_dir / "scales.npy", lambda f: np.save(f, scales))
+    elif (out_dir / "scales.npy").exists():
+        os.remove(out_dir / "scales.npy")
+    write_atomic(out_dir / "metadata.npz", lambda f: np.savez(f, **{
+        column: np.concatenate(values) if values else np.array([], dtype=str) for column, values in columns.items()
+    }))
+    return total
+
+
+def export_index(es: Elasticsearch, index_name: str, out_dir: Path, slices: int, page_size: int, int8: bool,
+                 incremental: bool, since_field: str, keep_alive: str, restart: bool):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    parts_dir = out_dir / "parts"
+    state_path = parts_dir / "state.json"
+    manifest_path = out_dir / "manifest.json"
+
+    if restart and parts_dir.exists():
+        shutil.rmtree(parts_dir)
+
+    previous = None
+    if incremental and manifest_path.exists():
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        since_field = previous.get("since_field") or since_field
+        if previous.get("watermark") is None:
+            print(f"Snapshot has no '{since_field}' watermark; run a full export instead")
+            sys.exit(1)
+        # New rows are stored like the existing ones
+        int8 = previous.get("dtype") == "int8"
+
+    state = None
+    if state_path.exists():
+        with open(state_path) as f:
+            state = json.load(f)
+        try:
+            # Extends the point in time if it is still alive
+            es.search(pit={"id": state["pit"], "keep_alive": state["keep_alive"]}, size=0)
+            print(f"Resuming export of '{state['index']}' ({state['slices']} slices)")
+        except NotFoundError:
+            # search_after positions only hold within the point in time they came from
+            print(f"Point in time expired (--keep-alive {state['keep_alive']}); starting the export over")
+            shutil.rmtree(parts_dir)
+            state = None
+
+    if state is None:
+        parts_dir.mkdir(parents=True, exist_ok=True)
+        query = {"match_all": {}}
+        if previous is not None:
+            query = {"range": {since_field: {"gt": previous["watermark"]}}}
+        state = {
+            "index": index_name,
+            "pit": open_point_in_time(es, index_name, keep_alive),
+            "keep_alive": keep_alive,
+            "slices": slices,
+            "query": query,
+            "started_at": datetime.now().isoformat()
+        }
+    write_atomic(state_path, lambda f: f.write(json.dumps(state).encode('utf-8')))
+
+    total = es.count(index=index_name, query=state["query"])["count"]
+    print(f"Exporting {total} documents from '{index_name}' with {state['slices']} slice(s)...")
+
+    lock = threading.Lock()
+    exporters = [SliceExporter(es, state, parts_dir, slice_id, page_size, state["query"], since_field, lock)
+                 for slice_id in range(state["slices"])]
+    with ThreadPoolExecutor(max_workers=state["slices"]) as executor:
+        checkpoints = list(executor.map(lambda exporter: exporter.run(), exporters))
+
+    try:
+        es.close_point_in_time(id=state["pit"])
+    except NotFoundError:
+        pass
+
+    exported = sum(checkpoint["docs"] for checkpoint in checkpoints)
+    print(f"Read {exported} documents, writing snapshot...")
+    rows = assemble(out_dir, parts_dir, state["slices"], int8, previous)
+
+    watermarks = [checkpoint["watermark"] for checkpoint in checkpoints if checkpoint["watermark"] is not None]
+    if previous is not None and previous.get("watermark") is not None:
+        watermarks.append(previous["watermark"])
+    manifest = {
+        "index": index_name,
+        "rows": rows,
+        "dims": int(np.load(out_dir / "embeddings.npy", mmap_mode='r').shape[1]) if rows else None,
+        "dtype": "int8" if int8 else "float32",
+        "columns": METADATA_COLUMNS,
+        "since_field": since_field,
+        "watermark": max(watermarks) if watermarks else None,
+        "exported_at": datetime.now().isoformat(),
+        "incremental_rows": exported if previous is not None else None
+    }
+    write_atomic(manifest_path, lambda f: f.write(json.dumps(manifest, indent=2).encode('utf-8')))
+    shutil.rmtree(parts_dir)
+    print(f"Snapshot written to {out_dir}: {rows} rows ({manifest['dtype']})")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python export.py <index_name> [--out <dir>] [--slices <n>] [--page-size <n>] [--int8] "
+              "[--incremental] [--since-field <field>] [--keep-alive <time>] [--restart] "
+              "[--es_url <url>] [--es_apikey <key>]")
+        sys.exit(1)
+
+    index_name = sys.argv[1]
+    out_dir = None
+    slices = 4
+    page_size = 1000
+    int8 = False
+    incremental = False
+    since_field = 'indexed_at'
+    keep_alive = '30m'
+    restart = False
+    es_url = "http://localhost:9200"
+    es_apikey = None
+
+    i = 2
+    while i < len(sys.argv):
+        if sys.argv[i] == '--out' and i + 1 < len(sys.argv):
+            out_dir = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--slices' and i + 1 < len(sys.argv):
+            slices = int(sys.argv[i + 1])
+            i += 2
+        elif sys.argv[i] == '--page-size' and i + 1 < len(sys.argv):
+            page_size = int(sys.argv[i + 1])
+            i += 2
+        elif sys.argv[i] == '--int8':
+            int8 = True
+            i += 1
+        elif sys.argv[i] == '--incremental':
+            incremental = True
+            i += 1
+        elif sys.argv[i] == '--since-field' and i + 1 < len(sys.argv):
+            since_field = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--keep-alive' and i + 1 < len(sys.argv):
+            keep_alive = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--restart':
+            restart = True
+            i += 1
+        elif sys.argv[i] == '--es_url' and i + 1 < len(sys.argv):
+            es_url = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--es_apikey' and i + 1 < len(sys.argv):
+            es_apikey = sys.argv[i + 1]
+            i += 2
+        else:
+            i += 1
+
+    script_dir = Path(__file__).parent
+    out_path = Path(out_dir) if out_dir else script_dir / "snapshots" / index_name
+
+    print(f"Connecting to Elasticsearch at {es_url}...")
+
+    es_kwargs = {'hosts': [es_url]}
+    if es_apikey:
+        es_kwargs['api_key'] = es_apikey
+
+    # Ignore self-signed certificates if using HTTPS
+    if es_url.startswith('https://'):
+        es_kwargs['verify_certs'] = False
+        es_kwargs['ssl_show_warn'] = False
+    es = Elasticsearch(**es_kwargs)
+
+    if not es.ping():
+        raise ConnectionError("Could not connect to Elasticsearch")
+
+    print("Connected to Elasticsearch successfully.")
+
+    export_index(es, index_name, out_path, slices, page_size, int8, incremental, since_field, keep_alive, restart)
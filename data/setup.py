@@ -1,8 +1,23 @@
 #!/usr/bin/env python3
+"""
+Create the indices defined in data/*.json
+
+Usage:
+  python setup.py [--es_url URL] [--es_apikey KEY]
+      Delete and recreate every index definition
+
+  python setup.py --reindex-from SOURCE [--only NAME,...] [--suffix SUFFIX] [--slices N|auto]
+                  [--requests-per-second N] [--no-swap] [--delete-old] [--es_url URL] [--es_apikey KEY]
+      Create each definition as a new index next to the existing one, fill it from SOURCE
+      with a sliced _reindex, and swap the definition's aliases to it in one atomic step
+"""
 import sys
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, NotFoundError
 
 
 def load_all_index_definitions(data_dir: Path) -> dict:
@@ -33,9 +48,142 @@ def create_index(es: Elasticsearch, index_name: str, definition: dict):
     print(f"Index '{index_name}' created successfully.")
 
 
+def create_reindex_target(es: Elasticsearch, target: str, definition: dict):
+    """Create an index for a reindex, without aliases and with refresh and replicas off until it is filled."""
+    settings = json.loads(json.dumps(definition.get('settings') or {}))
+    index_settings = settings.setdefault('index', {})
+    index_settings['refresh_interval'] = '-1'
+    index_settings['number_of_replicas'] = '0'
+    
+    print(f"Creating index '{target}'...")
+    es.indices.create(index=target, mappings=definition.get('mappings'), settings=settings)
+    print(f"Index '{target}' created successfully.")
+
+
+def start_reindex(es: Elasticsearch, source: str, target: str, slices, requests_per_second: float) -> str:
+    """Start a sliced _reindex as a background task and return its task id."""
+    response = es.reindex(
+        source={"index": source, "size": 1000},
+        dest={"index": target},
+        slices=slices,
+        requests_per_second=requests_per_second,
+        wait_for_completion=False
+    )
+    return response['task']
+
+
+def wait_for_reindex(es: Elasticsearch, tasks: dict, poll_interval: float = 5.0) -> dict:
+    """Poll reindex tasks, printing progress, until all of them have completed."""
+    started = time.time()
+    results = {}
+    while len(results) < len(tasks):
+        time.sleep(poll_interval)
+        for target, task_id in tasks.items():
+            if target in results:
+                continue
+            task = es.tasks.get(task_id=task_id)
+            status = task['task']['status']
+            done = status.get('created', 0) + status.get('updated', 0) + status.get('version_conflicts', 0)
+            total = status.get('total', 0)
+            elapsed = time.time() - started
+            rate = done / elapsed if elapsed > 0 else 0.0
+            percent = 100.0 * done / total if total else 0.0
+            print(f"  {target}: {done}/{total} docs ({percent:.1f}%), {rate:.0f} docs/s")
+            if task.get('completed'):
+                results[target] = task.get('response') or {"failures": [task.get('error')]}
+    return results
+
+
+def restore_settings(es: Elasticsearch, target: str, definition: dict):
+    """Put back the definition's refresh interval and replicas, then refresh."""
+    index_settings = (definition.get('settings') or {}).get('index', {})
+    es.indices.put_settings(index=target, settings={"index": {
+        "refresh_interval": index_settings.get('refresh_interval', '1s'),
+        "number_of_replicas": index_settings.get('number_of_replicas', '1')
+    }})
+    es.indices.refresh(index=target)
+
+
+def swap_aliases(es: Elasticsearch, replacements: dict, definitions: dict) -> list:
+    """
+    Move each definition's aliases from its previous index to the new one in one
+    update_aliases call, so searches never see a partial set of indices.
+    
+    Returns the indices that no longer hold an alias.
+    """
+    actions = []
+    replaced = set()
+    for index_name, target in replacements.items():
+        for alias in (definitions[index_name].get('aliases') or {}):
+            try:
+                holders = es.indices.get_alias(name=alias)
+            except NotFoundError:
+                holders = {}
+            for holder in holders:
+                # The index created from this definition before, under its plain or a suffixed name
+                if holder != target and (holder == index_name or holder.startswith(f"{index_name}-")):
+                    actions.append({"remove": {"index": holder, "alias": alias}})
+                    replaced.add(holder)
+            actions.append({"add": {"index": target, "alias": alias}})
+    if actions:
+        es.indices.update_aliases(actions=actions)
+    return sorted(replaced)
+
+
+def reindex_definitions(es: Elasticsearch, definitions: dict, source: str, suffix: str, slices,
+                        requests_per_second: float, swap: bool, delete_old: bool) -> bool:
+    """Create new indices for the definitions, fill them from the source index and swap aliases."""
+    targets = {}
+    for index_name in definitions:
+        targets[index_name] = f"{index_name}-{suffix}" if es.indices.exists(index=index_name) else index_name
+    
+    # Index creation is independent per definition
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        list(executor.map(lambda item: create_reindex_target(es, item[1], definitions[item[0]]), targets.items()))
+    
+    source_count = es.count(index=source)['count']
+    print(f"\nReindexing {source_count} documents from '{source}' into {len(targets)} index(es) "
+          f"(slices: {slices}, requests per second: {requests_per_second})...")
+    tasks = {target: start_reindex(es, source, target, slices, requests_per_second) for target in targets.values()}
+    results = wait_for_reindex(es, tasks)
+    
+    ready = {}
+    for index_name, target in targets.items():
+        result = results[target]
+        if result.get('failures'):
+            print(f"Reindex into '{target}' failed: {result['failures'][:3]}")
+            continue
+        restore_settings(es, target, definitions[index_name])
+        count = es.count(index=target)['count']
+        if count != source_count:
+            print(f"Reindex into '{target}' has {count} documents, expected {source_count}; aliases left unchanged")
+            continue
+        print(f"Reindex into '{target}' completed: {count} documents in {result.get('took', 0) / 1000:.1f}s")
+        ready[index_name] = target
+    
+    if swap and ready:
+        replaced = swap_aliases(es, ready, definitions)
+        print(f"\nAliases moved to: {', '.join(ready.values())}")
+        if replaced:
+            print(f"Previous indices: {', '.join(replaced)}")
+            if delete_old:
+                es.indices.delete(index=",".join(replaced))
+                print("Previous indices deleted.")
+    
+    print(f"\nUpdate ES_INDICES to list the new indices: {','.join(ready.values())}")
+    return len(ready) == len(targets)
+
+
 if __name__ == "__main__":
     es_url = "http://localhost:9200"
     es_apikey = None
+    reindex_from = None
+    only = None
+    suffix = datetime.now().strftime('%Y%m%d%H%M')
+    slices = 'auto'
+    requests_per_second = -1
+    swap = True
+    delete_old = False
     
     i = 1
     while i < len(sys.argv):
@@ -45,6 +193,27 @@ if __name__ == "__main__":
         elif sys.argv[i] == '--es_apikey' and i + 1 < len(sys.argv):
             es_apikey = sys.argv[i + 1]
             i += 2
+        elif sys.argv[i] == '--reindex-from' and i + 1 < len(sys.argv):
+            reindex_from = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--only' and i + 1 < len(sys.argv):
+            only = [name.strip() for name in sys.argv[i + 1].split(',') if name.strip()]
+            i += 2
+        elif sys.argv[i] == '--suffix' and i + 1 < len(sys.argv):
+            suffix = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--slices' and i + 1 < len(sys.argv):
+            slices = sys.argv[i + 1] if sys.argv[i + 1] == 'auto' else int(sys.argv[i + 1])
+            i += 2
+        elif sys.argv[i] == '--requests-per-second' and i + 1 < len(sys.argv):
+            requests_per_second = float(sys.argv[i + 1])
+            i += 2
+        elif sys.argv[i] == '--no-swap':
+            swap = False
+            i += 1
+        elif sys.argv[i] == '--delete-old':
+            delete_old = True
+            i += 1
         else:
             i += 1
     
@@ -72,8 +241,23 @@ if __name__ == "__main__":
         print("No JSON files found in current directory.")
         sys.exit(1)
     
+    if only:
+        definitions = {name: definition for name, definition in definitions.items() if name in only}
+    
     print(f"Found {len(definitions)} index definition(s): {', '.join(definitions.keys())}")
     
+    if reindex_from:
+        # The source itself and the uploads index (filled by the app) are never reindexed
+        definitions = {name: definition for name, definition in definitions.items()
+                       if name != reindex_from and not name.endswith('-uploads')}
+        if not definitions:
+            print("No index definitions to reindex.")
+            sys.exit(1)
+        if not reindex_definitions(es, definitions, reindex_from, suffix, slices,
+                                   requests_per_second, swap, delete_old):
+            sys.exit(1)
+        sys.exit(0)
+    
     for index_name, definition in definitions.items():
         create_index(es, index_name, definition)
     
@@ -86,11 +86,17 @@ class VectorFacesApp {
                 this.updateInfoBox(timingStats, faceAnalysis, matchingFaces);
             }
             
-            this.userMediaController.setFaceResults(faceAnalysis);
+            if (faceAnalysis || message.type !== 'matches') {
+                this.userMediaController.setFaceResults(faceAnalysis);
+            }
             this.gridController.updateBackgroundTiles(matchingFaces);
             this.gridController.updateInfoboxImage(matchingFaces[0]);
         });
 
+        this.webSocketController.setDetectionsCallback((message) => {
+            this.userMediaController.setFaceResults(message.face_analysis);
+        });
+
         this.userMediaController.setPreviewUpdateCallback(async () => {
             // Face drawing is now handled inside UserMediaController
         });
@@ -99,12 +99,7 @@ export class GridController {
     displayFaceOnTile(tile, face) {
         if (!tile) return;
         
-        let imageSource;
-        if (face.metadata.image_path.startsWith('/uploads')) {
-            imageSource = `/local${face.metadata.image_path}`;
-        } else {
-            imageSource = `/faces/${face.metadata.image_path}`;
-        }
+        const imageSource = this.imageSource(face, false);
 
         if (!imageSource) return;
         
@@ -117,7 +112,7 @@ export class GridController {
         
         const scoreLabel = tile.querySelector('.score-label');
         if (scoreLabel && face.score !== undefined) {
-            scoreLabel.textContent = `${face.metadata.name}:${face.score.toFixed(2)} (${face.index.split('-')[1].split('-')[0]})`;
+            scoreLabel.textContent = `${face.metadata.name}:${face.score.toFixed(2)} (${this.indexLabel(face)})`;
         } else if (scoreLabel) {
             scoreLabel.textContent = '--';
         }
@@ -188,12 +183,7 @@ export class GridController {
             
             const currentTile = gridItems[index];
             
-            let imageSource;
-            if (face.metadata.image_path.startsWith('/uploads')) {
-                imageSource = `/local${face.metadata.image_path}`;
-            } else {
-                imageSource = `/faces/${face.metadata.image_path}`;
-            }
+            const imageSource = this.imageSource(face, false);
 
             if (imageSource && currentTile) {
                 currentTile.style.backgroundImage = `url(${imageSource})`;
@@ -203,7 +193,7 @@ export class GridController {
                 
                 const scoreLabel = currentTile.querySelector('.score-label');
                 if (scoreLabel && face.score !== undefined) {
-                    scoreLabel.textContent = `${face.metadata.name}:${face.score.toFixed(2)} (${face.index.split('-')[1].split('-')[0]})`;
+                    scoreLabel.textContent = `${face.metadata.name}:${face.score.toFixed(2)} (${this.indexLabel(face)})`;
                 } else if (scoreLabel) {
                     scoreLabel.textContent = '--';
                 }
@@ -225,12 +215,7 @@ export class GridController {
         }
         
         // Determine image source
-        let imageSource;
-        if (topFace.metadata.image_path.startsWith('/uploads')) {
-            imageSource = `/local${topFace.metadata.image_path}`;
-        } else {
-            imageSource = `/faces/${topFace.metadata.image_path}`;
-        }
+        const imageSource = this.imageSource(topFace, true);
         
         // Create and append image element
         const img = document.createElement('img');
@@ -239,6 +224,28 @@ export class GridController {
         infoboxImage.appendChild(img);
     }
 
+    imageSource(face, large) {
+        // Prefer the server-side thumbnails: the smallest for grid tiles, the largest for the infobox
+        if (face.thumbnails) {
+            const sizes = Object.keys(face.thumbnails).map(Number).sort((a, b) => a - b);
+            if (sizes.length > 0) {
+                return face.thumbnails[large ? sizes[sizes.length - 1] : sizes[0]];
+            }
+        }
+        if (face.metadata.image_path.startsWith('/uploads')) {
+            return `/local${face.metadata.image_path}`;
+        }
+        return `/faces/${face.metadata.image_path}`;
+    }
+
+    indexLabel(face) {
+        // Watchlist hits come from the in-memory tier, not a quantized index
+        if (face.tier === 'watchlist') {
+            return 'watchlist';
+        }
+        return face.index.split('-')[1].split('-')[0];
+    }
+
     clearGrid() {
         const gridItems = document.querySelectorAll('.grid-item');
         
@@ -358,7 +358,10 @@ export class UploadController {
                 const indexResult = await response.json();
                 console.log('Index result:', indexResult);
                 
-                btn.innerHTML = '✅ Indexed!';
+                // Near duplicates of an enrolled face are skipped or merged server-side
+                btn.innerHTML = indexResult.duplicates && indexResult.duplicates.length && !indexResult.faces.length
+                    ? '✅ Already enrolled'
+                    : '✅ Indexed!';
                 btn.style.backgroundColor = '#4CAF50';
                 
                 setTimeout(() => {
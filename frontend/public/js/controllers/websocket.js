@@ -2,7 +2,9 @@ export class WebSocketController {
     constructor() {
         this.socket = null;
         this.onAnalysisCallback = null;
+        this.onDetectionsCallback = null;
         this.onStatusCallback = null;
+        this.lastDetections = null; // Detections of the frame whose matches are pending
     }
 
     connect() {
@@ -43,6 +45,19 @@ export class WebSocketController {
                     console.info('Timing stats:', message.timing_stats);
 
                     this.onAnalysisCallback(message);
+                } else if (message.type === 'detections') {
+                    // First phase: boxes as soon as analysis finishes
+                    this.lastDetections = message;
+                    if (this.onDetectionsCallback) {
+                        this.onDetectionsCallback(message);
+                    }
+                } else if (message.type === 'matches') {
+                    // Second phase: matches of the frame announced by the detections message
+                    const detections = this.lastDetections?.frame_id === message.frame_id ? this.lastDetections : null;
+                    console.info('Matching faces', message.matching_faces);
+                    console.info('Timing stats:', message.timing_stats);
+
+                    this.onAnalysisCallback({ ...message, face_analysis: detections?.face_analysis || null });
                 }else if(message.type === 'not_found') {
                     this.onAnalysisCallback(message);
                     this.updateStatus("Waiting...")
@@ -86,6 +101,10 @@ export class WebSocketController {
         this.onAnalysisCallback = callback;
     }
 
+    setDetectionsCallback(callback) {
+        this.onDetectionsCallback = callback;
+    }
+
     setStatusCallback(callback) {
         this.onStatusCallback = callback;
     }